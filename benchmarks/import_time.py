@@ -0,0 +1,101 @@
+"""
+\file import_time.py
+\author github:khanbekov, telegram:qoddrysdaim
+\brief Проверка времени импорта приложения (src.api.api) по python -X importtime
+\data 2026.10.18
+
+Запуск из корня репозитория: python -m benchmarks.import_time [--budget-ms 250] [--top 15]
+Импорт выполняется в отдельном процессе (модули не должны быть уже импортированы).
+Бюджет ограничивает собственное время импорта модулей Configurator (src.*): время импорта зависимостей
+(fastapi, pydantic) от кода репозитория не зависит и сильно меняется от машины к машине.
+Если собственное время больше бюджета или при импорте загружен модуль из LAZY_MODULES, скрипт завершается
+с кодом 1 (можно использовать в CI).
+"""
+import argparse
+import re
+import subprocess
+import sys
+
+# Модуль, время импорта которого проверяется
+MODULE = 'src.api.api'
+# Пакет Configurator: его собственное время импорта ограничено бюджетом
+OWN_PACKAGE = 'src'
+# Бюджет собственного времени импорта по умолчанию (мс)
+DEFAULT_BUDGET_MS = 250
+# Модули, которые не должны импортироваться при запуске (импортируются в фоне)
+LAZY_MODULES = ('ccxt',)
+
+# Строка вывода -X importtime: "import time: <self, мкс> | <cumulative, мкс> | <отступ><модуль>"
+IMPORT_TIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S+)$')
+
+
+def measure_import_time(module: str) -> list[tuple[str, int, int, int]]:
+    """ Функция импортирует модуль в отдельном процессе с -X importtime.
+
+    :param module: имя модуля.
+    :return: list - (модуль, собственное время в мкс, общее время в мкс, уровень вложенности) для каждого импорта.
+    """
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                             capture_output=True, text=True)
+    if process.returncode != 0:
+        raise RuntimeError(f'Не удалось импортировать {module}:\n{process.stderr}')
+
+    imports = []
+    for line in process.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            imports.append((name, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return imports
+
+
+def get_own_time_ms(imports: list[tuple[str, int, int, int]]) -> float:
+    """ Функция считает собственное время импорта модулей Configurator (без времени зависимостей).
+
+    :param imports: результат measure_import_time().
+    :return: float - время в мс.
+    """
+    return sum(self_us for name, self_us, _, _ in imports if name.split('.')[0] == OWN_PACKAGE) / 1000
+
+
+def get_lazy_imported(imports: list[tuple[str, int, int, int]]) -> list[str]:
+    """ Функция находит импортированные модули, которые должны загружаться в фоне (LAZY_MODULES).
+
+    :param imports: результат measure_import_time().
+    :return: list[str] - имена модулей.
+    """
+    return sorted({name for name, _, _, _ in imports if name.split('.')[0] in LAZY_MODULES})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS,
+                        help='бюджет собственного времени импорта модулей src.* (мс)')
+    parser.add_argument('--top', type=int, default=15, help='сколько самых долгих пакетов показать')
+    args = parser.parse_args()
+
+    imports = measure_import_time(MODULE)
+    total_ms = sum(self_us for _, self_us, _, _ in imports) / 1000
+    own_ms = get_own_time_ms(imports)
+
+    # модули, импортированные напрямую из проверяемого модуля (уровень 1), с общим временем импорта
+    top_level = sorted(((name, cumulative_us) for name, _, cumulative_us, level in imports if level == 1),
+                       key=lambda item: item[1], reverse=True)
+    print(f'Импорт {MODULE}: {total_ms:.1f} мс, из них {OWN_PACKAGE}.*: {own_ms:.1f} мс '
+          f'(бюджет {args.budget_ms:.0f} мс), модулей: {len(imports)}')
+    for name, cumulative_us in top_level[:args.top]:
+        print(f'{cumulative_us / 1000:10.1f} мс  {name}')
+
+    failed = False
+    lazy_imported = get_lazy_imported(imports)
+    if lazy_imported:
+        print(f'При импорте загружены модули, которые должны загружаться в фоне: {", ".join(lazy_imported[:5])}')
+        failed = True
+    if own_ms > args.budget_ms:
+        print(f'Собственное время импорта больше бюджета на {own_ms - args.budget_ms:.1f} мс')
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+\file markets_formatting.py
+\author github:khanbekov, telegram:qoddrysdaim
+\brief Бенчмарк форматирования маркетов: format_markets + format_assets_labels + select_markets_by_assets
+против однопроходного format_market_data по индексу маркетов
+\data 2026.10.18
+
+Запуск из корня репозитория: python -m benchmarks.markets_formatting
+Сеть не нужна: маркеты генерируются в формате ccxt, по размеру сопоставимые с binance.
+"""
+import timeit
+
+from benchmarks.synthetic_markets import generate_markets
+from src.market_data_obtaining.markets import format_markets, format_assets_labels, format_market_data, \
+    MarketsIndex
+from src.market_data_obtaining.routes import select_markets_by_assets
+
+# Размеры, сопоставимые с binance: ~2000 маркетов, ~500 ассетов
+ASSETS_COUNT = 500
+MARKETS_COUNT = 2000
+CHOSEN_ASSETS_COUNT = 12
+REPEATS = 50
+
+
+def run_coroutine(coroutine):
+    """ Выполнение корутины без цикла событий (корутины форматирования ничего не ожидают),
+    чтобы не измерять накладные расходы на создание цикла событий """
+    try:
+        coroutine.send(None)
+    except StopIteration as e:
+        return e.value
+    raise RuntimeError('Корутина не завершилась за один шаг')
+
+
+def run_old(markets: dict, chosen_assets: list[str]):
+    formatted = run_coroutine(format_markets(markets, True, chosen_assets))
+    labels = run_coroutine(format_assets_labels(markets, chosen_assets))
+    return select_markets_by_assets(formatted, chosen_assets), labels
+
+
+def run_new(markets_index: MarketsIndex, chosen_assets: list[str]):
+    return format_market_data(markets_index, True, chosen_assets)
+
+
+def main():
+    markets = generate_markets(ASSETS_COUNT, MARKETS_COUNT)
+    # ассеты с наибольшим количеством маркетов, чтобы выборка была непустой
+    chosen_assets = [f'A{index}' for index in range(CHOSEN_ASSETS_COUNT)]
+
+    index_time = timeit.timeit(lambda: MarketsIndex(markets), number=REPEATS) / REPEATS
+    markets_index = MarketsIndex(markets)
+
+    old_markets, old_labels = run_old(markets, chosen_assets)
+    new_markets, new_labels = run_new(markets_index, chosen_assets)
+    assert old_markets == new_markets and old_labels == new_labels, 'Результаты не совпадают'
+
+    old_time = timeit.timeit(lambda: run_old(markets, chosen_assets), number=REPEATS) / REPEATS
+    new_time = timeit.timeit(lambda: run_new(markets_index, chosen_assets), number=REPEATS) / REPEATS
+
+    print(f'Маркетов: {len(markets)}, выбрано ассетов: {len(chosen_assets)}, отобрано маркетов: {len(new_markets)}')
+    print(f'format_markets + format_assets_labels + select_markets_by_assets: {old_time * 1000:.3f} мс')
+    print(f'format_market_data (по индексу): {new_time * 1000:.3f} мс')
+    # Отбор маркетов отдельно от создания моделей pydantic: раньше полный обход маркетов был в каждой функции
+    chosen_set = set(chosen_assets)
+    scan_time = timeit.timeit(
+        lambda: [market for market in markets.values()
+                 if market['baseId'] in chosen_set and market['quoteId'] in chosen_set],
+        number=REPEATS) / REPEATS
+    select_time = timeit.timeit(lambda: markets_index.select(chosen_set), number=REPEATS) / REPEATS
+    print(f'Отбор маркетов: полный обход {scan_time * 1000:.3f} мс (x2 в старом варианте), '
+          f'по индексу {select_time * 1000:.3f} мс')
+    print(f'Построение индекса (один раз на загрузку маркетов): {index_time * 1000:.3f} мс')
+    print(f'Ускорение: {old_time / new_time:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
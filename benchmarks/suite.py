@@ -0,0 +1,289 @@
+"""
+\file suite.py
+\author github:khanbekov, telegram:qoddrysdaim
+\brief Набор бенчмарков этапов обработки маркетов и построения торговых маршрутов
+на сгенерированных маркетах (без сети)
+\data 2026.10.18
+
+Запуск из корня репозитория:
+    python -m benchmarks.suite --output before.json
+    python -m benchmarks.suite --baseline before.json --threshold 0.2
+
+Для каждого сочетания параметров (количество ассетов биржи, плотность маркетов, количество торгуемых ассетов,
+режим точности ccxt) измеряется время каждого этапа и пик памяти, выделенной за одно выполнение (tracemalloc).
+Результаты сохраняются в JSON (--output).
+Если указан --baseline, результаты сравниваются с ним по минимальному времени: этап медленнее базового
+больше чем на threshold (и больше чем на --min-delta-ms), или с другим количеством результатов
+(маркетов, маршрутов) - ошибка, код выхода 1.
+"""
+import argparse
+import datetime
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Callable, NamedTuple
+
+from benchmarks.markets_formatting import run_coroutine
+from benchmarks.synthetic_markets import generate_markets, PRECISION_MODES
+from src.api.rendered_responses import render_json, build_configs_data
+from src.api.utils import handle_precision
+from src.market_data_obtaining.markets import format_markets, format_assets_labels, format_market_data, \
+    MarketsIndex
+from src.market_data_obtaining.routes import select_markets_by_assets, route_sequence_to_route, \
+    enumerate_route_sequences, construct_routes, encode_routes_compact
+from src.responses_models.api_responses import RoutesFormat, JsonFormat
+
+# Параметры по умолчанию: количество ассетов биржи, маркетов на ассет, количество торгуемых ассетов
+DEFAULT_ASSETS = (100, 500, 2000)
+DEFAULT_DENSITY = 4.0
+DEFAULT_TRADED_ASSETS = (5, 6, 7)
+# Параметры для быстрого запуска (--quick)
+QUICK_ASSETS = (100, 500)
+QUICK_TRADED_ASSETS = (5, 6)
+
+# Минимальное время одного измерения: быстрые этапы выполняются несколько раз подряд
+MIN_MEASURE_TIME = 0.05
+
+
+class StageResult(NamedTuple):
+    """ Результат измерения этапа
+
+    key: str - этап и параметры (по нему сравниваются результаты разных запусков)
+    stage: str - название этапа
+    params: dict - параметры
+    items: int - количество результатов этапа (маркетов, маршрутов), должно совпадать между запусками
+    number: int - сколько раз этап выполнялся в одном измерении
+    min_ms: float - минимальное время одного выполнения
+    median_ms: float - медианное время одного выполнения
+    peak_kb: float - пик памяти, выделенной за одно выполнение (КиБ)
+    """
+    key: str
+    stage: str
+    params: dict
+    items: int
+    number: int
+    min_ms: float
+    median_ms: float
+    peak_kb: float
+
+
+def measure_peak_memory(function: Callable[[], object]) -> float:
+    """ Функция измеряет пик памяти, выделенной за одно выполнение function (результат тоже учитывается).
+
+    :param function: измеряемая функция без аргументов.
+    :return: пик выделенной памяти в КиБ.
+    """
+    tracemalloc.start()
+    try:
+        result = function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak / 1024
+
+
+def measure(function: Callable[[], object], repeat: int) -> tuple[int, float, float]:
+    """ Функция измеряет время выполнения function.
+    Количество выполнений в одном измерении подбирается так, чтобы измерение длилось не меньше MIN_MEASURE_TIME.
+
+    :param function: измеряемая функция без аргументов.
+    :param repeat: количество измерений.
+    :return: количество выполнений в измерении, минимальное и медианное время одного выполнения в мс.
+    """
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_MEASURE_TIME:
+            break
+        number *= 2 if elapsed * 10 >= MIN_MEASURE_TIME else 10
+
+    samples = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        samples.append((time.perf_counter() - start) / number)
+    return number, min(samples) * 1000, statistics.median(samples) * 1000
+
+
+def make_key(stage: str, params: dict) -> str:
+    return '/'.join([stage] + [f'{name}={value}' for name, value in params.items()])
+
+
+def run_configuration(assets_count: int, density: float, traded_assets_count: int, precision_modes: list[str],
+                      repeat: int) -> list[StageResult]:
+    """ Функция измеряет все этапы для одного сочетания параметров.
+    Этапы, которые зависят от режима точности, измеряются для каждого режима, остальные - один раз.
+
+    :param assets_count: количество ассетов биржи.
+    :param density: количество маркетов на ассет.
+    :param traded_assets_count: количество торгуемых ассетов (ассеты с наибольшим количеством маркетов).
+    :param precision_modes: режимы точности ccxt.
+    :param repeat: количество измерений этапа.
+    :return: list[StageResult] - результаты.
+    """
+    markets_count = int(assets_count * density)
+    chosen_assets = [f'A{index}' for index in range(traded_assets_count)]
+    results: list[StageResult] = []
+
+    def add_result(stage: str, params: dict, items: int, function: Callable[[], object]):
+        number, min_ms, median_ms = measure(function, repeat)
+        results.append(StageResult(make_key(stage, params), stage, params, items, number,
+                                   round(min_ms, 6), round(median_ms, 6), round(measure_peak_memory(function), 1)))
+
+    markets, is_decimal_precision = {}, True
+    for precision_mode in precision_modes:
+        markets = generate_markets(assets_count, markets_count, precision_mode=precision_mode)
+        is_decimal_precision = precision_mode == 'decimal_places'
+        params = {'assets': assets_count, 'markets': len(markets), 'traded': traded_assets_count,
+                  'precision': precision_mode}
+        precisions = [value for market in markets.values()
+                      for value in (market['precision']['price'], market['precision']['amount'])]
+        markets_index = MarketsIndex(markets)
+        formatted, labels = format_market_data(markets_index, is_decimal_precision, chosen_assets)
+
+        add_result('handle_precision', params, len(precisions),
+                   lambda: [handle_precision(value, is_decimal_precision) for value in precisions])
+        add_result('format_markets', params, len(formatted),
+                   lambda: run_coroutine(format_markets(markets, is_decimal_precision, chosen_assets)))
+        add_result('format_assets_labels', params, len(labels),
+                   lambda: run_coroutine(format_assets_labels(markets, chosen_assets)))
+        add_result('markets_index', params, len(markets_index.markets), lambda: MarketsIndex(markets))
+        add_result('format_market_data', params, len(formatted),
+                   lambda: format_market_data(markets_index, is_decimal_precision, chosen_assets))
+
+    # построение маршрутов не зависит от режима точности (маркеты те же, отличается только точность)
+    params = {'assets': assets_count, 'markets': len(markets), 'traded': traded_assets_count}
+    formatted, _ = format_market_data(MarketsIndex(markets), is_decimal_precision, chosen_assets)
+    selected = select_markets_by_assets(formatted, chosen_assets)
+    sequences = [tuple(selected[index] for index in sequence)
+                 for _, _, sequence, _ in enumerate_route_sequences(formatted, chosen_assets,
+                                                                    list(range(len(selected))))]
+    routes = construct_routes(formatted, chosen_assets)
+
+    add_result('select_markets_by_assets', params, len(selected),
+               lambda: select_markets_by_assets(formatted, chosen_assets))
+    add_result('route_sequence_to_route', params, len(sequences),
+               lambda: [route_sequence_to_route(sequence) for sequence in sequences])
+    add_result('construct_routes', params, len(routes), lambda: construct_routes(formatted, chosen_assets))
+    add_result('encode_routes_compact', params, len(routes), lambda: list(encode_routes_compact(formatted, routes)))
+    for routes_format in RoutesFormat:
+        add_result('serialize', {**params, 'routes_format': routes_format.value}, len(routes),
+                   lambda: render_json(build_configs_data(formatted, labels, routes, {}, routes_format),
+                                       JsonFormat.compact))
+    return results
+
+
+def get_commit() -> str | None:
+    """ Текущий коммит git (None, если не удалось получить) """
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(results: list[StageResult], baseline: dict, threshold: float, min_delta_ms: float) -> list[str]:
+    """ Функция сравнивает результаты с базовыми.
+
+    :param results: результаты текущего запуска.
+    :param baseline: содержимое JSON базового запуска.
+    :param threshold: допустимое относительное замедление (0.2 - на 20%).
+    :param min_delta_ms: замедление меньше этого значения (мс) не считается ошибкой (шум измерений).
+    :return: list[str] - описания ошибок (пустой список, если ошибок нет).
+    """
+    baseline_results = {result['key']: result for result in baseline['results']}
+    errors = []
+
+    print(f'\nСравнение с {baseline.get("commit") or "базовым запуском"} (допустимо +{threshold:.0%}):')
+    for result in results:
+        old = baseline_results.get(result.key)
+        if old is None:
+            continue
+        # сравнивается минимальное время: оно меньше всего зависит от фоновой нагрузки
+        ratio = result.min_ms / old['min_ms'] if old['min_ms'] else 1.0
+        # память только выводится (в старых результатах ее может не быть)
+        memory = f', {old["peak_kb"]:.0f} -> {result.peak_kb:.0f} КиБ' if old.get('peak_kb') is not None else ''
+        mark = ''
+        if result.items != old['items']:
+            mark = '  <- другой результат'
+            errors.append(f'{result.key}: количество результатов {old["items"]} -> {result.items}')
+        elif ratio > 1 + threshold and result.min_ms - old['min_ms'] > min_delta_ms:
+            mark = '  <- замедление'
+            errors.append(f'{result.key}: {old["min_ms"]:.3f} мс -> {result.min_ms:.3f} мс ({ratio:.2f}x)')
+        print(f'{result.key:<75} {old["min_ms"]:>10.3f} -> {result.min_ms:>10.3f} мс ({ratio:.2f}x){memory}{mark}')
+    return errors
+
+
+def parse_ints(value: str) -> tuple[int, ...]:
+    return tuple(int(item) for item in value.split(','))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--assets', type=parse_ints, default=DEFAULT_ASSETS,
+                        help='количество ассетов биржи через запятую')
+    parser.add_argument('--density', type=float, default=DEFAULT_DENSITY, help='количество маркетов на ассет')
+    parser.add_argument('--traded', type=parse_ints, default=DEFAULT_TRADED_ASSETS,
+                        help='количество торгуемых ассетов через запятую')
+    parser.add_argument('--precision', choices=PRECISION_MODES, action='append',
+                        help='режим точности ccxt (по умолчанию оба)')
+    parser.add_argument('--repeat', type=int, default=5, help='количество измерений каждого этапа')
+    parser.add_argument('--quick', action='store_true',
+                        help=f'быстрый запуск: ассеты {QUICK_ASSETS}, торгуемые ассеты {QUICK_TRADED_ASSETS}')
+    parser.add_argument('--output', help='файл для сохранения результатов (JSON)')
+    parser.add_argument('--baseline', help='файл с результатами для сравнения (JSON)')
+    parser.add_argument('--threshold', type=float, default=0.2, help='допустимое относительное замедление')
+    parser.add_argument('--min-delta-ms', type=float, default=0.05,
+                        help='замедление меньше этого значения не считается ошибкой')
+    args = parser.parse_args()
+
+    assets_counts = QUICK_ASSETS if args.quick else args.assets
+    traded_counts = QUICK_TRADED_ASSETS if args.quick else args.traded
+    precision_modes = args.precision or list(PRECISION_MODES)
+
+    results: list[StageResult] = []
+    for assets_count in assets_counts:
+        for traded_assets_count in traded_counts:
+            for result in run_configuration(assets_count, args.density, traded_assets_count, precision_modes,
+                                            args.repeat):
+                print(f'{result.key:<75} {result.median_ms:>10.3f} мс (min {result.min_ms:.3f}, '
+                      f'{result.peak_kb:.0f} КиБ, результатов: {result.items})')
+                results.append(result)
+
+    report = {
+        'commit': get_commit(),
+        'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'args': {'assets': assets_counts, 'density': args.density, 'traded': traded_counts,
+                 'precision': precision_modes, 'repeat': args.repeat},
+        'results': [result._asdict() for result in results],
+    }
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=4)
+        print(f'\nРезультаты сохранены в {args.output}')
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        errors = compare_results(results, baseline, args.threshold, args.min_delta_ms)
+        if errors:
+            print('\nРегрессии:')
+            for error in errors:
+                print(f'  {error}')
+            sys.exit(1)
+        print('\nРегрессий нет.')
+
+
+if __name__ == '__main__':
+    main()
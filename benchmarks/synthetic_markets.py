@@ -0,0 +1,63 @@
+"""
+\file synthetic_markets.py
+\author github:khanbekov, telegram:qoddrysdaim
+\brief Генерация маркетов в формате ccxt (Exchange.markets) для бенчмарков без обращения к бирже
+\data 2026.10.18
+
+Маркеты устроены как на реальных биржах: котируемые ассеты берутся из небольшого набора
+(первые quotes_count ассетов, аналог USDT, BTC, ETH, BNB...), базовые - из всех ассетов.
+Поэтому первые ассеты связаны между собой плотнее всего, и торговые маршруты строятся по ним.
+"""
+import random
+
+# Режимы точности ccxt: DECIMAL_PLACES - количество знаков после запятой (int), TICK_SIZE - шаг цены (float)
+PRECISION_MODES = ('decimal_places', 'tick_size')
+
+
+def generate_markets(assets_count: int, markets_count: int, seed: int = 0, precision_mode: str = 'decimal_places',
+                     quotes_count: int = 8) -> dict:
+    """ Функция генерирует словарь маркетов в формате ccxt (Exchange.markets)
+
+    :param assets_count: количество ассетов.
+    :param markets_count: количество маркетов (не больше количества возможных пар).
+    :param seed: начальное значение генератора случайных чисел.
+    :param precision_mode: режим точности (см. PRECISION_MODES).
+    :param quotes_count: количество котируемых ассетов.
+    :return: dict - маркеты в формате ccxt.
+    """
+    rnd = random.Random(seed)
+    assets = [f'A{index}' for index in range(assets_count)]
+    quotes = assets[:min(quotes_count, assets_count)]
+    # пары котируемых ассетов между собой считаются один раз (есть A/B, но нет B/A)
+    markets_count = min(markets_count, len(quotes) * (assets_count - 1) - len(quotes) * (len(quotes) - 1) // 2)
+
+    markets = {}
+    while len(markets) < markets_count:
+        base = rnd.choice(assets)
+        quote = rnd.choice(quotes)
+        if base == quote or f'{quote}/{base}' in markets:
+            continue
+
+        price_digits, amount_digits = rnd.randint(0, 8), rnd.randint(0, 8)
+        if precision_mode == 'tick_size':
+            precision = {'price': 10.0 ** -price_digits, 'amount': 10.0 ** -amount_digits}
+        else:
+            precision = {'price': price_digits, 'amount': amount_digits}
+
+        markets[f'{base}/{quote}'] = {
+            'id': f'{base}{quote}',
+            'symbol': f'{base}/{quote}',
+            'base': base,
+            'quote': quote,
+            'baseId': base,
+            'quoteId': quote,
+            'type': 'spot',
+            'precision': precision,
+            'limits': {
+                'amount': {'min': 0.001, 'max': 100000.0},
+                'price': {'min': 0.0001, 'max': 1000000.0},
+                'cost': {'min': 10.0, 'max': None},
+                'leverage': {'min': None, 'max': None},
+            },
+        }
+    return markets
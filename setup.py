@@ -6,9 +6,8 @@
 """
 import uvicorn
 
-from src.api.api import app
-from src.settings import LOGGING_CONFIG
+from src.settings import LOGGING_CONFIG, SERVER_WORKERS
 
 if __name__ == '__main__':
-    # запуск сервера
-    uvicorn.run(app, host='0.0.0.0', port=8000, log_config=LOGGING_CONFIG)
\ No newline at end of file
+    # запуск сервера. Приложение передается строкой, чтобы каждый процесс uvicorn импортировал его сам
+    uvicorn.run('src.api.api:app', host='0.0.0.0', port=8000, workers=SERVER_WORKERS, log_config=LOGGING_CONFIG)
\ No newline at end of file
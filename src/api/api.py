@@ -4,54 +4,76 @@
 \brief В файле загружается конфигурация API, логгирования, создается инициализируется API и его эндпоинты
 \data 2022.03.12
 """
+import asyncio
 import json
-import os.path
+import os
 import typing
+from typing import Iterator, AsyncIterator
 
-import ccxt
 import fastapi
-from fastapi.responses import JSONResponse
-import tomli as tomli
-
-from src.api.utils import get_jsons_from_dir, get_micro_timestamp, check_update_of_dir
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from src.api.change_notifier import change_notifier
+from src.api.compression import choose_encoding, compress_rendered_response
+from src.api.config_snapshots import config_snapshots, ConfigSnapshot
+from src.api.config_watcher import config_watcher
+from src.api.endpoint_settings import endpoint_settings, EndpointSettings
+from src.api.config_history import config_history
+from src.api.metrics import metrics, MetricsMiddleware, METRICS_CONTENT_TYPE, STAGE_DURATION, ROUTES_COUNT, \
+    RESPONSE_BYTES, CACHE_REQUESTS, collect_aeron_metrics
+from src.api.shared_state import shared_state
+from src.api.rendered_responses import rendered_responses, render_json, split_rendered_response, RenderedResponse, \
+    build_configs_data
+from src.api.utils import get_micro_timestamp, check_update_of_dir, check_etag_match
 from src.logger.logger import logger
-from src.market_data_obtaining.markets import get_exchange_by_id, check_existence_of_exchange, format_markets, \
-    format_assets_labels
-from src.market_data_obtaining.routes import construct_routes
-from src.responses_models.api_errors import ExchangeNotFound, ConfigsNotFound, FileNotFound, JsonDecodeError
-from src.responses_models.api_responses import ConfigsResponse, ConfigsResponseData, init_response
-from src.settings import PATH_TO_TRADE_SERVERS_CONFIGS, API_CONFIGURATION_PATH
+from src.logger.aeron_probe import probe_aeron
+from src.market_data_obtaining.markets import check_existence_of_exchange, format_market_data, load_ccxt
+from src.market_data_obtaining.markets_cache import markets_cache
+from src.market_data_obtaining.routes import encode_routes_compact, make_routes_filter, get_routes_filter_key, \
+    RoutesFilter, NO_ROUTES_FILTER
+from src.market_data_obtaining.routes_cache import get_routes, iterate_cached_routes
+from src.market_data_obtaining.routes_pool import shutdown_routes_executor
+from src.responses_models.api_errors import ExchangeNotFound, ConfigsNotFound, UnexpectedError
+from src.responses_models.api_requests import BatchRequest
+from src.responses_models.api_responses import ConfigsResponse, StreamFormat, RoutesFormat, JsonFormat, \
+    WatchMode, WatchResponse, BatchResponse
+from src.responses_models.market_models import AssetLabel, MarketRecord
+from src.settings import PATH_TO_TRADE_SERVERS_CONFIGS, COMPRESSION_MIN_SIZE, WATCH_MAX_TIMEOUT, \
+    WATCH_SSE_PING_INTERVAL, AERON_PROBE, AERON_DIR
 
 # Путь до директории с конфигурациями торговых серверов
 path_to_trade_servers_configs = PATH_TO_TRADE_SERVERS_CONFIGS
 
 # Создание приложения fastapi
 app = fastapi.FastAPI()
-
-# словарь для хранения времени последнего обновления конфигурации core и gate
-# строится следующим образом:
-# str - exchange_id + instance; Пример: binance1
-# float - время изменения, os.path.getmtime()
-# Значение в словаре обновляется при каждом запросе этих конфигов
-configs_update_time_dict: dict[str, float] = {}
+# Время обработки запросов для /metrics
+app.add_middleware(MetricsMiddleware)
+# Счетчики отправки логов по Aeron для /metrics
+metrics.add_collector(collect_aeron_metrics)
 
 
 class IndentedEncoder(JSONResponse):
     def render(self, content: typing.Any) -> bytes:
-        return json.dumps(
-            content,
-            ensure_ascii=False,
-            allow_nan=False,
-            indent=4,
-            separators=(",", ":"),
-        ).encode("utf-8")
+        return render_json(content, JsonFormat.indented)
 
 
 @app.get('/{exchange_id}/{instance}', response_model=ConfigsResponse, response_class=IndentedEncoder)
 async def endpoint_get_configs(
         exchange_id: str,
         instance: str,
-        only_new: bool | None = True) -> ConfigsResponse:
+        only_new: bool | None = True,
+        stream: StreamFormat | None = None,
+        routes_format: RoutesFormat = RoutesFormat.verbose,
+        json_format: JsonFormat = JsonFormat.indented,
+        since: str | None = None,
+        min_route_length: int | None = fastapi.Query(None, ge=3),
+        max_route_length: int | None = fastapi.Query(None, ge=3),
+        start_asset: str | None = None,
+        include_markets: list[str] | None = fastapi.Query(None),
+        exclude_markets: list[str] | None = fastapi.Query(None),
+        if_none_match: str | None = fastapi.Header(None),
+        accept_encoding: str | None = fastapi.Header(None)) -> StreamingResponse | fastapi.Response:
     """ Главный эндпоинт Configurator.
         Возвращает данные, включая: список маркетов, ассетов, торговых маршрутов,
         конфигураций gate и core.
@@ -67,31 +89,138 @@ async def endpoint_get_configs(
     :param instance: название инстанса торгового сервера.
     :param only_new: по умолчанию True. Если True, возвращает данные только
     если есть изменения с последнего запроса.
-    :return: ConfigsResponse - структура с конфигурацией для торгового сервера.
+    :param stream: потоковый формат ответа. Если ndjson - ответ отдается построчно
+    (см. iterate_ndjson_response()), торговые маршруты отдаются по мере построения.
+    :param routes_format: формат торговых маршрутов. По умолчанию verbose - список объектов RouteStep,
+    compact - список пар [индекс маркета, 0 - sell / 1 - buy] (см. routes.encode_routes_compact()).
+    :param json_format: формат JSON ответа. По умолчанию indented - с отступами, compact - в одну строку
+    (сериализуется быстрее). Не влияет на потоковый ответ.
+    :param since: версия данных, которая есть у клиента (заголовок X-Config-Version предыдущего ответа).
+    Если версия есть в истории, возвращается RFC 6902 JSON Patch до текущей версии (application/json-patch+json),
+    иначе - все данные. Не влияет на потоковый ответ.
+    :param min_route_length: минимальная длина торгового маршрута (количество шагов, не меньше 3).
+    :param max_route_length: максимальная длина торгового маршрута. Если меньше min_route_length - маршрутов нет.
+    :param start_asset: ассет, с которого начинаются торговые маршруты (source_asset первого шага).
+    :param include_markets: маркеты (common_symbol, параметр повторяется), по которым строятся торговые маршруты.
+    Если не указан - все маркеты.
+    :param exclude_markets: маркеты (common_symbol, параметр повторяется), которые не используются в маршрутах.
+    Фильтры маршрутов применяются во время построения маршрутов (см. routes.RoutesFilter),
+    список маркетов в ответе не меняется.
+    :param if_none_match: заголовок If-None-Match. Если он совпадает с текущим ETag конфигурации,
+    возвращается 304 без обращения к файловой системе. Если заголовок указан, но не совпадает,
+    возвращаются данные (свежесть определяется по ETag клиента, а не по предыдущим запросам).
+    :param accept_encoding: заголовок Accept-Encoding. Ответ с данными сжимается gzip или zstd,
+    если клиент их поддерживает (см. compression.py).
+    :return: ConfigsResponse (сериализованный в JSON) - структура с конфигурацией для торгового сервера.
     """
-
-    # Загрузка конфигурации для этого эндпоинта
-    with open(API_CONFIGURATION_PATH, "rb") as f:
-        api_configuration = tomli.load(f)
-
-    default_header = {
-        'exchange': exchange_id,
-        'node': api_configuration["data"]["default"]["node"],
-        'algo': api_configuration["data"]["default"]["algo"],
-        'instance': instance,
-    }
-
-    # Имя файла со списком ассетов
-    assets_filename = api_configuration["data"]["assets_filename"]
-    # Имя файла с описанием основных полей response
-    header_filename = api_configuration["data"]["header_filename"]
     # Название торгового сервера (exchange_id/instance)
     trade_server_name = f'{exchange_id}/{instance}'
     # Путь к конфигурации конкретного торгового сервера
     path_to_config = f'{path_to_trade_servers_configs}/{trade_server_name}'
 
+    # Фильтр торговых маршрутов из параметров запроса
+    routes_filter = make_routes_filter(min_route_length, max_route_length, start_asset, include_markets,
+                                       exclude_markets)
+
+    # Версия данных, которые будут отданы. Вычисляется только по состоянию в памяти
+    data_version = get_data_version(exchange_id, path_to_config)
+    etag = get_configs_etag(data_version, stream, routes_format, json_format, routes_filter)
+    if if_none_match is not None and check_etag_match(if_none_match, etag):
+        return fastapi.Response(status_code=304, headers={'ETag': etag})
+
+    # Текущие настройки эндпоинта (перезагружаются при изменении config.toml)
+    settings = endpoint_settings.current
+
     logger.info(f'Получен новый запрос на endpoint /{trade_server_name}')
 
+    # Получение скомпилированной конфигурации торгового сервера (компилируется, только если директория изменилась)
+    snapshot = get_trade_server_snapshot(exchange_id, instance, settings)
+
+    # Проверка, есть ли обновления конфигурации (обновилась ли с последнего запроса).
+    # Если клиент передал If-None-Match или since, свежесть определяется по версии, которая есть у клиента
+    is_configs_updated = if_none_match is not None or since is not None or check_update_of_dir(path_to_config)
+
+    # Все необходимые проверки пройдены, создаю объект response API
+    response = ConfigsResponse(**snapshot.header)
+    response.event = settings.event
+    response.timestamp = get_micro_timestamp()
+
+    # Если нужно вернуть свежую конфигурацию, но свежей конфигурации нет
+    if not is_configs_updated and only_new:
+        response.data = None
+        response.message = settings.no_fresh_message
+        response.action = settings.fresh_action
+        logger.info(f'Нет обновлений в конфигурации.')
+
+        if stream == StreamFormat.ndjson:
+            return StreamingResponse(iterate_ndjson_response(response, None, routes_format),
+                                     media_type='application/x-ndjson')
+        return fastapi.Response(render_json(jsonable_encoder(response), json_format), media_type='application/json')
+
+    # Конфигурация обновилась, или можно вернуть не обновленную конфигурацию, собираю данные для ответа
+    response.message = settings.fresh_message
+    response.action = settings.fresh_action
+
+    # Возвращаю потоковый ответ на запрос. Торговые маршруты будут построены во время отдачи ответа
+    if stream == StreamFormat.ndjson:
+        parts = await collect_configs_parts(exchange_id, snapshot)
+        logger.info(f'Собраны все данные.')
+        return StreamingResponse(iterate_ndjson_response(response, parts, routes_format, routes_filter),
+                                 media_type='application/x-ndjson',
+                                 headers={'ETag': etag, **get_markets_age_headers(exchange_id)})
+
+    # Тело ответа сериализуется один раз для каждой версии данных (ETag), для запроса меняется только timestamp
+    rendered = await get_rendered_configs(exchange_id, path_to_config, snapshot, settings, data_version,
+                                          routes_format, json_format, routes_filter)
+
+    headers = {'ETag': etag, 'X-Config-Version': data_version, 'Vary': 'Accept-Encoding',
+               **get_markets_age_headers(exchange_id)}
+
+    # Если у клиента есть одна из последних версий, возвращаю только изменения (JSON Patch)
+    if since is not None:
+        history_key = (path_to_config, routes_format.value, get_routes_filter_key(routes_filter))
+        patch = config_history.get_patch(history_key, since, data_version)
+        if patch is not None:
+            logger.info(f'Отправлены изменения с версии {since}.')
+            return await render_response(patch, 'application/json-patch+json', headers, accept_encoding,
+                                         exchange_id)
+        logger.info(f'Версии {since} нет в истории, отправлены все данные.')
+
+    # Возвращаю ответ на запрос
+    return await render_response(rendered, 'application/json', headers, accept_encoding, exchange_id)
+
+
+def get_markets_age_headers(exchange_id: str) -> dict:
+    """ Функция возвращает заголовок X-Markets-Age - возраст маркетов биржи в секундах,
+    если маркеты устарели (биржа недоступна, отдаются последние загруженные маркеты или маркеты из снимка).
+
+    :param exchange_id: название биржи по ccxt
+    :return: dict - заголовок X-Markets-Age или пустой словарь, если маркеты не устарели
+    """
+    markets_age = markets_cache.get_stale_age(exchange_id)
+    return {'X-Markets-Age': str(int(markets_age))} if markets_age is not None else {}
+
+
+def get_trade_server_snapshot(exchange_id: str, instance: str, settings: EndpointSettings) -> ConfigSnapshot:
+    """ Функция проверяет биржу и возвращает скомпилированную конфигурацию торгового сервера
+    (компилируется, только если директория изменилась).
+
+    :param exchange_id: название биржи по ccxt
+    :param instance: название инстанса торгового сервера
+    :param settings: текущие настройки эндпоинта
+    :return: ConfigSnapshot - снимок конфигурации
+    :raises fastapi.HTTPException: исключения из api_errors (биржи нет в ccxt, конфигурация не найдена или некорректна)
+    """
+    trade_server_name = f'{exchange_id}/{instance}'
+    path_to_config = f'{path_to_trade_servers_configs}/{trade_server_name}'
+
+    default_header = {
+        'exchange': exchange_id,
+        'node': settings.default_node,
+        'algo': settings.default_algo,
+        'instance': instance,
+    }
+
     # Проверка, доступна ли такая биржа в списках ccxt
     is_exchange_existence = check_existence_of_exchange(exchange_id)
 
@@ -101,117 +230,429 @@ async def endpoint_get_configs(
                      f"е удалось обработать запрос к /{trade_server_name}")
         raise ExchangeNotFound(exchange_id)
 
-    # Проверка, существует ли директория для этого торгового сервера (предусловие get_dir_last_change_time())
-    if not os.path.isdir(path_to_config):
-        # Возвращаю ответ, что конфигурации для такого торгового сервера нет.
-        logger.error(f"Не найдена конфигурация для {trade_server_name}.")
-        raise ConfigsNotFound(path_to_config)
+    with STAGE_DURATION.time('snapshot', exchange_id):
+        return config_snapshots.get_snapshot(trade_server_name, path_to_config, settings.assets_filename,
+                                             settings.header_filename, default_header)
 
-    # Проверка, есть ли список ассетов для это торгового сервера
-    if not os.path.isfile(f'{path_to_config}/{assets_filename}'):
-        # Возвращаю ответ, что для сервера отсутствуют ассеты.
-        logger.error(f'Не найден файл {assets_filename} для {trade_server_name}.')
-        raise FileNotFound(trade_server_name, assets_filename)
 
-    # Проверка, есть ли файл с описанием полей response для торгового сервера (если нет, создаю его)
-    if not os.path.isfile(f'{path_to_config}/{header_filename}'):
-        # Автоматически создаю и заполняю файл с описанием полей response, содержащий информацию о полях response
-        with open(f'{path_to_config}/{header_filename}', 'w') as header_file:
-            json.dump(default_header, header_file, indent=4)
+async def get_rendered_configs(exchange_id: str, path_to_config: str, snapshot: ConfigSnapshot,
+                               settings: EndpointSettings, data_version: str,
+                               routes_format: RoutesFormat, json_format: JsonFormat,
+                               routes_filter: RoutesFilter = NO_ROUTES_FILTER) -> RenderedResponse:
+    """ Функция возвращает сериализованный ответ с данными торгового сервера.
+    Тело ответа сериализуется один раз для каждой версии данных (ETag) и сохраняется в истории версий.
+    ETag вычислен до сбора данных, поэтому тело под этим ETag может быть только новее, но не старее.
 
-        # Уведомляю, что у торгового сервера нет файла с описанием полей response и он создан автоматически.
-        logger.warning(f"Не найден файл {header_filename} для {trade_server_name}. Он был и заполнен автоматически.")
+    :param exchange_id: название биржи по ccxt
+    :param path_to_config: путь до директории конфигурации торгового сервера
+    :param snapshot: скомпилированная конфигурация торгового сервера
+    :param settings: текущие настройки эндпоинта
+    :param data_version: версия данных торгового сервера (get_data_version())
+    :param routes_format: формат торговых маршрутов
+    :param json_format: формат JSON ответа
+    :param routes_filter: фильтр торговых маршрутов
+    :return: RenderedResponse - тело ответа (без значения timestamp)
+    """
+    etag = get_configs_etag(data_version, None, routes_format, json_format, routes_filter)
+    filter_key = get_routes_filter_key(routes_filter)
+    rendered_key = (path_to_config, routes_format.value, json_format.value, filter_key)
+    rendered = rendered_responses.get(rendered_key, etag)
+    if rendered is not None:
+        CACHE_REQUESTS.inc('rendered', 'hit')
+        return rendered
+    CACHE_REQUESTS.inc('rendered', 'miss')
+
+    response = ConfigsResponse(**snapshot.header)
+    response.event = settings.event
+    response.message = settings.fresh_message
+    response.action = settings.fresh_action
+    data = await collect_configs_data(exchange_id, snapshot, routes_format, routes_filter)
+
+    with STAGE_DURATION.time('serialize', exchange_id):
+        # заголовок сериализуется через модель, data уже собрано в виде для сериализации
+        content = jsonable_encoder(response)
+        content['data'] = data
+        rendered = split_rendered_response(etag, render_json(content, json_format))
+    rendered_responses.put(rendered_key, rendered)
+    config_history.record((path_to_config, routes_format.value, filter_key), data_version, content)
+    logger.info(f'Собраны все данные.')
+    return rendered
+
+
+async def render_response(rendered: RenderedResponse, media_type: str, headers: dict,
+                          accept_encoding: str | None, exchange_id: str) -> fastapi.Response:
+    """ Функция собирает ответ из сериализованного тела с текущим timestamp.
+    Сжатый вариант тела собирается один раз для версии данных и выбирается по заголовку Accept-Encoding.
+
+    :param rendered: сериализованное тело ответа.
+    :param media_type: тип содержимого ответа.
+    :param headers: заголовки ответа.
+    :param accept_encoding: заголовок Accept-Encoding запроса.
+    :param exchange_id: название биржи по ccxt (метка метрик).
+    :return: fastapi.Response - ответ.
+    """
+    encoding = choose_encoding(accept_encoding) if rendered.size >= COMPRESSION_MIN_SIZE else None
+    if encoding is None:
+        body = rendered.render(get_micro_timestamp())
+        RESPONSE_BYTES.observe(len(body), exchange_id, 'identity')
+        return fastapi.Response(body, media_type=media_type, headers=headers)
+
+    compressed = rendered.compressed.get(encoding)
+    if compressed is None:
+        CACHE_REQUESTS.inc('compressed', 'miss')
+        with STAGE_DURATION.time('compress', exchange_id):
+            compressed = await asyncio.to_thread(compress_rendered_response, rendered, encoding)
+        rendered.compressed[encoding] = compressed
+    else:
+        CACHE_REQUESTS.inc('compressed', 'hit')
+    body = compressed.render(get_micro_timestamp())
+    RESPONSE_BYTES.observe(len(body), exchange_id, encoding)
+    return fastapi.Response(body, media_type=media_type, headers={**headers, 'Content-Encoding': encoding})
 
-    # Проверка, есть ли обновления конфигурации (обновилась ли с последнего запроса)
-    is_configs_updated = check_update_of_dir(path_to_config)
 
-    try:
-        # Все необходимые проверки пройдены, создаю объект response API
-        response: ConfigsResponse = init_response(f'{path_to_config}/{header_filename}', default_header)
-    except json.decoder.JSONDecodeError:
-        raise JsonDecodeError(f'{path_to_config}/{header_filename}')
+def get_data_version(exchange_id: str, path_to_config: str) -> str:
+    """ Функция вычисляет версию данных торгового сервера без обращения к файловой системе.
+    Версия состоит из идентификатора запуска Configurator (после перезапуска версии начинаются заново),
+    версии директории торгового сервера, версии маркетов биржи и версии настроек эндпоинта.
 
-    response.event = api_configuration['endpoint']['main']['event']
-    response.timestamp = get_micro_timestamp()
+    :param exchange_id: название биржи по ccxt
+    :param path_to_config: путь до директории конфигурации торгового сервера
+    :return: str - версия данных (заголовок X-Config-Version, параметр запроса since)
+    """
+    config_version = config_watcher.get_version(path_to_config)
+    markets_version = markets_cache.get_version(exchange_id)
+    settings_version = endpoint_settings.current.version
+    return f'{shared_state.boot_id}-{config_version}-{markets_version}-{settings_version}'
+
+
+def get_configs_etag(data_version: str, stream: StreamFormat | None,
+                     routes_format: RoutesFormat, json_format: JsonFormat = JsonFormat.indented,
+                     routes_filter: RoutesFilter = NO_ROUTES_FILTER) -> str:
+    """ Функция вычисляет ETag ответа: версия данных (get_data_version()), формат ответа и фильтр маршрутов.
+    Поле timestamp в ETag не учитывается.
+
+    :param data_version: версия данных торгового сервера
+    :param stream: потоковый формат ответа
+    :param routes_format: формат торговых маршрутов
+    :param json_format: формат JSON ответа (не учитывается для потокового ответа)
+    :param routes_filter: фильтр торговых маршрутов (пустой фильтр не меняет ETag)
+    :return: str - слабый ETag (W/"...")
+    """
+    stream_format = stream.value if stream is not None else json_format.value
+    etag = f'{data_version}-{stream_format}-{routes_format.value}'
+    filter_key = get_routes_filter_key(routes_filter)
+    if filter_key:
+        etag += f'-{filter_key}'
+    return f'W/"{etag}"'
 
-    # Если конфигурация обновилась, или можно вернуть не обновленную конфигурацию, собираю данные для ответа
-    if is_configs_updated or not only_new:
-        try:
-            response.data = await collect_configs_data(exchange_id, path_to_config, assets_filename)
-        except JsonDecodeError as e:
-            raise e
 
-        response.message = api_configuration['endpoint']['main']['fresh']['message']
-        response.action = api_configuration['endpoint']['main']['fresh']['action']
-        logger.info(f'Собраны все данные.')
+async def collect_configs_data(exchange_id: str, snapshot: ConfigSnapshot,
+                               routes_format: RoutesFormat = RoutesFormat.verbose,
+                               routes_filter: RoutesFilter = NO_ROUTES_FILTER) -> dict:
+    """ Функция собирает данные для эндпоинта /<exchange_id>/<instance>
 
-    # Если нужно вернуть свежую конфигурацию, но свежей конфигурации нет
-    else:
-        response.data = None
-        response.message = api_configuration['endpoint']['main']['no_fresh']['message']
-        response.action = api_configuration['endpoint']['main']['fresh']['action']
-        logger.info(f'Нет обновлений в конфигурации.')
+    Предусловие: биржа exchange_id существует, и доступна через CCXT
 
-    # Возвращаю ответ на запрос
-    return response
+    Алгоритм загрузки данных:
+        1-4, 6. Сбор данных, кроме торговых маршрутов (collect_configs_parts())
+        5. Составление routes - списки маршрутов по заданным ассетам
+        7. Объединяю собранные данные в поле data ответа (в формате ConfigsResponseData)
+        8. Возвращение ответа с данными для response
 
+    :param snapshot: скомпилированная конфигурация торгового сервера
+    :param exchange_id: название биржи по ccxt
+    :param routes_format: формат торговых маршрутов (verbose или compact)
+    :param routes_filter: фильтр торговых маршрутов (применяется во время построения маршрутов)
+    :return: dict - поле data ответа в формате ConfigsResponseData (CompactConfigsResponseData для compact),
+    готовое к сериализации (модели pydantic не создаются, см. build_configs_data())
+    """
+    traded_assets, markets, assets_labels, configs = await collect_configs_parts(exchange_id, snapshot)
 
-async def collect_configs_data(exchange_id: str, path_to_config: str, assets_filename: str) -> ConfigsResponseData:
-    """ Функция собирает данные для эндпоинта /<exchange_id>/<instance>
+    # 5. Составление routes - списки маршрутов по заданным ассетам
+    with STAGE_DURATION.time('construct_routes', exchange_id):
+        routes = await get_routes(markets, traded_assets, routes_filter)
+    ROUTES_COUNT.observe(len(routes), exchange_id)
+    logger.info(f'Построены торговые маршруты.')
 
-    Предусловие: биржа exchange_id существует, и доступна через CCXT
-    Предусловие: директорий, указанная в path_to_config существует и содержит необходимые данные
+    # 7, 8. Объединяю собранные данные в поле data и возвращаю его
+    return build_configs_data(markets, assets_labels, routes, configs, routes_format)
+
+
+async def collect_configs_parts(exchange_id: str, snapshot: ConfigSnapshot) \
+        -> tuple[list[str], list[MarketRecord], list[AssetLabel], dict]:
+    """ Функция собирает данные для эндпоинта /<exchange_id>/<instance>, кроме торговых маршрутов.
+    Маршруты строятся отдельно, т.к. в потоковом режиме они отдаются по мере построения.
 
     Алгоритм загрузки данных:
-        1. Чтение файла assets.txt для получения списка ассетов, которые нужно обрабатывать
+        1. Получение списка ассетов, которые нужно обрабатывать (из снимка конфигурации)
         2. Получение данных о маркетах биржи с помощью CCXT
         3. Заполнение объектов markets с информацией о маркетах на бирже
         4. Заполнение объектов assets_labels со списком названий ассетов (стандартное название / название на бирже)
-        5. Составление routes - списки маршрутов по заданным ассетам
-        6. Получение configs - файлы JSON, находящиеся в директории внутри конфигурации торгового сервера
-        7. Объединяю собранные данные в один объект ConfigsResponseData
-        8. Возвращение ответа с данными для response
+        6. Получение configs - файлы JSON из папки sections (из снимка конфигурации)
 
-    :param assets_filename: название файла, в котором находится список ассетов.
-    :param path_to_config: путь до директории конфигурации торгового сервера (формат <exchange_id>/<instance>/)
+    :param snapshot: скомпилированная конфигурация торгового сервера
     :param exchange_id: название биржи по ccxt
-    :return: заполненный объект ConfigsResponseData, содержащий данные для response
+    :return: торгуемые ассеты, маркеты, названия ассетов и конфигурации из папки sections
     """
-    # 1. Чтение файла assets.txt для получения списка ассетов, которые нужно обрабатывать
-    with open(f'{path_to_config}/{assets_filename}') as assets:
-        traded_assets = assets.read().replace('\n', '').split(', ')
+    # 1. Получение списка ассетов, которые нужно обрабатывать
+    traded_assets = list(snapshot.traded_assets)
 
-    # 2. Загрузка данных о маркетах биржи с помощью CCXT
-    exchange = get_exchange_by_id(exchange_id)
-    all_markets: ccxt.Exchange.markets = exchange.load_markets()
-    logger.info(f'Загружены данные о бирже {exchange_id}.')
+    # 2. Получение данных о маркетах биржи с помощью CCXT (из кэша, если они уже загружены)
+    with STAGE_DURATION.time('load_markets', exchange_id):
+        cached_markets = await markets_cache.get_markets(exchange_id)
 
-    # 3. Заполнение объектов markets с информацией о маркетах на бирже
-    markets = await format_markets(all_markets, exchange.precisionMode == ccxt.DECIMAL_PLACES, traded_assets)
+    # 3, 4. Заполнение объектов markets с информацией о маркетах на бирже и
+    # объектов assets_labels со списком названий ассетов (стандартное название / название на бирже)
+    with STAGE_DURATION.time('format_markets', exchange_id):
+        markets, assets_labels = format_market_data(cached_markets.index, cached_markets.is_decimal_precision,
+                                                    traded_assets)
+    logger.info(f'Данные о бирже форматированы.')
 
-    # 4. Заполнение объектов assets_labels со списком названий ассетов (стандартное название / название на бирже)
-    assets_labels = await format_assets_labels(all_markets, traded_assets)
+    # 6. Получение configs - файлы JSON из папки sections
+    configs = dict(snapshot.configs)
 
-    # 5. Составление routes - списки маршрутов по заданным ассетам
-    routes = construct_routes(markets, traded_assets)
-    logger.info(f'Данные о бирже форматированы и построены торговые маршруты.')
+    return traded_assets, markets, assets_labels, configs
 
-    # 6. Получение configs - файлы JSON, находящиеся в директории внутри конфигурации торгового сервера
-    configs = get_jsons_from_dir(f'{path_to_config}/sections/')
 
+def render_ndjson_line(content: typing.Any) -> bytes:
+    """ Функция сериализует одну строку ответа в формате NDJSON (JSON в одну строку и перевод строки)
 
-    logger.info(f'Файлы из папки {path_to_config}/sections/ загружены.')
+    :param content: данные, которые нужно сериализовать.
+    :return: bytes - строка ответа.
+    """
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+    ).encode("utf-8") + b'\n'
+
+
+def iterate_ndjson_response(response: ConfigsResponse,
+                            parts: tuple[list[str], list[MarketRecord], list[AssetLabel], dict] | None,
+                            routes_format: RoutesFormat = RoutesFormat.verbose,
+                            routes_filter: RoutesFilter = NO_ROUTES_FILTER) -> Iterator[bytes]:
+    """ Функция-генератор ответа в формате NDJSON.
+    Сначала отдаются заголовок, маркеты, названия ассетов и конфигурации, затем торговые маршруты
+    по одному в строке - по мере их построения, поэтому маршруты не накапливаются в памяти.
+    Каждая строка - объект JSON с одним ключом:
+    header, markets, assets_labels, configs, route (строка route повторяется для каждого маршрута).
+
+    :param response: заполненный ответ API (поле data не используется).
+    :param parts: результат collect_configs_parts(). Если None - отдается только заголовок.
+    :param routes_format: формат торговых маршрутов (verbose или compact).
+    :param routes_filter: фильтр торговых маршрутов (применяется во время построения маршрутов).
+    :return: генератор строк ответа.
+    """
+    yield render_ndjson_line({'header': jsonable_encoder(response, exclude={'data'})})
+    if parts is None:
+        return
+
+    traded_assets, markets, assets_labels, configs = parts
+    yield render_ndjson_line({'markets': [market._asdict() for market in markets]})
+    yield render_ndjson_line({'assets_labels': jsonable_encoder(assets_labels)})
+    yield render_ndjson_line({'configs': configs})
+
+    routes = iterate_cached_routes(markets, traded_assets, routes_filter)
+    if routes_format == RoutesFormat.compact:
+        for compact_route in encode_routes_compact(markets, routes):
+            yield render_ndjson_line({'route': compact_route})
+        return
+
+    for route in routes:
+        yield render_ndjson_line({'route': [step._asdict() for step in route]})
+
+
+@app.post('/batch', response_model=BatchResponse, response_class=IndentedEncoder)
+async def endpoint_batch(batch_request: BatchRequest) -> fastapi.Response:
+    """ Эндпоинт для получения данных нескольких торговых серверов одним запросом.
+        Торговые серверы обрабатываются параллельно, маркеты каждой биржи загружаются один раз
+        (общий кэш маркетов), повторы в списке обрабатываются один раз.
+        Ошибка одного торгового сервера не влияет на остальные: она возвращается в его результате
+        (status и error - как в ответе основного эндпоинта, см. api_errors).
+        Свежесть конфигурации (only_new основного эндпоинта) не учитывается и не меняется.
+
+    :param batch_request: список торговых серверов "exchange_id/instance" и форматы ответа.
+    :return: BatchResponse - результаты в порядке запроса.
+    """
+    settings = endpoint_settings.current
+    trade_servers = list(dict.fromkeys(batch_request.trade_servers))
+    logger.info(f'Получен новый запрос на endpoint /batch ({len(trade_servers)} торговых серверов)')
+
+    results = await asyncio.gather(*(
+        render_batch_item(trade_server_name, settings, batch_request.routes_format, batch_request.json_format)
+        for trade_server_name in trade_servers
+    ))
+    rendered_results = dict(zip(trade_servers, results))
+
+    body = b'{"results":[' + b','.join(rendered_results[name] for name in batch_request.trade_servers) + b']}'
+    return fastapi.Response(body, media_type='application/json')
+
+
+async def render_batch_item(trade_server_name: str, settings: EndpointSettings,
+                            routes_format: RoutesFormat, json_format: JsonFormat) -> bytes:
+    """ Функция собирает результат одного торгового сервера для эндпоинта /batch (BatchItem в JSON).
+    Ответ торгового сервера берется из кэша сериализованных ответов, как в основном эндпоинте.
+
+    :param trade_server_name: торговый сервер "exchange_id/instance".
+    :param settings: текущие настройки эндпоинта.
+    :param routes_format: формат торговых маршрутов.
+    :param json_format: формат JSON ответа торгового сервера.
+    :return: bytes - BatchItem в JSON.
+    """
+    exchange_id, _, instance = trade_server_name.partition('/')
+    item = {'trade_server': trade_server_name}
+    try:
+        if not exchange_id or not instance or '/' in instance:
+            raise ConfigsNotFound(trade_server_name)
+
+        path_to_config = f'{path_to_trade_servers_configs}/{trade_server_name}'
+        data_version = get_data_version(exchange_id, path_to_config)
+        snapshot = get_trade_server_snapshot(exchange_id, instance, settings)
+        rendered = await get_rendered_configs(exchange_id, path_to_config, snapshot, settings, data_version,
+                                              routes_format, json_format)
+    except fastapi.HTTPException as e:
+        item.update(status=e.status_code, error=e.detail)
+        return render_json(item, JsonFormat.compact)
+    except Exception as e:
+        logger.exception(f'Неожиданная ошибка при обработке {trade_server_name} в /batch.')
+        error = UnexpectedError(exchange_id, e)
+        item.update(status=error.status_code, error=error.detail)
+        return render_json(item, JsonFormat.compact)
+
+    item.update(status=200, version=data_version)
+    markets_age = markets_cache.get_stale_age(exchange_id)
+    if markets_age is not None:
+        item.update(markets_age=int(markets_age))
+    # ответ торгового сервера подставляется в JSON без повторной сериализации
+    return render_json(item, JsonFormat.compact)[:-1] + b',"response":' + rendered.render(get_micro_timestamp()) + b'}'
+
+
+@app.get('/watch/{exchange_id}/{instance}', response_model=WatchResponse, response_class=IndentedEncoder)
+async def endpoint_watch_configs(
+        exchange_id: str,
+        instance: str,
+        since: str | None = None,
+        timeout: float = WATCH_MAX_TIMEOUT,
+        mode: WatchMode = WatchMode.long_poll,
+        last_event_id: str | None = fastapi.Header(None)) -> WatchResponse | StreamingResponse:
+    """ Эндпоинт ожидания изменений данных торгового сервера (конфигурации, маркетов биржи, настроек эндпоинта).
+        Соединение держится открытым, пока версия данных не изменится, поэтому опрашивать
+        основной эндпоинт не нужно: после изменения клиент запрашивает /<exchange_id>/<instance>?since=<версия>.
+
+    :param exchange_id: название биржи (по ccxt).
+    :param instance: название инстанса торгового сервера.
+    :param since: версия данных, которая есть у клиента (заголовок X-Config-Version основного эндпоинта).
+    Если не указана, текущая версия возвращается сразу.
+    :param timeout: время ожидания в режиме long_poll в секундах (не больше max_timeout из config.toml).
+    :param mode: long_poll - один ответ WatchResponse, sse - поток событий (text/event-stream).
+    :param last_event_id: заголовок Last-Event-ID (переподключение sse), используется вместо since.
+    :return: WatchResponse с текущей версией данных или поток событий.
+    """
+    trade_server_name = f'{exchange_id}/{instance}'
+    path_to_config = f'{path_to_trade_servers_configs}/{trade_server_name}'
 
-    # 7. Объединяю собранные данные в один объект ConfigsResponseData
-    result = ConfigsResponseData(
-            markets=markets,
-            assets_labels=assets_labels,
-            routes=routes,
-            configs=configs
-        )
+    if not check_existence_of_exchange(exchange_id):
+        raise ExchangeNotFound(exchange_id)
+    if not os.path.isdir(path_to_config):
+        raise ConfigsNotFound(trade_server_name)
+
+    if mode == WatchMode.sse:
+        return StreamingResponse(iterate_watch_events(exchange_id, path_to_config, last_event_id or since),
+                                 media_type='text/event-stream',
+                                 headers={'Cache-Control': 'no-cache'})
+
+    version = await wait_for_new_version(exchange_id, path_to_config, since, min(timeout, WATCH_MAX_TIMEOUT))
+    return WatchResponse(exchange=exchange_id, instance=instance, version=version, changed=version != since)
+
+
+async def wait_for_new_version(exchange_id: str, path_to_config: str, since: str | None, timeout: float) -> str:
+    """ Функция ждет, пока версия данных торгового сервера не станет отличаться от версии клиента.
 
-    # 7. Возвращение ответа с данными для response
-    return result
+    :param exchange_id: название биржи по ccxt
+    :param path_to_config: путь до директории конфигурации торгового сервера
+    :param since: версия данных, которая есть у клиента
+    :param timeout: максимальное время ожидания в секундах
+    :return: str - текущая версия данных (совпадает с since, если истекло время ожидания)
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        version = get_data_version(exchange_id, path_to_config)
+        remaining = deadline - loop.time()
+        if version != since or remaining <= 0:
+            return version
+        # изменение могло относиться к другому торговому серверу - тогда версия проверяется и ожидание продолжается
+        await change_notifier.wait(remaining)
+
+
+async def iterate_watch_events(exchange_id: str, path_to_config: str, since: str | None) -> AsyncIterator[bytes]:
+    """ Функция-генератор событий Server-Sent Events для эндпоинта /watch.
+    При каждом изменении версии данных отправляется событие version (id события - версия данных),
+    если изменений нет - раз в sse_ping_interval секунд отправляется комментарий ping.
+
+    :param exchange_id: название биржи по ccxt
+    :param path_to_config: путь до директории конфигурации торгового сервера
+    :param since: версия данных, которая есть у клиента
+    :return: генератор событий.
+    """
+    while True:
+        version = await wait_for_new_version(exchange_id, path_to_config, since, WATCH_SSE_PING_INTERVAL)
+        if version == since:
+            yield b': ping\n\n'
+            continue
+        since = version
+        data = json.dumps({'version': version})
+        yield f'id: {version}\nevent: version\ndata: {data}\n\n'.encode('utf-8')
+
+
+@app.on_event('startup')
+async def on_startup():
+    """ Запуск наблюдения за изменениями конфигураций торговых серверов, маркетов и config.toml при запуске API,
+    загрузка снимков маркетов, фоновый импорт ccxt и проверка медиа-драйвера Aeron """
+    # первый процесс запуска очищает общее состояние, оставшееся от предыдущего запуска
+    if shared_state.join():
+        logger.info('Общее состояние процессов создано заново.')
+    change_notifier.start()
+    config_watcher.add_listener(change_notifier.notify_threadsafe)
+    # изменения, сделанные другими процессами uvicorn (конфигурации, маркеты)
+    shared_state.add_listener(change_notifier.notify_threadsafe)
+    shared_state.start()
+    markets_cache.add_listener(lambda exchange_id: change_notifier.notify())
+    endpoint_settings.add_listener(change_notifier.notify)
+    config_watcher.start()
+    endpoint_settings.start()
+
+    # Маркеты из снимков доступны до первого запроса, обращения к биржам не ждут
+    await markets_cache.warm_up()
+
+    # Импорт ccxt и проверка Aeron выполняются в фоне и не задерживают запуск API
+    loop = asyncio.get_running_loop()
+    loop.run_in_executor(None, load_ccxt)
+    if AERON_PROBE:
+        loop.run_in_executor(None, probe_aeron, AERON_DIR)
+
+
+@app.on_event('shutdown')
+async def on_shutdown():
+    """ Остановка пула процессов для построения торговых маршрутов, фоновых обновлений маркетов
+    и наблюдения за конфигурациями при остановке API """
+    shutdown_routes_executor()
+    await markets_cache.close()
+    config_watcher.stop()
+    endpoint_settings.stop()
+    shared_state.stop()
+
+
+@app.get('/metrics')
+async def get_metrics():
+    """ Эндпоинт с метриками Configurator в текстовом формате Prometheus (см. metrics.py)
+
+    :return: метрики: время этапов сбора данных по биржам, время обработки запросов, количество маршрутов,
+    размеры ответов, обращения к кэшам, счетчики отправки логов по Aeron
+    """
+    # тип содержимого передается заголовком: для media_type="text/..." Starlette дописывает charset второй раз
+    return fastapi.Response(metrics.render(), headers={'Content-Type': METRICS_CONTENT_TYPE})
 
 
 @app.get('/ping')
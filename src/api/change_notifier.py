@@ -0,0 +1,57 @@
+"""
+\file change_notifier.py
+\author github:khanbekov, telegram:qoddrysdaim
+\brief В файле находится оповещение ожидающих запросов об изменении данных торговых серверов
+\data 2026.10.18
+
+Запросы к /watch ждут одно общее asyncio.Future, которое завершается при любом изменении
+(конфигурации торговых серверов, маркеты бирж, настройки эндпоинта). После оповещения каждый запрос
+сравнивает версию своего торгового сервера с версией клиента, и если она не изменилась - ждет дальше.
+Ожидающий запрос - это только корутина и общее Future, поэтому тысячи открытых соединений почти ничего не стоят.
+"""
+import asyncio
+
+
+class ChangeNotifier:
+    """ Оповещение об изменении данных """
+
+    def __init__(self):
+        self._loop: asyncio.AbstractEventLoop | None = None
+        # Future, которое завершится при следующем изменении (создается первым ожидающим)
+        self._changed: asyncio.Future | None = None
+
+    def start(self):
+        """ Привязка к циклу событий API (нужна для оповещений из других потоков) """
+        self._loop = asyncio.get_running_loop()
+
+    async def wait(self, timeout: float) -> bool:
+        """ Ожидание следующего изменения.
+        Future берется до первого await, поэтому изменение между проверкой версии и вызовом wait() не теряется.
+
+        :param timeout: максимальное время ожидания в секундах.
+        :return: True, если было изменение, False - если истекло время ожидания.
+        """
+        if self._changed is None:
+            self._changed = asyncio.get_running_loop().create_future()
+        try:
+            # shield - отмена одного ожидающего запроса (клиент отключился) не должна отменять общее Future
+            await asyncio.wait_for(asyncio.shield(self._changed), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def notify(self):
+        """ Оповещение всех ожидающих об изменении (вызывается в цикле событий API) """
+        changed, self._changed = self._changed, None
+        if changed is not None and not changed.done():
+            changed.set_result(None)
+
+    def notify_threadsafe(self):
+        """ Оповещение всех ожидающих об изменении из другого потока (например, из config_watcher) """
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self.notify)
+
+
+# Оповещение об изменении данных торговых серверов
+change_notifier = ChangeNotifier()
@@ -0,0 +1,197 @@
+"""
+\file compression.py
+\author github:khanbekov, telegram:qoddrysdaim
+\brief В файле находится сжатие сериализованных ответов основного эндпоинта (gzip, zstd)
+\data 2026.10.18
+
+Сжатые варианты тела ответа собираются один раз для каждой версии данных, как и само тело (rendered_responses.py).
+Тело хранится двумя частями - до и после значения timestamp, поэтому и сжимаются эти части отдельно,
+а для запроса сжимается только значение timestamp (несколько байт):
+    gzip - один поток deflate: части сжимаются с Z_FULL_FLUSH (без ссылок на предыдущие данные),
+           контрольная сумма CRC32 всего тела собирается из сумм частей (crc32_combine из zlib);
+    zstd - несколько последовательных кадров zstd (декодер склеивает их содержимое).
+zstd доступен, только если установлен пакет zstandard.
+"""
+import struct
+import zlib
+from typing import NamedTuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from src.api.rendered_responses import RenderedResponse
+from src.settings import COMPRESSION_ENCODINGS, COMPRESSION_GZIP_LEVEL, COMPRESSION_ZSTD_LEVEL
+
+# Заголовок gzip: сжатие deflate, без имени файла и времени изменения, ОС неизвестна
+GZIP_HEADER = b'\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff'
+
+# Кодировки, которые можно использовать (в порядке предпочтения)
+AVAILABLE_ENCODINGS = tuple(encoding for encoding in COMPRESSION_ENCODINGS
+                            if encoding == 'gzip' or (encoding == 'zstd' and zstandard is not None))
+
+
+# ----- CRC32 -----
+# Оператор "дописать к данным n нулевых байт" для CRC32 - матрица 32x32 над GF(2),
+# хранится как список из 32 столбцов. Алгоритм взят из crc32_combine() библиотеки zlib.
+
+def gf2_matrix_times(matrix: list[int], vector: int) -> int:
+    result = 0
+    index = 0
+    while vector:
+        if vector & 1:
+            result ^= matrix[index]
+        vector >>= 1
+        index += 1
+    return result
+
+
+def gf2_matrix_multiply(first: list[int], second: list[int]) -> list[int]:
+    """ Композиция операторов: сначала second, затем first """
+    return [gf2_matrix_times(first, column) for column in second]
+
+
+def crc32_shift_operator(length: int) -> list[int]:
+    """ Функция строит оператор, который переводит CRC32 данных A в CRC32 данных A + length нулевых байт.
+    Тогда crc32(A + B) = gf2_matrix_times(crc32_shift_operator(len(B)), crc32(A)) ^ crc32(B).
+
+    :param length: длина данных B в байтах.
+    :return: list[int] - оператор (32 столбца).
+    """
+    # оператор для одного нулевого бита
+    operator = [0xedb88320] + [1 << bit for bit in range(31)]
+    # оператор для одного нулевого байта (8 бит)
+    for _ in range(3):
+        operator = gf2_matrix_multiply(operator, operator)
+
+    result = [1 << bit for bit in range(32)]
+    while length:
+        if length & 1:
+            result = gf2_matrix_multiply(operator, result)
+        length >>= 1
+        if length:
+            operator = gf2_matrix_multiply(operator, operator)
+    return result
+
+
+# ----- сжатые варианты тела ответа -----
+
+class GzipResponse(NamedTuple):
+    """ Тело ответа, сжатое gzip
+
+    head: bytes - заголовок gzip и сжатая часть тела до timestamp
+    tail: bytes - сжатая часть тела после timestamp (последний блок deflate)
+    prefix_crc: int - CRC32 части тела до timestamp
+    suffix_crc: int - CRC32 части тела после timestamp
+    suffix_shift: list[int] - оператор сдвига CRC32 на длину части тела после timestamp
+    size: int - длина тела без timestamp
+    """
+    head: bytes
+    tail: bytes
+    prefix_crc: int
+    suffix_crc: int
+    suffix_shift: list[int]
+    size: int
+
+    def render(self, timestamp: int) -> bytes:
+        timestamp_bytes = b'%d' % timestamp
+        compressor = zlib.compressobj(1, zlib.DEFLATED, -zlib.MAX_WBITS)
+        middle = compressor.compress(timestamp_bytes) + compressor.flush(zlib.Z_FULL_FLUSH)
+
+        crc = zlib.crc32(timestamp_bytes, self.prefix_crc)
+        crc = gf2_matrix_times(self.suffix_shift, crc) ^ self.suffix_crc
+        trailer = struct.pack('<II', crc, (self.size + len(timestamp_bytes)) & 0xffffffff)
+        return b''.join((self.head, middle, self.tail, trailer))
+
+
+class ZstdResponse(NamedTuple):
+    """ Тело ответа, сжатое zstd (части тела - отдельные кадры zstd)
+
+    head: bytes - кадр с частью тела до timestamp
+    tail: bytes - кадр с частью тела после timestamp
+    """
+    head: bytes
+    tail: bytes
+
+    def render(self, timestamp: int) -> bytes:
+        middle = zstandard.ZstdCompressor(level=1).compress(b'%d' % timestamp)
+        return b''.join((self.head, middle, self.tail))
+
+
+def compress_gzip(rendered: RenderedResponse, level: int = COMPRESSION_GZIP_LEVEL) -> GzipResponse:
+    """ Функция сжимает части тела ответа gzip.
+
+    :param rendered: сериализованное тело ответа.
+    :param level: уровень сжатия (1-9).
+    :return: GzipResponse - сжатые части тела.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    head = GZIP_HEADER + compressor.compress(rendered.prefix) + compressor.flush(zlib.Z_FULL_FLUSH)
+
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    tail = compressor.compress(rendered.suffix) + compressor.flush(zlib.Z_FINISH)
+
+    return GzipResponse(
+        head=head,
+        tail=tail,
+        prefix_crc=zlib.crc32(rendered.prefix),
+        suffix_crc=zlib.crc32(rendered.suffix),
+        suffix_shift=crc32_shift_operator(len(rendered.suffix)),
+        size=len(rendered.prefix) + len(rendered.suffix),
+    )
+
+
+def compress_zstd(rendered: RenderedResponse, level: int = COMPRESSION_ZSTD_LEVEL) -> ZstdResponse:
+    """ Функция сжимает части тела ответа zstd.
+
+    :param rendered: сериализованное тело ответа.
+    :param level: уровень сжатия (1-22).
+    :return: ZstdResponse - сжатые части тела.
+    """
+    compressor = zstandard.ZstdCompressor(level=level)
+    return ZstdResponse(compressor.compress(rendered.prefix), compressor.compress(rendered.suffix))
+
+
+def compress_rendered_response(rendered: RenderedResponse, encoding: str) -> GzipResponse | ZstdResponse:
+    """ Функция сжимает тело ответа.
+
+    :param rendered: сериализованное тело ответа.
+    :param encoding: кодировка из AVAILABLE_ENCODINGS.
+    :return: сжатое тело ответа (метод render(timestamp) собирает тело для запроса).
+    """
+    if encoding == 'zstd':
+        return compress_zstd(rendered)
+    return compress_gzip(rendered)
+
+
+def choose_encoding(accept_encoding: str | None) -> str | None:
+    """ Функция выбирает кодировку ответа по заголовку Accept-Encoding.
+    Из кодировок с наибольшим весом q выбирается первая из AVAILABLE_ENCODINGS.
+
+    :param accept_encoding: значение заголовка Accept-Encoding (например, "gzip, zstd;q=0.5").
+    :return: str - кодировка, или None, если ответ не нужно сжимать.
+    """
+    if not accept_encoding:
+        return None
+
+    weights: dict[str, float] = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.partition(';')
+        weight = 1.0
+        for param in params.split(';'):
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[name.strip().lower()] = weight
+
+    best_encoding = None
+    best_weight = 0.0
+    for encoding in AVAILABLE_ENCODINGS:
+        weight = weights.get(encoding, weights.get('*', 0.0))
+        if weight > best_weight:
+            best_encoding, best_weight = encoding, weight
+    return best_encoding
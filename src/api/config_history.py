@@ -0,0 +1,199 @@
+"""
+\file config_history.py
+\author github:khanbekov, telegram:qoddrysdaim
+\brief В файле находится история версий данных торговых серверов для ответов с изменениями (JSON Patch)
+\data 2026.10.18
+
+Для каждого торгового сервера хранятся последние версии ответа с данными. Для версии хранятся только
+отпечатки разделов ответа (поля заголовка, data.markets, data.assets_labels, data.routes) и data.configs.
+Клиент, у которого уже есть версия N, может запросить ?since=N и получить RFC 6902 JSON Patch:
+разделы, которые изменились, заменяются целиком, а data.configs сравнивается по ключам.
+"""
+import hashlib
+import json
+from collections import deque, OrderedDict
+from typing import NamedTuple, Mapping
+
+from src.api.rendered_responses import RenderedResponse, render_json
+from src.responses_models.api_responses import JsonFormat
+from src.settings import CONFIG_HISTORY_SIZE, ROUTES_FILTERS_CACHE_SIZE
+
+# Поля ответа, которые не входят в разделы: timestamp меняется в каждом ответе, data делится на разделы
+NOT_SECTION_FIELDS = ('timestamp', 'data')
+
+
+class VersionSections(NamedTuple):
+    """ Версия ответа с данными торгового сервера
+
+    version: str - версия данных (заголовок X-Config-Version)
+    digests: Mapping[str, str] - путь к разделу (JSON Pointer) -> отпечаток раздела
+    configs: Mapping - содержимое data.configs
+    """
+    version: str
+    digests: Mapping[str, str]
+    configs: Mapping
+
+
+def escape_pointer(key: str) -> str:
+    """ Экранирование ключа для JSON Pointer (RFC 6901) """
+    return key.replace('~', '~0').replace('/', '~1')
+
+
+def split_sections(content: dict) -> tuple[dict[str, bytes], dict]:
+    """ Функция делит ответ с данными на разделы.
+
+    :param content: ответ API после jsonable_encoder (с заполненным полем data).
+    :return: путь к разделу -> раздел в JSON (в одну строку), и содержимое data.configs.
+    """
+    sections = {}
+    for field, value in content.items():
+        if field not in NOT_SECTION_FIELDS:
+            sections[f'/{escape_pointer(field)}'] = render_json(value, JsonFormat.compact)
+
+    data = content['data']
+    for field, value in data.items():
+        if field != 'configs':
+            sections[f'/data/{escape_pointer(field)}'] = render_json(value, JsonFormat.compact)
+    return sections, data['configs']
+
+
+def render_operation(operation: str, path: str, value: bytes | None = None) -> bytes:
+    """ Функция сериализует одну операцию JSON Patch.
+
+    :param operation: add, remove или replace.
+    :param path: путь (JSON Pointer).
+    :param value: значение в JSON (для add и replace).
+    :return: bytes - операция в JSON.
+    """
+    rendered = b'{"op":"%s","path":%s' % (operation.encode(), json.dumps(path, ensure_ascii=False).encode('utf-8'))
+    if value is None:
+        return rendered + b'}'
+    return rendered + b',"value":' + value + b'}'
+
+
+def diff_json(old, new, path: str) -> list[bytes]:
+    """ Функция сравнивает два значения JSON и возвращает операции JSON Patch, которые переводят old в new.
+    Словари сравниваются по ключам (рекурсивно), остальные значения (включая списки) заменяются целиком.
+
+    :param old: предыдущее значение.
+    :param new: новое значение.
+    :param path: путь к значению (JSON Pointer).
+    :return: list[bytes] - операции JSON Patch.
+    """
+    if isinstance(old, Mapping) and isinstance(new, Mapping):
+        operations = []
+        for key in sorted(old.keys() - new.keys()):
+            operations.append(render_operation('remove', f'{path}/{escape_pointer(key)}'))
+        for key, value in new.items():
+            key_path = f'{path}/{escape_pointer(key)}'
+            if key not in old:
+                operations.append(render_operation('add', key_path, render_json(value, JsonFormat.compact)))
+            else:
+                operations.extend(diff_json(old[key], value, key_path))
+        return operations
+
+    if old == new:
+        return []
+    return [render_operation('replace', path, render_json(new, JsonFormat.compact))]
+
+
+class ConfigHistory:
+    """ История версий ответов с данными торговых серверов
+
+    size: int - сколько последних версий хранить для каждого торгового сервера
+    max_filtered: int - для скольких ключей с фильтром маршрутов хранить историю (LRU, фильтр задает клиент)
+    """
+
+    def __init__(self, size: int, max_filtered: int):
+        self.size = size
+        self.max_filtered = max_filtered
+        # ключ - (путь к директории торгового сервера, формат маршрутов, ключ фильтра маршрутов)
+        # ключ -> последние версии (от старой к новой)
+        self._history: dict[tuple[str, str, str], deque[VersionSections]] = {}
+        # ключ -> разделы последней версии
+        self._latest_sections: dict[tuple[str, str, str], dict[str, bytes]] = {}
+        # ключ -> версия клиента -> JSON Patch до последней версии
+        self._patches: dict[tuple[str, str, str], dict[str, RenderedResponse]] = {}
+        # ключи с фильтром маршрутов (от давно использованного к последнему)
+        self._filtered_keys: OrderedDict[tuple[str, str, str], None] = OrderedDict()
+
+    def record(self, key: tuple[str, str, str], version: str, content: dict):
+        """ Сохранение версии ответа (повторное сохранение последней версии ничего не делает)
+
+        :param key: (путь к директории торгового сервера, формат маршрутов, ключ фильтра маршрутов).
+        :param version: версия данных.
+        :param content: ответ API после jsonable_encoder (с заполненным полем data).
+        """
+        if key[2]:
+            self._touch_filtered_key(key)
+        history = self._history.setdefault(key, deque(maxlen=self.size))
+        if history and history[-1].version == version:
+            return
+
+        sections, configs = split_sections(content)
+        digests = {path: hashlib.sha256(section).hexdigest() for path, section in sections.items()}
+        history.append(VersionSections(version, digests, configs))
+        self._latest_sections[key] = sections
+        self._patches[key] = {}
+
+    def get_patch(self, key: tuple[str, str, str], since: str, version: str) -> RenderedResponse | None:
+        """ Получение JSON Patch от версии клиента до текущей версии.
+        Последняя операция патча - замена timestamp (значение подставляется для каждого запроса,
+        см. RenderedResponse.render()).
+
+        :param key: (путь к директории торгового сервера, формат маршрутов, ключ фильтра маршрутов).
+        :param since: версия данных, которая есть у клиента.
+        :param version: текущая версия данных.
+        :return: RenderedResponse - патч, или None, если версии клиента (или текущей версии) нет в истории.
+        """
+        history = self._history.get(key)
+        if not history or history[-1].version != version:
+            return None
+        if key[2]:
+            self._touch_filtered_key(key)
+
+        patches = self._patches[key]
+        patch = patches.get(since)
+        if patch is not None:
+            return patch
+
+        old = next((entry for entry in history if entry.version == since), None)
+        if old is None:
+            return None
+        new = history[-1]
+        sections = self._latest_sections[key]
+
+        operations = []
+        for path in sorted(old.digests.keys() - new.digests.keys()):
+            operations.append(render_operation('remove', path))
+        for path, digest in new.digests.items():
+            old_digest = old.digests.get(path)
+            if old_digest is None:
+                operations.append(render_operation('add', path, sections[path]))
+            elif old_digest != digest:
+                operations.append(render_operation('replace', path, sections[path]))
+        operations.extend(diff_json(old.configs, new.configs, '/data/configs'))
+
+        # значение timestamp подставляется между prefix и suffix
+        operations.append(b'{"op":"replace","path":"/timestamp","value":')
+        prefix = b'[' + b','.join(operations)
+        patch = RenderedResponse(version, prefix, b'}]', {})
+        patches[since] = patch
+        return patch
+
+    def _touch_filtered_key(self, key: tuple[str, str, str]):
+        """ Отметка использования ключа с фильтром маршрутов и удаление истории самых давно использованных ключей
+
+        :param key: (путь к директории торгового сервера, формат маршрутов, ключ фильтра маршрутов).
+        """
+        self._filtered_keys[key] = None
+        self._filtered_keys.move_to_end(key)
+        while len(self._filtered_keys) > self.max_filtered:
+            old_key, _ = self._filtered_keys.popitem(last=False)
+            self._history.pop(old_key, None)
+            self._latest_sections.pop(old_key, None)
+            self._patches.pop(old_key, None)
+
+
+# История версий ответов всех торговых серверов
+config_history = ConfigHistory(CONFIG_HISTORY_SIZE, ROUTES_FILTERS_CACHE_SIZE)
@@ -0,0 +1,180 @@
+"""
+\file config_snapshots.py
+\author github:khanbekov, telegram:qoddrysdaim
+\brief В файле находятся скомпилированные снимки конфигураций торговых серверов
+\data 2026.10.18
+
+Конфигурация торгового сервера (assets.txt, header.json, sections/*.json) разбирается и проверяется
+один раз после изменения директории, а запросы используют готовый неизменяемый снимок.
+Если после изменения конфигурация не прошла проверку, ошибка записывается в лог,
+а запросы продолжают получать последний корректный снимок.
+"""
+import json
+import os
+import re
+from types import MappingProxyType
+from typing import NamedTuple, Mapping
+
+import fastapi
+import pydantic
+
+from src.api.config_watcher import config_watcher
+from src.api.metrics import CACHE_REQUESTS
+from src.api.utils import get_jsons_from_dir
+from src.logger.logger import logger
+from src.responses_models.api_errors import ConfigsNotFound, FileNotFound, JsonDecodeError, ConfigDecodeError
+from src.responses_models.api_responses import read_header
+
+
+class ConfigSnapshot(NamedTuple):
+    """ Скомпилированная конфигурация торгового сервера (только для чтения)
+
+    version: int - версия директории (config_watcher), из которой собран снимок
+    traded_assets: tuple[str, ...] - ассеты из assets.txt
+    header: Mapping - поля ответа из header.json
+    configs: Mapping - содержимое файлов sections/*.json [Имя_файла : Содержимое_файла]
+    """
+    version: int
+    traded_assets: tuple[str, ...]
+    header: Mapping
+    configs: Mapping
+
+
+def parse_assets(assets_text: str) -> tuple[str, ...]:
+    """ Функция разбирает список ассетов. Ассеты разделяются запятыми и/или переводами строк,
+    пробелы и пустые элементы отбрасываются, повторы удаляются (с сохранением порядка).
+
+    :param assets_text: содержимое файла assets.txt.
+    :return: tuple[str, ...] - список ассетов.
+    """
+    assets = [asset.strip() for asset in re.split(r'[,\n]', assets_text)]
+    return tuple(dict.fromkeys(asset for asset in assets if asset))
+
+
+def compile_snapshot(trade_server_name: str, path_to_config: str, assets_filename: str, header_filename: str,
+                     default_header: dict, version: int) -> ConfigSnapshot:
+    """ Функция собирает и проверяет снимок конфигурации торгового сервера.
+
+    :param trade_server_name: название торгового сервера (exchange_id/instance).
+    :param path_to_config: путь к директории торгового сервера.
+    :param assets_filename: имя файла со списком ассетов.
+    :param header_filename: имя файла с описанием основных полей response.
+    :param default_header: поля header.json по умолчанию (если файла нет или в нем не хватает полей).
+    :param version: версия директории, из которой собирается снимок.
+    :return: ConfigSnapshot - снимок конфигурации.
+    :raises fastapi.HTTPException: исключения из api_errors, если конфигурация некорректна.
+    """
+    # Проверка, существует ли директория для этого торгового сервера
+    if not os.path.isdir(path_to_config):
+        logger.error(f"Не найдена конфигурация для {trade_server_name}.")
+        raise ConfigsNotFound(path_to_config)
+
+    # Проверка, есть ли список ассетов для это торгового сервера
+    if not os.path.isfile(f'{path_to_config}/{assets_filename}'):
+        logger.error(f'Не найден файл {assets_filename} для {trade_server_name}.')
+        raise FileNotFound(trade_server_name, assets_filename)
+
+    # файлы могут быть удалены или перезаписаны во время выкладки конфигурации, поэтому ошибки чтения
+    # преобразуются в исключения api_errors (и get_snapshot() возвращает последний корректный снимок)
+    try:
+        with open(f'{path_to_config}/{assets_filename}') as assets_file:
+            traded_assets = parse_assets(assets_file.read())
+    except FileNotFoundError:
+        logger.error(f'Не найден файл {assets_filename} для {trade_server_name}.')
+        raise FileNotFound(trade_server_name, assets_filename)
+    except (OSError, UnicodeDecodeError) as e:
+        logger.error(f'Не удалось прочитать {path_to_config}/{assets_filename}. Error: {e}')
+        raise ConfigDecodeError(trade_server_name)
+    if not traded_assets:
+        logger.error(f'Файл {assets_filename} для {trade_server_name} не содержит ассетов.')
+        raise ConfigDecodeError(trade_server_name)
+
+    # Проверка, есть ли файл с описанием полей response для торгового сервера (если нет, создаю его)
+    try:
+        if not os.path.isfile(f'{path_to_config}/{header_filename}'):
+            with open(f'{path_to_config}/{header_filename}', 'w') as header_file:
+                json.dump(default_header, header_file, indent=4)
+            logger.warning(f"Не найден файл {header_filename} для {trade_server_name}. "
+                           f"Он был и заполнен автоматически.")
+
+        header = read_header(f'{path_to_config}/{header_filename}', dict(default_header))
+    except json.decoder.JSONDecodeError:
+        raise JsonDecodeError(f'{path_to_config}/{header_filename}')
+    except (pydantic.ValidationError, TypeError, UnicodeDecodeError) as e:
+        logger.error(f'Некорректный файл {path_to_config}/{header_filename}. Error: {e}')
+        raise ConfigDecodeError(trade_server_name)
+    except OSError as e:
+        logger.error(f'Не удалось прочитать {path_to_config}/{header_filename}. Error: {e}')
+        raise FileNotFound(trade_server_name, header_filename)
+
+    try:
+        configs = get_jsons_from_dir(f'{path_to_config}/sections/')
+    except OSError as e:
+        # директории sections нет (или она недоступна), например, во время выкладки конфигурации
+        logger.error(f'Не удалось прочитать {path_to_config}/sections/. Error: {e}')
+        raise FileNotFound(trade_server_name, 'sections')
+
+    return ConfigSnapshot(
+        version=version,
+        traded_assets=traded_assets,
+        header=MappingProxyType(header),
+        configs=MappingProxyType(configs),
+    )
+
+
+class ConfigSnapshots:
+    """ Хранилище последних корректных снимков конфигураций торговых серверов """
+
+    def __init__(self):
+        # путь к директории торгового сервера -> последний корректный снимок
+        self._snapshots: dict[str, ConfigSnapshot] = {}
+        # путь к директории торгового сервера -> версия, которую не удалось скомпилировать
+        self._failed_versions: dict[str, int] = {}
+
+    def get_snapshot(self, trade_server_name: str, path_to_config: str, assets_filename: str,
+                     header_filename: str, default_header: dict) -> ConfigSnapshot:
+        """ Получение снимка конфигурации торгового сервера.
+        Снимок компилируется заново, только если директория изменилась.
+        Если новая версия некорректна, возвращается последний корректный снимок, а если его нет - исключение.
+
+        :param trade_server_name: название торгового сервера (exchange_id/instance).
+        :param path_to_config: путь к директории торгового сервера.
+        :param assets_filename: имя файла со списком ассетов.
+        :param header_filename: имя файла с описанием основных полей response.
+        :param default_header: поля header.json по умолчанию.
+        :return: ConfigSnapshot - снимок конфигурации.
+        """
+        # версия читается до чтения файлов: если файлы изменятся во время компиляции, снимок соберется еще раз
+        version = config_watcher.get_version(path_to_config)
+        snapshot = self._snapshots.get(path_to_config)
+        if snapshot is not None and version in (snapshot.version, self._failed_versions.get(path_to_config)):
+            CACHE_REQUESTS.inc('snapshot', 'hit')
+            return snapshot
+
+        try:
+            snapshot = compile_snapshot(trade_server_name, path_to_config, assets_filename, header_filename,
+                                        default_header, version)
+        except ConfigsNotFound:
+            # директория торгового сервера удалена - предыдущий снимок больше не отдается
+            self._snapshots.pop(path_to_config, None)
+            self._failed_versions.pop(path_to_config, None)
+            raise
+        except fastapi.HTTPException:
+            previous_snapshot = self._snapshots.get(path_to_config)
+            if previous_snapshot is None:
+                raise
+            self._failed_versions[path_to_config] = version
+            CACHE_REQUESTS.inc('snapshot', 'stale')
+            logger.error(f'Конфигурация {trade_server_name} некорректна, '
+                         f'используется предыдущая версия (версия {previous_snapshot.version}).')
+            return previous_snapshot
+
+        self._snapshots[path_to_config] = snapshot
+        self._failed_versions.pop(path_to_config, None)
+        CACHE_REQUESTS.inc('snapshot', 'compiled')
+        logger.info(f'Скомпилирована конфигурация {trade_server_name} (версия {version}).')
+        return snapshot
+
+
+# Снимки конфигураций всех торговых серверов
+config_snapshots = ConfigSnapshots()
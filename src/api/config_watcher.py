@@ -0,0 +1,324 @@
+"""
+\file config_watcher.py
+\author github:khanbekov, telegram:qoddrysdaim
+\brief В файле находится наблюдатель за изменениями конфигураций торговых серверов
+\data 2026.10.18
+
+Наблюдатель работает в фоновом потоке и хранит версию каждой директории торгового сервера
+(<путь к конфигурациям>/<exchange_id>/<instance>) в общем состоянии процессов (shared_state).
+Версия увеличивается при любом изменении внутри директории, включая удаление и переименование файлов.
+Поэтому проверка свежести конфигурации - это чтение из общего состояния.
+
+При нескольких процессах uvicorn наблюдает только один из них (роль config_watcher), остальные читают версии,
+записанные им, и ждут, пока роль не освободится (если процесс-наблюдатель завершится).
+
+Скрытые директории (имя начинается с точки) не наблюдаются: в них Configurator хранит свои кэши
+(кэш маршрутов, снимки маркетов), и они не являются директориями торговых серверов.
+Когда директория торгового сервера удаляется, ее версия удаляется из общего состояния.
+
+На Linux используется inotify (через ctypes, без сторонних зависимостей),
+на остальных системах или при ошибке inotify - периодический обход директорий.
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+from typing import Callable
+
+from src.api.shared_state import SharedState, shared_state
+from src.logger.logger import logger
+from src.settings import PATH_TO_TRADE_SERVERS_CONFIGS, CONFIG_WATCHER_BACKEND, CONFIG_WATCHER_POLL_INTERVAL
+
+# Флаги inotify (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+# События, которые считаются изменением конфигурации
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | \
+             IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+
+# Заголовок события inotify: int wd, uint32 mask, uint32 cookie, uint32 len
+INOTIFY_EVENT_HEADER = struct.Struct('iIII')
+
+# Ключи общего состояния: версия директории торгового сервера, общий счетчик изменений
+# (из него берется новая версия директории) и версия директорий, для которых еще не было изменений
+VERSION_KEY = 'config_watcher:version:{}'
+COUNTER_KEY = 'config_watcher:counter'
+DEFAULT_VERSION_KEY = 'config_watcher:default'
+# Роль процесса, который наблюдает за директориями
+WATCHER_ROLE = 'config_watcher'
+
+
+def is_hidden(name: str) -> bool:
+    """ Скрытая директория или файл (кэши Configurator и служебные директории не наблюдаются) """
+    return name.startswith('.')
+
+
+class ConfigWatcher:
+    """ Наблюдатель за директориями торговых серверов.
+
+    path_to_root: str - путь к директории с конфигурациями торговых серверов
+    backend: str - 'auto' (inotify на Linux, иначе обход), 'inotify' или 'polling'
+    poll_interval: float - период обхода директорий (и проверки остановки потока) в секундах
+    state: SharedState - общее состояние процессов, в котором хранятся версии директорий
+    """
+
+    def __init__(self, path_to_root: str, backend: str, poll_interval: float, state: SharedState):
+        self.path_to_root = path_to_root
+        self.backend = backend
+        self.poll_interval = poll_interval
+        self.state = state
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._stop_event = threading.Event()
+        # функции, которые вызываются после каждого изменения (в потоке наблюдателя)
+        self._listeners: list[Callable[[], None]] = []
+        # функции, которые вызываются после удаления директории торгового сервера (в потоке наблюдателя)
+        self._removal_listeners: list[Callable[[str], None]] = []
+
+    def get_version(self, path_to_dir: str) -> int:
+        """ Получение версии директории торгового сервера.
+        Если наблюдатель еще не запущен, он запускается.
+
+        :param path_to_dir: путь к директории торгового сервера (<path_to_root>/<exchange_id>/<instance>).
+        :return: int - версия. Меняется при каждом изменении внутри директории.
+        """
+        if self._thread is None:
+            self.start()
+        version, default_version = self.state.get_values(
+            [VERSION_KEY.format(os.path.normpath(path_to_dir)), DEFAULT_VERSION_KEY])
+        # после _bump_all() версии всех директорий не меньше версии по умолчанию
+        return max(version or 0, default_version or 0)
+
+    def add_listener(self, listener: Callable[[], None]):
+        """ Добавление функции, которая вызывается после каждого изменения.
+        Функция вызывается в потоке наблюдателя, поэтому должна быть потокобезопасной.
+        Вызывается только в процессе-наблюдателе, остальные процессы узнают об изменениях
+        через shared_state.add_listener().
+
+        :param listener: функция без аргументов.
+        """
+        self._listeners.append(listener)
+
+    def add_removal_listener(self, listener: Callable[[str], None]):
+        """ Добавление функции, которая вызывается после удаления директории торгового сервера
+        (например, чтобы удалить связанные с ней записи общего состояния). Вызывается только в процессе-наблюдателе.
+
+        :param listener: функция от пути к директории торгового сервера (os.path.normpath()).
+        """
+        self._removal_listeners.append(listener)
+
+    def get_trade_server_dir(self, path: str) -> str | None:
+        """ Директория торгового сервера (<path_to_root>/<exchange_id>/<instance>), в которой находится path.
+
+        :param path: путь внутри path_to_root.
+        :return: str - путь к директории (os.path.normpath()), или None, если path не относится к торговому серверу
+        (корень, уровень бирж, скрытые директории).
+        """
+        relative_parts = os.path.relpath(path, self.path_to_root).split(os.sep)
+        if len(relative_parts) < 2 or relative_parts[0] in (os.curdir, os.pardir):
+            return None
+        if is_hidden(relative_parts[0]) or is_hidden(relative_parts[1]):
+            return None
+        return os.path.normpath(os.path.join(self.path_to_root, relative_parts[0], relative_parts[1]))
+
+    def start(self):
+        """ Запуск наблюдателя в фоновом потоке (повторный вызов ничего не делает) """
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop_event.clear()
+
+            target = self._run_polling
+            if os.path.isdir(self.path_to_root) and (
+                    self.backend == 'inotify' or (self.backend == 'auto' and sys.platform.startswith('linux'))):
+                target = self._run_inotify
+
+            # роль захватывается до первого чтения версий, чтобы _bump_all() не изменил уже отданную версию
+            is_watcher = self.state.acquire_role(WATCHER_ROLE)
+            if is_watcher:
+                self._bump_all()
+
+            self._thread = threading.Thread(target=self._run, args=(target, is_watcher), name='config-watcher',
+                                            daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """ Остановка наблюдателя """
+        thread = self._thread
+        if thread is None:
+            return
+        self._stop_event.set()
+        thread.join(timeout=self.poll_interval * 2)
+        self._thread = None
+        self.state.release_role(WATCHER_ROLE)
+
+    def _run(self, target: Callable[[], None], is_watcher: bool):
+        """ Ожидание роли наблюдателя (ее занимает один процесс) и наблюдение """
+        if not is_watcher:
+            while not self.state.acquire_role(WATCHER_ROLE):
+                if self._stop_event.wait(self.poll_interval):
+                    return
+            logger.info('Процесс-наблюдатель за конфигурациями завершился, наблюдение продолжает этот процесс.')
+            self._bump_all()
+        target()
+
+    def _bump(self, path: str):
+        """ Увеличение версии директории торгового сервера, в которой находится path
+        (или удаление версии, если директории больше нет) """
+        # изменения на уровне бирж, сам корень и скрытые директории не относятся к конкретному торговому серверу
+        key = self.get_trade_server_dir(path)
+        if key is None:
+            return
+        if not os.path.isdir(key):
+            self._remove(key)
+            return
+        # версии пишет только процесс-наблюдатель, поэтому счетчик и версию можно записать отдельно
+        self.state.set(VERSION_KEY.format(key), self.state.increment(COUNTER_KEY))
+        self._notify_listeners()
+
+    def _remove(self, key: str):
+        """ Удаление версии директории торгового сервера, которой больше нет (записи общего состояния не копятся).
+        Если директорию создадут снова, ее версия увеличится при создании. """
+        self.state.delete([VERSION_KEY.format(key)])
+        for listener in self._removal_listeners:
+            listener(key)
+        self._notify_listeners()
+
+    def _bump_all(self):
+        """ Увеличение версий всех директорий (когда изменения могли быть пропущены:
+        при запуске наблюдения, в том числе после перезапуска сервера, и при переполнении очереди inotify) """
+        # версия директории - максимум из ее версии и версии по умолчанию (см. get_version())
+        self.state.set(DEFAULT_VERSION_KEY, self.state.increment(COUNTER_KEY))
+        self._notify_listeners()
+
+    def _notify_listeners(self):
+        self.state.notify_changed()
+        for listener in self._listeners:
+            listener()
+
+    # ----- inotify -----
+
+    def _run_inotify(self):
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            fd = libc.inotify_init1(os.O_CLOEXEC)
+            if fd < 0:
+                raise OSError(ctypes.get_errno(), 'inotify_init1')
+        except (OSError, AttributeError) as e:
+            logger.warning(f'inotify недоступен, используется обход директорий. Error: {e}')
+            self._run_polling()
+            return
+
+        # дескриптор наблюдения -> путь к директории
+        watches: dict[int, str] = {}
+        try:
+            self._add_watches(libc, fd, self.path_to_root, watches)
+            logger.info(f'Запущено наблюдение (inotify) за {self.path_to_root}.')
+
+            while not self._stop_event.is_set():
+                readable, _, _ = select.select([fd], [], [], self.poll_interval)
+                if not readable:
+                    continue
+                self._handle_inotify_events(libc, fd, os.read(fd, 64 * 1024), watches)
+        except OSError as e:
+            logger.warning(f'Ошибка inotify, используется обход директорий. Error: {e}')
+            os.close(fd)
+            self._run_polling()
+            return
+
+        os.close(fd)
+
+    def _add_watches(self, libc: ctypes.CDLL, fd: int, path_to_dir: str, watches: dict[int, str]):
+        """ Рекурсивное добавление наблюдения за директорией и всеми вложенными директориями (кроме скрытых) """
+        if path_to_dir != self.path_to_root and is_hidden(os.path.basename(os.path.normpath(path_to_dir))):
+            return
+        for root, dirs, files in os.walk(path_to_dir):
+            dirs[:] = [name for name in dirs if not is_hidden(name)]
+            wd = libc.inotify_add_watch(fd, os.fsencode(root), WATCH_MASK)
+            if wd < 0:
+                logger.warning(f'Не удалось наблюдать за {root}. Errno: {ctypes.get_errno()}')
+                continue
+            watches[wd] = root
+
+    def _handle_inotify_events(self, libc: ctypes.CDLL, fd: int, buffer: bytes, watches: dict[int, str]):
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, cookie, name_length = INOTIFY_EVENT_HEADER.unpack_from(buffer, offset)
+            offset += INOTIFY_EVENT_HEADER.size
+            name = os.fsdecode(buffer[offset:offset + name_length].rstrip(b'\0'))
+            offset += name_length
+
+            if mask & IN_Q_OVERFLOW:
+                # очередь событий переполнена - часть изменений потеряна
+                self._bump_all()
+                continue
+
+            path_to_dir = watches.get(wd)
+            if path_to_dir is None:
+                continue
+            if mask & IN_IGNORED:
+                # наблюдение снято (директория удалена)
+                watches.pop(wd, None)
+                continue
+
+            path = os.path.join(path_to_dir, name) if name else path_to_dir
+            self._bump(path)
+
+            # новые директории тоже нужно наблюдать
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                self._add_watches(libc, fd, path, watches)
+
+    # ----- обход директорий -----
+
+    def _run_polling(self):
+        logger.info(f'Запущено наблюдение (обход директорий) за {self.path_to_root}.')
+        signatures = self._scan()
+        while not self._stop_event.wait(self.poll_interval):
+            new_signatures = self._scan()
+            for key in signatures.keys() | new_signatures.keys():
+                if signatures.get(key) != new_signatures.get(key):
+                    self._bump(key)
+            signatures = new_signatures
+
+    def _scan(self) -> dict[str, frozenset]:
+        """ Обход директорий торговых серверов.
+        Подпись директории - множество (путь к файлу, время изменения, размер),
+        поэтому удаление и переименование файлов тоже меняют подпись.
+
+        :return: путь к директории торгового сервера -> подпись
+        """
+        signatures: dict[str, set] = {}
+        for root, dirs, files in os.walk(self.path_to_root):
+            dirs[:] = [name for name in dirs if not is_hidden(name)]
+            key = self.get_trade_server_dir(root)
+            if key is None:
+                continue
+            signature = signatures.setdefault(key, set())
+            for file in files:
+                path_to_file = os.path.join(root, file)
+                try:
+                    stat = os.stat(path_to_file)
+                except OSError:
+                    continue
+                signature.add((path_to_file, stat.st_mtime_ns, stat.st_size))
+
+        return {key: frozenset(signature) for key, signature in signatures.items()}
+
+
+# Наблюдатель за директорией с конфигурациями всех торговых серверов
+config_watcher = ConfigWatcher(PATH_TO_TRADE_SERVERS_CONFIGS, CONFIG_WATCHER_BACKEND, CONFIG_WATCHER_POLL_INTERVAL,
+                               shared_state)
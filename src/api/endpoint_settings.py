@@ -0,0 +1,173 @@
+"""
+\file endpoint_settings.py
+\author github:khanbekov, telegram:qoddrysdaim
+\brief В файле находятся настройки основного эндпоинта и их перезагрузка без перезапуска Configurator
+\data 2026.10.18
+
+Настройки загружаются из config.toml один раз при запуске. Файл перечитывается, только если изменилось
+его содержимое (периодическая проверка или сигнал SIGHUP). Новые настройки применяются заменой одной ссылки,
+поэтому запрос всегда видит согласованный набор настроек. Если файл не удалось разобрать,
+остаются предыдущие настройки, а в лог пишется предупреждение.
+"""
+import asyncio
+import hashlib
+import os
+import signal
+from typing import Callable
+
+import pydantic
+import tomli
+from pydantic import BaseModel
+
+from src.logger.logger import logger
+from src.settings import API_CONFIGURATION_PATH, ENDPOINT_SETTINGS_RELOAD_INTERVAL
+
+
+class EndpointSettings(BaseModel):
+    """ Настройки основного эндпоинта (неизменяемые)
+
+    version: str - отпечаток содержимого config.toml, из которого загружены настройки
+    event: str - поле event ответа
+    fresh_action, fresh_message: str - поля action и message ответа со свежей конфигурацией
+    no_fresh_action, no_fresh_message: str - поля action и message ответа без свежей конфигурации
+    assets_filename: str - имя файла со списком ассетов
+    header_filename: str - имя файла с описанием основных полей response
+    default_node, default_algo: str - значения node и algo по умолчанию для header.json
+    """
+    version: str
+    event: str
+    fresh_action: str
+    fresh_message: str
+    no_fresh_action: str
+    no_fresh_message: str
+    assets_filename: str
+    header_filename: str
+    default_node: str
+    default_algo: str
+
+    class Config:
+        allow_mutation = False
+
+
+def parse_endpoint_settings(content: bytes) -> EndpointSettings:
+    """ Функция разбирает config.toml в настройки основного эндпоинта.
+
+    :param content: содержимое config.toml.
+    :return: EndpointSettings - настройки.
+    :raises tomli.TOMLDecodeError, KeyError, pydantic.ValidationError: если файл некорректен.
+    """
+    api_configuration = tomli.loads(content.decode('utf-8'))
+    main = api_configuration['endpoint']['main']
+    data = api_configuration['data']
+    return EndpointSettings(
+        version=hashlib.sha256(content).hexdigest()[:16],
+        event=main['event'],
+        fresh_action=main['fresh']['action'],
+        fresh_message=main['fresh']['message'],
+        no_fresh_action=main['no_fresh']['action'],
+        no_fresh_message=main['no_fresh']['message'],
+        assets_filename=data['assets_filename'],
+        header_filename=data['header_filename'],
+        default_node=data['default']['node'],
+        default_algo=data['default']['algo'],
+    )
+
+
+class EndpointSettingsStore:
+    """ Хранилище текущих настроек основного эндпоинта
+
+    path_to_file: str - путь к config.toml
+    reload_interval: float - период проверки изменений файла в секундах
+    current: EndpointSettings - текущие настройки
+    """
+
+    def __init__(self, path_to_file: str, reload_interval: float):
+        self.path_to_file = path_to_file
+        self.reload_interval = reload_interval
+        # (время изменения, размер) файла при последней проверке
+        self._file_stat: tuple[int, int] | None = None
+        self._watch_task: asyncio.Task | None = None
+        # функции, которые вызываются после замены настроек
+        self._listeners: list[Callable[[], None]] = []
+
+        with open(path_to_file, 'rb') as f:
+            self.current: EndpointSettings = parse_endpoint_settings(f.read())
+
+    def reload(self) -> bool:
+        """ Перечитывание файла настроек. Настройки заменяются, только если изменилось содержимое файла.
+
+        :return: True, если настройки были заменены.
+        """
+        try:
+            with open(self.path_to_file, 'rb') as f:
+                content = f.read()
+        except OSError as e:
+            logger.warning(f'Не удалось прочитать {self.path_to_file}, используются предыдущие настройки. Error: {e}')
+            return False
+
+        if hashlib.sha256(content).hexdigest()[:16] == self.current.version:
+            return False
+
+        try:
+            new_settings = parse_endpoint_settings(content)
+        except (tomli.TOMLDecodeError, UnicodeDecodeError, KeyError, TypeError, pydantic.ValidationError) as e:
+            logger.warning(f'Не удалось разобрать {self.path_to_file}, используются предыдущие настройки. '
+                           f'Error: {e!r}')
+            return False
+
+        # замена одной ссылки - запросы видят либо старые, либо новые настройки целиком
+        self.current = new_settings
+        logger.info(f'Настройки эндпоинта перезагружены из {self.path_to_file} (версия {new_settings.version}).')
+        for listener in self._listeners:
+            listener()
+        return True
+
+    def add_listener(self, listener: Callable[[], None]):
+        """ Добавление функции, которая вызывается после замены настроек
+
+        :param listener: функция без аргументов.
+        """
+        self._listeners.append(listener)
+
+    def reload_if_changed(self) -> bool:
+        """ Перечитывание файла настроек, если изменились время изменения или размер файла.
+
+        :return: True, если настройки были заменены.
+        """
+        try:
+            stat = os.stat(self.path_to_file)
+        except OSError:
+            return False
+
+        file_stat = (stat.st_mtime_ns, stat.st_size)
+        if file_stat == self._file_stat:
+            return False
+        self._file_stat = file_stat
+        return self.reload()
+
+    def start(self):
+        """ Запуск периодической проверки файла и обработки сигнала SIGHUP (перезагрузка настроек) """
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGHUP, self.reload)
+        except (NotImplementedError, AttributeError, RuntimeError):
+            # сигналы доступны не на всех платформах и только в главном потоке
+            pass
+
+        if self._watch_task is None and self.reload_interval > 0:
+            self._watch_task = loop.create_task(self._watch())
+
+    def stop(self):
+        """ Остановка периодической проверки файла """
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            self._watch_task = None
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            self.reload_if_changed()
+
+
+# Настройки основного эндпоинта
+endpoint_settings = EndpointSettingsStore(API_CONFIGURATION_PATH, ENDPOINT_SETTINGS_RELOAD_INTERVAL)
@@ -0,0 +1,258 @@
+"""
+\file metrics.py
+\author github:khanbekov, telegram:qoddrysdaim
+\brief В файле находятся метрики Configurator (время этапов сбора данных, размеры ответов, попадания в кэши)
+и их вывод в текстовом формате Prometheus (эндпоинт /metrics)
+\data 2026.10.18
+
+Метрики хранятся в памяти процесса: счетчики (Counter), значения (Gauge) и гистограммы (Histogram).
+У каждой метрики есть набор меток, значения меток передаются позиционно в порядке label_names.
+Формат вывода: https://prometheus.io/docs/instrumenting/exposition_formats/
+"""
+import bisect
+import contextlib
+import logging
+import threading
+import time
+from typing import Callable, Iterator
+
+from src.logger.aeron_handler import AeronHandler
+
+# Тип содержимого ответа /metrics
+METRICS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Границы корзин гистограмм: время в секундах, размер в байтах, количество
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BYTES_BUCKETS = tuple(float(1024 * 4 ** power) for power in range(9))
+COUNT_BUCKETS = (10.0, 100.0, 1000.0, 10000.0, 100000.0, 1000000.0)
+
+
+def escape_label_value(value: str) -> str:
+    """ Экранирование значения метки (обратная косая черта, кавычки, перевод строки) """
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_number(value: float) -> str:
+    """ Число в формате Prometheus (целые без дробной части, бесконечность как +Inf) """
+    if value == float('inf'):
+        return '+Inf'
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+def format_labels(label_names: tuple[str, ...], label_values: tuple[str, ...]) -> str:
+    """ Метки в формате Prometheus: {name="value",...} (пустая строка, если меток нет) """
+    if not label_names:
+        return ''
+    labels = ','.join(f'{name}="{escape_label_value(str(value))}"' for name, value in zip(label_names, label_values))
+    return '{' + labels + '}'
+
+
+class Metric:
+    """ Базовый класс метрики
+
+    name: str - имя метрики
+    documentation: str - описание метрики (# HELP)
+    label_names: tuple[str, ...] - имена меток
+    """
+    type = 'untyped'
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._lock = threading.Lock()
+
+    def render(self) -> Iterator[str]:
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} {self.type}'
+        yield from self._render_samples()
+
+    def _render_samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """ Счетчик (только увеличивается) """
+    type = 'counter'
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def set(self, value: float, *label_values: str):
+        """ Установка значения счетчика, который считается в другом месте (например, в обработчике логов) """
+        with self._lock:
+            self._values[label_values] = value
+
+    def _render_samples(self) -> Iterator[str]:
+        with self._lock:
+            values = list(self._values.items())
+        for label_values, value in values:
+            yield f'{self.name}{format_labels(self.label_names, label_values)} {format_number(value)}'
+
+
+class Gauge(Counter):
+    """ Значение (может увеличиваться и уменьшаться) """
+    type = 'gauge'
+
+
+class Histogram(Metric):
+    """ Гистограмма
+
+    buckets: tuple[float, ...] - верхние границы корзин (по возрастанию, без +Inf)
+    """
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = DURATION_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(buckets)
+        # значения меток -> [количество в каждой корзине (не накопленное, последняя - +Inf), сумма]
+        self._values: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *label_values: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(label_values)
+            if entry is None:
+                entry = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    @contextlib.contextmanager
+    def time(self, *label_values: str):
+        """ Измерение времени выполнения блока with (в секундах, в том числе при исключении) """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def _render_samples(self) -> Iterator[str]:
+        with self._lock:
+            values = [(label_values, list(counts), total) for label_values, (counts, total) in self._values.items()]
+
+        label_names = self.label_names + ('le',)
+        for label_values, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = format_labels(label_names, label_values + (format_number(bound),))
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            labels = format_labels(self.label_names, label_values)
+            yield f'{self.name}_sum{labels} {format_number(total)}'
+            yield f'{self.name}_count{labels} {cumulative}'
+
+
+class MetricsRegistry:
+    """ Набор метрик, которые выводятся на /metrics """
+
+    def __init__(self):
+        self._metrics: list[Metric] = []
+        # функции, которые обновляют метрики перед выводом (значения, которые считаются в другом месте)
+        self._collectors: list[Callable[[], None]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]):
+        """ Добавление функции, которая вызывается перед каждым выводом метрик
+
+        :param collector: функция без аргументов.
+        """
+        self._collectors.append(collector)
+
+    def render(self) -> bytes:
+        """ Вывод всех метрик в текстовом формате Prometheus """
+        for collector in self._collectors:
+            collector()
+        lines = [line for metric in self._metrics for line in metric.render()]
+        return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+# Метрики Configurator
+metrics = MetricsRegistry()
+
+# Время этапов сбора данных торгового сервера. Этапы:
+#   snapshot - проверка и компиляция конфигурации торгового сервера (assets.txt, header.json, sections/*.json);
+#   load_markets - получение маркетов биржи (из кэша или загрузка через CCXT);
+#   format_markets - форматирование маркетов и названий ассетов;
+#   construct_routes - получение торговых маршрутов (из кэша или построение);
+#   serialize - сериализация ответа в JSON;
+#   compress - сжатие ответа (один раз для версии данных)
+STAGE_DURATION = metrics.register(Histogram(
+    'configurator_stage_duration_seconds', 'Время этапа сбора данных торгового сервера.', ('stage', 'exchange')))
+
+# Время обработки запроса до начала отправки ответа (тело потоковых ответов отправляется позже)
+REQUEST_DURATION = metrics.register(Histogram(
+    'configurator_request_duration_seconds', 'Время обработки запроса до начала отправки ответа.',
+    ('endpoint', 'status')))
+
+# Количество построенных торговых маршрутов (при каждом сборе данных для новой версии)
+ROUTES_COUNT = metrics.register(Histogram(
+    'configurator_routes_count', 'Количество торговых маршрутов в собранных данных.', ('exchange',), COUNT_BUCKETS))
+
+# Размер тела ответа основного эндпоинта (encoding - identity, gzip или zstd)
+RESPONSE_BYTES = metrics.register(Histogram(
+    'configurator_response_bytes', 'Размер тела ответа с данными торгового сервера.', ('exchange', 'encoding'),
+    BYTES_BUCKETS))
+
+# Обращения к кэшам. Доля попаданий: sum(rate(...{result!="miss"})) / sum(rate(...)) для каждого cache.
+#   snapshot (hit, compiled, stale) - снимки конфигураций торговых серверов;
+#   markets (hit, miss) - маркеты бирж;
+#   routes (memory, disk, miss) - торговые маршруты;
+#   rendered (hit, miss) - сериализованные тела ответов;
+#   compressed (hit, miss) - сжатые тела ответов
+CACHE_REQUESTS = metrics.register(Counter(
+    'configurator_cache_requests_total', 'Обращения к кэшам.', ('cache', 'result')))
+
+# Отправка логов по Aeron (сумма по всем обработчикам AeronHandler, обновляется перед выводом метрик)
+AERON_LOG_RECORDS = metrics.register(Counter(
+    'configurator_aeron_log_records_total', 'Записи логов, отправленные (offered) и отброшенные (dropped).',
+    ('result',)))
+AERON_BACK_PRESSURED = metrics.register(Counter(
+    'configurator_aeron_back_pressured_total', 'Отказы канала Aeron, после которых отправка повторялась.'))
+AERON_QUEUED = metrics.register(Gauge(
+    'configurator_aeron_log_records_queued', 'Записи логов, ожидающие отправки по Aeron.'))
+
+
+def collect_aeron_metrics():
+    """ Обновление метрик отправки логов по Aeron из счетчиков обработчиков корневого логгера """
+    stats = [handler.get_stats() for handler in logging.getLogger().handlers if isinstance(handler, AeronHandler)]
+    AERON_LOG_RECORDS.set(sum(item.offered for item in stats), 'offered')
+    AERON_LOG_RECORDS.set(sum(item.dropped for item in stats), 'dropped')
+    AERON_BACK_PRESSURED.set(sum(item.back_pressured for item in stats))
+    AERON_QUEUED.set(sum(item.queued for item in stats))
+
+
+class MetricsMiddleware:
+    """ ASGI middleware, измеряющее время обработки запросов (REQUEST_DURATION).
+    Время измеряется до начала отправки ответа, поэтому долгие потоковые ответы (/watch) не искажают метрику.
+    Метка endpoint - имя функции эндпоинта (unknown, если путь не найден).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+
+        async def send_with_metrics(message):
+            if message['type'] == 'http.response.start':
+                endpoint = scope.get('endpoint')
+                REQUEST_DURATION.observe(time.perf_counter() - start,
+                                         getattr(endpoint, '__name__', 'unknown'), str(message['status']))
+            await send(message)
+
+        await self.app(scope, receive, send_with_metrics)
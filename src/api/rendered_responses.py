@@ -0,0 +1,164 @@
+"""
+\file rendered_responses.py
+\author github:khanbekov, telegram:qoddrysdaim
+\brief В файле находится кэш сериализованных ответов основного эндпоинта
+\data 2026.10.18
+
+Тело ответа с конфигурацией торгового сервера сериализуется один раз для каждой версии данных (ETag)
+и хранится в виде bytes. Поле data собирается из внутренних объектов (MarketRecord, RouteStepRecord) напрямую,
+без моделей pydantic (см. build_configs_data()). Для каждого запроса меняется только поле timestamp:
+тело хранится двумя частями - до и после значения timestamp, и ответ собирается их склейкой.
+"""
+import json
+import typing
+from collections import OrderedDict
+from typing import NamedTuple
+
+from src.market_data_obtaining.routes import encode_routes_compact
+from src.responses_models.api_responses import JsonFormat, RoutesFormat, RouteStepRecord
+from src.responses_models.market_models import AssetLabel, MarketRecord
+from src.settings import ROUTES_FILTERS_CACHE_SIZE
+
+# Значение timestamp при сериализации - по нему тело делится на две части
+TIMESTAMP_PLACEHOLDER = b'"timestamp":null'
+
+
+def render_json(content: typing.Any, json_format: JsonFormat = JsonFormat.indented) -> bytes:
+    """ Функция сериализует ответ API в JSON.
+    JSON с отступами собирается кодировщиком на Python (медленно),
+    JSON в одну строку - кодировщиком на C из стандартной библиотеки.
+
+    :param content: данные, которые нужно сериализовать (после jsonable_encoder).
+    :param json_format: indented - JSON с отступами в 4 пробела, compact - JSON в одну строку.
+    :return: bytes - JSON в кодировке utf-8.
+    """
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=4 if json_format == JsonFormat.indented else None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def build_configs_data(markets: list[MarketRecord], assets_labels: list[AssetLabel],
+                       routes: list[list[RouteStepRecord]], configs: dict,
+                       routes_format: RoutesFormat = RoutesFormat.verbose) -> dict:
+    """ Функция собирает поле data ответа (ConfigsResponseData или CompactConfigsResponseData) в виде,
+    готовом к сериализации. Результат совпадает с jsonable_encoder() модели, но модели pydantic не создаются:
+    данные уже проверены при сборе, а маршрутов могут быть сотни тысяч.
+
+    :param markets: маркеты.
+    :param assets_labels: названия ассетов.
+    :param routes: торговые маршруты.
+    :param configs: конфигурации из папки sections.
+    :param routes_format: формат торговых маршрутов (verbose или compact).
+    :return: dict - поле data ответа.
+    """
+    if routes_format == RoutesFormat.compact:
+        routes_data = list(encode_routes_compact(markets, routes))
+    else:
+        # шаги маршрутов общие для всех маршрутов (routes.build_route_steps()), поэтому словарь шага создается один раз
+        steps_data = {}
+        routes_data = [
+            [steps_data.get(step) or steps_data.setdefault(step, step._asdict()) for step in route]
+            for route in routes
+        ]
+
+    return {
+        'markets': [market._asdict() for market in markets],
+        'assets_labels': [assets_label.dict() for assets_label in assets_labels],
+        'routes': routes_data,
+        'configs': configs,
+    }
+
+
+class RenderedResponse(NamedTuple):
+    """ Сериализованное тело ответа, разделенное по значению timestamp
+
+    etag: str - версия данных, из которых собрано тело
+    prefix: bytes - часть тела до значения timestamp (включая "timestamp":)
+    suffix: bytes - часть тела после значения timestamp
+    compressed: dict - сжатые варианты тела (кодировка -> сжатое тело, см. compression.py), заполняются по запросу
+    """
+    etag: str
+    prefix: bytes
+    suffix: bytes
+    compressed: dict
+
+    @property
+    def size(self) -> int:
+        """ Длина тела ответа без значения timestamp """
+        return len(self.prefix) + len(self.suffix)
+
+    def render(self, timestamp: int) -> bytes:
+        """ Сборка тела ответа с новым значением timestamp
+
+        :param timestamp: время ответа в микросекундах.
+        :return: bytes - тело ответа.
+        """
+        return b'%s%d%s' % (self.prefix, timestamp, self.suffix)
+
+
+def split_rendered_response(etag: str, body: bytes) -> RenderedResponse:
+    """ Функция делит сериализованное тело ответа по значению timestamp.
+    Поле timestamp в ответе находится раньше поля data, поэтому берется первое вхождение.
+
+    :param etag: версия данных, из которых собрано тело.
+    :param body: тело ответа, сериализованное с timestamp = None.
+    :return: RenderedResponse - части тела.
+    """
+    prefix, placeholder, suffix = body.partition(TIMESTAMP_PLACEHOLDER)
+    if not placeholder:
+        raise ValueError('В теле ответа нет поля timestamp')
+    return RenderedResponse(etag, prefix + TIMESTAMP_PLACEHOLDER[:-len(b'null')], suffix, {})
+
+
+class RenderedResponsesCache:
+    """ Кэш сериализованных ответов.
+    Для каждого торгового сервера и формата ответа хранится только последняя версия,
+    поэтому при изменении данных старое тело заменяется новым.
+    Фильтр маршрутов задает клиент, поэтому тел с фильтром хранится не больше max_filtered (LRU).
+
+    max_filtered: int - сколько тел ответов с фильтром маршрутов хранить
+    """
+
+    def __init__(self, max_filtered: int):
+        self.max_filtered = max_filtered
+        # (путь к директории торгового сервера, формат маршрутов, формат JSON, ключ фильтра маршрутов) -> тело ответа
+        self._responses: dict[tuple[str, str, str, str], RenderedResponse] = {}
+        # ключи тел с фильтром маршрутов (от давно использованного к последнему)
+        self._filtered_keys: OrderedDict[tuple[str, str, str, str], None] = OrderedDict()
+
+    def get(self, key: tuple[str, str, str, str], etag: str) -> RenderedResponse | None:
+        """ Получение тела ответа, если оно собрано из данных той же версии
+
+        :param key: (путь к директории торгового сервера, формат маршрутов, формат JSON, ключ фильтра маршрутов).
+        :param etag: текущая версия данных.
+        :return: RenderedResponse или None, если тела нет или оно устарело.
+        """
+        rendered = self._responses.get(key)
+        if rendered is None or rendered.etag != etag:
+            return None
+        if key in self._filtered_keys:
+            self._filtered_keys.move_to_end(key)
+        return rendered
+
+    def put(self, key: tuple[str, str, str, str], rendered: RenderedResponse):
+        """ Сохранение тела ответа (предыдущая версия для этого ключа удаляется)
+
+        :param key: (путь к директории торгового сервера, формат маршрутов, формат JSON, ключ фильтра маршрутов).
+        :param rendered: тело ответа.
+        """
+        self._responses[key] = rendered
+        if not key[3]:
+            return
+        self._filtered_keys[key] = None
+        self._filtered_keys.move_to_end(key)
+        while len(self._filtered_keys) > self.max_filtered:
+            old_key, _ = self._filtered_keys.popitem(last=False)
+            del self._responses[old_key]
+
+
+# Сериализованные ответы основного эндпоинта
+rendered_responses = RenderedResponsesCache(ROUTES_FILTERS_CACHE_SIZE)
@@ -0,0 +1,377 @@
+"""
+\file shared_state.py
+\author github:khanbekov, telegram:qoddrysdaim
+\brief В файле находится общее состояние процессов Configurator (при запуске нескольких процессов uvicorn)
+\data 2026.10.18
+
+Состояние - таблица целых чисел (int64) по строковым ключам в файле, отображенном в память (mmap).
+Все процессы открывают один файл, а каждая операция выполняется под блокировкой файла (fcntl.flock),
+поэтому операции атомарны между процессами. В таблице хранятся версии директорий торговых серверов,
+версии конфигураций, отданные клиентам (свежесть only_new), версии маркетов бирж и идентификатор запуска.
+
+Формат файла: заголовок (STATE_HEADER), затем state_slots записей (STATE_SLOT): ключ - первые 16 байт
+blake2b от строки ключа (нулевой ключ - пустая запись), значение - int64. Записи, которые больше не нужны
+(например, версии удаленных директорий торговых серверов), удаляются через delete().
+
+Файл состояния остается после завершения процессов. Каждый процесс при запуске API вызывает join(): первый
+процесс нового запуска (когда не работает ни один процесс, открывший файл) очищает таблицу, чтобы версии,
+свежесть only_new и аренды предыдущего запуска не использовались. Поэтому состояние создается заново при любом
+способе запуска (setup.py, uvicorn --workers, gunicorn, тесты).
+
+Без fcntl (не Unix) таблица хранится в памяти процесса и не является общей.
+"""
+import contextlib
+import hashlib
+import mmap
+import os
+import secrets
+import struct
+import tempfile
+import threading
+from typing import Callable, Iterator
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from src.logger.logger import logger
+from src.settings import PATH_TO_TRADE_SERVERS_CONFIGS, SERVER_WORKERS, SHARED_STATE_PATH, SHARED_STATE_SLOTS, \
+    SHARED_STATE_POLL_INTERVAL
+
+# Сигнатура и версия формата файла состояния
+STATE_MAGIC = b'CFGS'
+STATE_FORMAT_VERSION = 1
+# Заголовок: сигнатура, версия формата (uint16), количество записей (uint32), выравнивание до 16 байт
+STATE_HEADER = struct.Struct('<4sHxxIxxxx')
+# Запись: ключ (16 байт), значение (int64)
+STATE_SLOT = struct.Struct('<16sq')
+EMPTY_KEY = bytes(16)
+
+# Идентификатор запуска (меняется при reset())
+BOOT_ID_KEY = 'boot_id'
+# Счетчик изменений, о которых нужно сообщить другим процессам (см. notify_changed())
+CHANGES_KEY = 'changes'
+
+
+def get_key_digest(key: str) -> bytes:
+    """ Ключ записи таблицы для строки ключа """
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+    return digest if digest != EMPTY_KEY else b'\x01' + digest[1:]
+
+
+def get_default_state_path(path_to_configs: str) -> str:
+    """ Путь к файлу состояния по умолчанию: во временной директории, свой для каждой папки конфигураций """
+    path_hash = hashlib.sha256(os.path.abspath(path_to_configs).encode('utf-8')).hexdigest()[:12]
+    return os.path.join(tempfile.gettempdir(), f'configurator-{path_hash}.state')
+
+
+class SharedState:
+    """ Общее состояние процессов
+
+    path: str | None - путь к файлу состояния (None - состояние только в памяти процесса)
+    slots: int - количество записей в таблице
+    poll_interval: float - период проверки изменений, сделанных другими процессами, в секундах
+    """
+
+    def __init__(self, path: str | None, slots: int, poll_interval: float):
+        self.path = path if fcntl is not None else None
+        self.slots = slots
+        self.poll_interval = poll_interval
+        self._size = STATE_HEADER.size + STATE_SLOT.size * slots
+        # блокировка между потоками процесса (flock не различает потоки одного процесса)
+        self._lock = threading.Lock()
+        # записи, которые не поместились в таблицу (только для этого процесса)
+        self._overflow: dict[bytes, int] = {}
+        # роль -> дескриптор файла блокировки роли (см. acquire_role())
+        self._roles: dict[str, int] = {}
+        # дескриптор файла <path>.run.lock, разделяемая блокировка которого держится, пока процесс работает
+        self._run_fd: int | None = None
+        self._listeners: list[Callable[[], None]] = []
+        self._thread: threading.Thread | None = None
+        self._stop_event = threading.Event()
+
+        if self.path is None:
+            self._fd = None
+            self._buffer = bytearray(self._size)
+            self._initialize()
+            self.boot_id = self.get_boot_id()
+            return
+
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        with self._locked():
+            is_new = os.fstat(self._fd).st_size != self._size
+            if is_new:
+                os.ftruncate(self._fd, self._size)
+            self._buffer = mmap.mmap(self._fd, self._size)
+            magic, format_version, slots = STATE_HEADER.unpack_from(self._buffer)
+            if is_new or (magic, format_version, slots) != (STATE_MAGIC, STATE_FORMAT_VERSION, self.slots):
+                self._initialize()
+        self.boot_id = self.get_boot_id()
+
+    @contextlib.contextmanager
+    def _locked(self) -> Iterator[None]:
+        """ Блокировка таблицы (между потоками и между процессами) """
+        with self._lock:
+            if self._fd is None:
+                yield
+                return
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _initialize(self):
+        """ Заполнение пустой таблицы с новым идентификатором запуска (вызывается под блокировкой) """
+        self._buffer[:] = bytes(self._size)
+        STATE_HEADER.pack_into(self._buffer, 0, STATE_MAGIC, STATE_FORMAT_VERSION, self.slots)
+        self._overflow.clear()
+        self._write(BOOT_ID_KEY, secrets.randbits(32))
+
+    def reset(self):
+        """ Очистка состояния и новый идентификатор запуска """
+        with self._locked():
+            self._initialize()
+        self.boot_id = self.get_boot_id()
+
+    def join(self) -> bool:
+        """ Присоединение процесса к запуску (при запуске API, до работы с таблицей).
+        Процесс держит разделяемую блокировку файла <path>.run.lock, пока работает. Если при присоединении
+        блокировку не держит ни один процесс, предыдущий запуск завершен и таблица очищается (reset()).
+        Присоединение выполняется под блокировкой файла <path>.init.lock, поэтому таблицу очищает только
+        первый процесс запуска. Повторный вызов ничего не делает.
+
+        :return: bool - True, если таблицу очистил этот процесс.
+        """
+        if self.path is None or self._run_fd is not None:
+            return False
+
+        init_fd = os.open(f'{self.path}.init.lock', os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(init_fd, fcntl.LOCK_EX)
+            run_fd = os.open(f'{self.path}.run.lock', os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(run_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                is_first = True
+            except OSError:
+                is_first = False
+            if is_first:
+                self.reset()
+            # исключительная блокировка заменяется разделяемой (остальные процессы ждут init.lock)
+            fcntl.flock(run_fd, fcntl.LOCK_SH)
+            self._run_fd = run_fd
+        finally:
+            os.close(init_fd)
+
+        # идентификатор мог измениться после открытия файла, если таблицу очистил другой процесс
+        self.boot_id = self.get_boot_id()
+        return is_first
+
+    # ----- таблица (методы с _ вызываются под блокировкой) -----
+
+    def _find_slot(self, digest: bytes, insert: bool) -> int | None:
+        """ Поиск записи по ключу (открытая адресация).
+
+        :param digest: ключ записи.
+        :param insert: создать запись, если ее нет.
+        :return: int - смещение записи, или None, если записи нет (или таблица заполнена).
+        """
+        start = int.from_bytes(digest[:8], 'little') % self.slots
+        for step in range(self.slots):
+            offset = STATE_HEADER.size + STATE_SLOT.size * ((start + step) % self.slots)
+            slot_key = self._buffer[offset:offset + 16]
+            if slot_key == digest:
+                return offset
+            if slot_key == EMPTY_KEY:
+                if not insert:
+                    return None
+                STATE_SLOT.pack_into(self._buffer, offset, digest, 0)
+                return offset
+        return None
+
+    def _read(self, key: str) -> int | None:
+        digest = get_key_digest(key)
+        offset = self._find_slot(digest, insert=False)
+        if offset is None:
+            return self._overflow.get(digest)
+        return STATE_SLOT.unpack_from(self._buffer, offset)[1]
+
+    def _delete(self, key: str):
+        """ Удаление записи со сдвигом следующих записей цепочки (чтобы поиск не останавливался на пустой записи) """
+        digest = get_key_digest(key)
+        self._overflow.pop(digest, None)
+        offset = self._find_slot(digest, insert=False)
+        if offset is None:
+            return
+
+        index = (offset - STATE_HEADER.size) // STATE_SLOT.size
+        STATE_SLOT.pack_into(self._buffer, offset, EMPTY_KEY, 0)
+        next_index = index
+        for _ in range(self.slots - 1):
+            next_index = (next_index + 1) % self.slots
+            next_offset = STATE_HEADER.size + STATE_SLOT.size * next_index
+            next_digest, value = STATE_SLOT.unpack_from(self._buffer, next_offset)
+            if next_digest == EMPTY_KEY:
+                return
+            # запись переносится в освободившееся место, если ее исходная позиция не между ним и ее местом
+            home_index = int.from_bytes(next_digest[:8], 'little') % self.slots
+            if (next_index - home_index) % self.slots >= (next_index - index) % self.slots:
+                STATE_SLOT.pack_into(self._buffer, STATE_HEADER.size + STATE_SLOT.size * index, next_digest, value)
+                STATE_SLOT.pack_into(self._buffer, next_offset, EMPTY_KEY, 0)
+                index = next_index
+
+    def _write(self, key: str, value: int):
+        digest = get_key_digest(key)
+        offset = self._find_slot(digest, insert=True)
+        if offset is None:
+            if not self._overflow:
+                logger.warning(f'Общее состояние процессов заполнено ({self.slots} записей), новые записи '
+                               f'хранятся только в памяти процесса. Увеличьте server.state_slots.')
+            self._overflow[digest] = value
+            return
+        STATE_SLOT.pack_into(self._buffer, offset, digest, value)
+
+    # ----- операции -----
+
+    def get(self, key: str) -> int | None:
+        """ Значение по ключу (None, если значения нет) """
+        with self._locked():
+            return self._read(key)
+
+    def get_values(self, keys: list[str]) -> list[int | None]:
+        """ Значения нескольких ключей, прочитанные атомарно """
+        with self._locked():
+            return [self._read(key) for key in keys]
+
+    def set(self, key: str, value: int):
+        with self._locked():
+            self._write(key, value)
+
+    def set_values(self, values: dict[str, int]):
+        """ Атомарная запись нескольких значений """
+        with self._locked():
+            for key, value in values.items():
+                self._write(key, value)
+
+    def delete(self, keys: list[str]):
+        """ Удаление значений ключей (отсутствующие ключи пропускаются) """
+        with self._locked():
+            for key in keys:
+                self._delete(key)
+
+    def exchange(self, key: str, value: int) -> int | None:
+        """ Запись значения с возвратом предыдущего (None, если значения не было) """
+        with self._locked():
+            previous = self._read(key)
+            self._write(key, value)
+            return previous
+
+    def increment(self, key: str) -> int:
+        """ Увеличение значения на 1 (отсутствующее значение считается 0)
+
+        :return: int - новое значение.
+        """
+        with self._locked():
+            value = (self._read(key) or 0) + 1
+            self._write(key, value)
+            return value
+
+    def acquire_lease(self, key: str, now: int, until: int) -> bool:
+        """ Захват аренды: значение ключа - время окончания аренды. Аренду можно захватить, если она закончилась.
+
+        :param key: ключ аренды.
+        :param now: текущее время (в тех же единицах, что и until).
+        :param until: время окончания новой аренды.
+        :return: bool - True, если аренда захвачена.
+        """
+        with self._locked():
+            if (self._read(key) or 0) > now:
+                return False
+            self._write(key, until)
+            return True
+
+    def get_boot_id(self) -> str:
+        """ Идентификатор запуска из таблицы (общий для всех процессов, меняется при reset()).
+        Значение, прочитанное при join(), хранится в поле boot_id.
+        """
+        return f'{self.get(BOOT_ID_KEY) or 0:08x}'
+
+    # ----- роли и уведомления -----
+
+    def acquire_role(self, name: str) -> bool:
+        """ Захват роли, которую может выполнять только один процесс (например, наблюдение за конфигурациями).
+        Роль - блокировка файла <path>.<name>.lock, она снимается при завершении процесса,
+        после чего роль может захватить другой процесс.
+
+        :param name: название роли.
+        :return: bool - True, если роль принадлежит этому процессу.
+        """
+        if self.path is None or name in self._roles:
+            return True
+        fd = os.open(f'{self.path}.{name}.lock', os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._roles[name] = fd
+        return True
+
+    def release_role(self, name: str):
+        fd = self._roles.pop(name, None)
+        if fd is not None:
+            os.close(fd)
+
+    def notify_changed(self):
+        """ Уведомление всех процессов об изменении (вызываются функции add_listener() в каждом процессе) """
+        self.increment(CHANGES_KEY)
+
+    def add_listener(self, listener: Callable[[], None]):
+        """ Добавление функции, которая вызывается после notify_changed() в любом процессе
+        (в потоке проверки изменений, поэтому должна быть потокобезопасной)
+
+        :param listener: функция без аргументов.
+        """
+        self._listeners.append(listener)
+
+    def start(self):
+        """ Запуск потока проверки изменений (повторный вызов ничего не делает) """
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='shared-state-poller', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        thread = self._thread
+        if thread is None:
+            return
+        self._stop_event.set()
+        thread.join(timeout=self.poll_interval * 2)
+        self._thread = None
+
+    def _run(self):
+        changes = self.get(CHANGES_KEY)
+        while not self._stop_event.wait(self.poll_interval):
+            new_changes = self.get(CHANGES_KEY)
+            if new_changes == changes:
+                continue
+            changes = new_changes
+            for listener in self._listeners:
+                listener()
+
+
+def open_shared_state() -> SharedState:
+    """ Открытие общего состояния по настройкам из config.toml """
+    if fcntl is None:
+        if SERVER_WORKERS > 1:
+            logger.warning('fcntl недоступен, состояние процессов не общее: '
+                           'свежесть конфигураций и версии данных у каждого процесса свои.')
+        return SharedState(None, SHARED_STATE_SLOTS, SHARED_STATE_POLL_INTERVAL)
+    path = SHARED_STATE_PATH or get_default_state_path(PATH_TO_TRADE_SERVERS_CONFIGS)
+    return SharedState(path, SHARED_STATE_SLOTS, SHARED_STATE_POLL_INTERVAL)
+
+
+# Общее состояние процессов Configurator
+shared_state = open_shared_state()
@@ -9,59 +9,42 @@ import os
 import time
 from typing import Any
 
+from src.api.config_watcher import config_watcher
+from src.api.shared_state import shared_state
 from src.responses_models.api_errors import JsonDecodeError
 from src.logger.logger import logger
 
-# словарь для хранения времени последнего обновления конфигурации core и gate
-# строится следующим образом:
-# str - exchange_id + instance; Пример: binance1
-# float - время изменения, os.path.getmtime()
-# Значение в словаре обновляется при каждом запросе этих конфигов
-dirs_times_of_update: dict[str, float] = {}
+# Версия конфигурации core и gate, отданная при последнем запросе, хранится в общем состоянии процессов
+# (shared_state) по ключу DELIVERED_VERSION_KEY.format(<путь к директории торгового сервера>),
+# значение - версия директории, config_watcher.get_version(). Обновляется при каждом запросе этих конфигов.
+# Поэтому при нескольких процессах uvicorn свежая конфигурация отдается ровно один раз.
+# Путь нормализуется (os.path.normpath()), как в config_watcher, чтобы запись удалялась вместе с директорией.
+DELIVERED_VERSION_KEY = 'delivered:{}'
+
+
+def remove_delivered_version(path_to_dir: str):
+    """ Функция удаляет отданную версию директории торгового сервера (после удаления директории) """
+    shared_state.delete([DELIVERED_VERSION_KEY.format(path_to_dir)])
+
+
+config_watcher.add_removal_listener(remove_delivered_version)
 
 
 def check_update_of_dir(path_to_dir: str) -> bool:
     """ Функция для проверки, обновлялась ли директория с момента последней проверки.
-    Директория считается обновленной, если внутри неё был изменен хотя бы один файл.
+    Директория считается обновленной, если внутри неё был изменен, создан, удален или переименован хотя бы один файл.
     При первой проверки директории всегда возвращает True.
+    Изменения отслеживает config_watcher в фоновом потоке, поэтому файловая система здесь не читается.
 
     :param path_to_dir: Путь до директории, которую нужно проверить на обновления. Будет сохранен в функции.
     :return: bool - True, если хотя бы один файл обновился. False, если ни один файл не обновился.
     """
 
-    dir_change_time = get_dir_last_change_time(path_to_dir)
-
-    is_configs_updated = dirs_times_of_update.get(path_to_dir, 0) < dir_change_time
-    if is_configs_updated:
-        # записываю время последнего обновления
-        dirs_times_of_update[path_to_dir] = dir_change_time
-
-    return is_configs_updated
-
-
-def get_dir_last_change_time(path_to_dir: str) -> float:
-    """
-    Функция рекурсивно обходит файлы и возвращает время
-    последнего изменения среди файлов в директории и вложенных директориях.
-    Если в папке нет файлов, будет возвращено значение -1
-
-    Предусловие: директория path_to_dir существует.
-
-    :param path_to_dir: str - название папки, с которой нужно начать обход файлов.
-    :return: float - время последнего изменения среди файлов в директории и вложенных директориях
-    """
-    # переменная будет хранить время последнего изменения
-    last_change_time: float = -1
-    # начинаем обход директорий
-    for root, dirs, files in os.walk(path_to_dir):
-        for file in files:
-            # получаем время последнего изменения файла
-            file_last_change_time = os.path.getmtime(os.path.join(root, file))
-            # сравниваем с временем предыдущего последнего изменения другого файла
-            if last_change_time < file_last_change_time:
-                last_change_time = file_last_change_time
+    dir_version = config_watcher.get_version(path_to_dir)
 
-    return last_change_time
+    # записываю версию, которая отдается, и получаю предыдущую одной атомарной операцией
+    key = DELIVERED_VERSION_KEY.format(os.path.normpath(path_to_dir))
+    return shared_state.exchange(key, dir_version) != dir_version
 
 
 def get_jsons_from_dir(path_to_dir: str) -> dict:
@@ -70,14 +53,15 @@ def get_jsons_from_dir(path_to_dir: str) -> dict:
     :param path_to_dir: str - путь до конфига (абсолютный или относительный)
     :return: dict - словарь с соответствием [Имя_файла : Содержимое_файла]
     """
-    # Получение списка файлов в папке (нужно для названий в словаре)
-    files: list = os.listdir(path_to_dir)
+    # Получение списка файлов в папке (нужно для названий в словаре), в постоянном порядке
+    files: list = sorted(os.listdir(path_to_dir))
 
     # Чтение файлов json
     files_content: list = []
     for file_name in files:
         try:
-            current_file_content: dict = json.load(open(f'{path_to_dir}{file_name}'))
+            with open(f'{path_to_dir}{file_name}') as current_file:
+                current_file_content: dict = json.load(current_file)
             # Проверка на пустоту (пустой dict интерпретируется как false)
             if not current_file_content:
                 logger.error(f'Файл {path_to_dir}{file_name} пустой.')
@@ -92,6 +76,19 @@ def get_jsons_from_dir(path_to_dir: str) -> dict:
     return result
 
 
+def check_etag_match(if_none_match: str, etag: str) -> bool:
+    """ Функция для проверки, совпадает ли заголовок If-None-Match с ETag (слабое сравнение, RFC 7232).
+
+    :param if_none_match: значение заголовка If-None-Match (один или несколько ETag через запятую, либо *).
+    :param etag: текущий ETag.
+    :return: True, если хотя бы один ETag из заголовка совпадает с текущим.
+    """
+    if if_none_match.strip() == '*':
+        return True
+    etag = etag.removeprefix('W/')
+    return any(tag.strip().removeprefix('W/') == etag for tag in if_none_match.split(','))
+
+
 def get_micro_timestamp() -> int:
     """ Функция для получения текущего timestamp в микросекундах
 
@@ -3,18 +3,271 @@
 \author github:khanbekov, telegram:qoddrysdaim
 \brief В файле объявлен обработчик логов, отправляющий логи по Aeron
 \data 2022.04.11
+
+Обработчик не отправляет логи в потоке, который их пишет (в том числе в потоке запросов API):
+emit() только форматирует запись и кладет ее в ограниченный буфер, а отправкой занимается отдельный поток.
+Поток забирает из буфера сразу несколько записей и отправляет их одним сообщением (записи разделены '\\n').
+Если канал перегружен (back pressure), поток повторяет отправку, а записи тем временем копятся в буфере.
+Если буфер заполнен, записи отбрасываются по правилу drop_policy. Все отброшенные записи и отказы канала
+считаются (см. AeronHandler.get_stats()).
+Если publisher не удалось создать (медиа-драйвер не запущен, нет библиотеки aeron), обработчик пишет записи
+в stderr, чтобы ошибка Aeron не останавливала загрузку конфигурации логгера и запуск Configurator.
 """
-from aeron import Publisher
-from logging import StreamHandler
+import logging
+import sys
+import threading
+import time
+from collections import deque
+from typing import NamedTuple
+
+# Коды ошибок Publication.offer() в Aeron
+NOT_CONNECTED = -1
+BACK_PRESSURED = -2
+ADMIN_ACTION = -3
+PUBLICATION_CLOSED = -4
+MAX_POSITION_EXCEEDED = -5
+
+# Ошибки, после которых отправку имеет смысл повторить
+RETRYABLE_RESULTS = (BACK_PRESSURED, ADMIN_ACTION)
+
+# Правила отбрасывания записей при заполненном буфере:
+#   drop_new - отбросить новую запись;
+#   drop_oldest - отбросить самую старую запись в буфере;
+#   block - ждать место в буфере не дольше block_timeout секунд, затем отбросить новую запись
+DROP_POLICIES = ('drop_new', 'drop_oldest', 'block')
+
+# Разделитель записей в одном сообщении
+RECORDS_SEPARATOR = '\n'
+# Размер разделителя в байтах (UTF-8)
+RECORDS_SEPARATOR_SIZE = len(RECORDS_SEPARATOR.encode('utf-8'))
+
+
+class AeronHandlerStats(NamedTuple):
+    """ Счетчики обработчика логов Aeron (с момента создания)
+
+    offered: int - записи, успешно отправленные в канал
+    offers: int - успешные отправки (сообщения, в каждом одна или несколько записей)
+    dropped: int - отброшенные записи (буфер заполнен или канал не принял сообщение)
+    back_pressured: int - отказы канала, после которых отправка повторялась (back pressure, admin action)
+    not_connected: int - отказы канала без подписчиков, закрытого или переполненного (сообщение отброшено)
+    queued: int - записи в буфере сейчас
+    """
+    offered: int
+    offers: int
+    dropped: int
+    back_pressured: int
+    not_connected: int
+    queued: int
 
 
-class AeronHandler(StreamHandler):
-    def __init__(self, channel, stream_id):
+class AeronHandler(logging.Handler):
+    """ Обработчик логов, отправляющий логи по Aeron из отдельного потока
+
+    channel: str - канал Aeron
+    stream_id: int - id потока Aeron
+    queue_size: int - максимальное количество записей в буфере
+    drop_policy: str - правило отбрасывания записей при заполненном буфере (см. DROP_POLICIES)
+    block_timeout: float - сколько секунд ждать место в буфере (drop_policy = 'block')
+    batch_max_records: int - максимальное количество записей в одном сообщении (1 - без объединения)
+    batch_max_bytes: int - максимальный размер сообщения в байтах (одна запись отправляется, даже если больше)
+    max_retries: int - сколько раз повторять отправку сообщения при back pressure, прежде чем его отбросить
+    retry_interval: float - пауза между повторами отправки в секундах
+    close_timeout: float - сколько секунд при закрытии ждать отправки оставшихся записей
+    publisher - объект с методом offer(str) (по умолчанию aeron.Publisher(channel, stream_id);
+                если его не удалось создать, записи пишутся в stderr)
+    """
+
+    def __init__(self, channel: str, stream_id: int, queue_size: int = 10000, drop_policy: str = 'drop_new',
+                 block_timeout: float = 0.1, batch_max_records: int = 32, batch_max_bytes: int = 16384,
+                 max_retries: int = 100, retry_interval: float = 0.001, close_timeout: float = 2.0,
+                 publisher=None):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f'Неизвестное правило drop_policy: {drop_policy}. Допустимые: {", ".join(DROP_POLICIES)}')
         super().__init__()
-        self.aeron_publisher = Publisher(channel, stream_id)
 
-    def emit(self, record):
-        msg = self.format(record)
-        self.aeron_publisher.offer(msg)
+        # Все поля задаются до создания publisher: если он не создастся, flush() и close() (их вызывает
+        # logging.shutdown() при выходе) должны работать на недостроенном обработчике
+        self.aeron_publisher = publisher
+        self.queue_size = queue_size
+        self.drop_policy = drop_policy
+        self.block_timeout = block_timeout
+        self.batch_max_records = max(batch_max_records, 1)
+        self.batch_max_bytes = batch_max_bytes
+        self.max_retries = max_retries
+        self.retry_interval = retry_interval
+        self.close_timeout = close_timeout
+
+        # буфер отформатированных записей: (запись, размер записи в байтах UTF-8)
+        self._queue: deque[tuple[str, int]] = deque()
+        # защищает буфер и счетчики; уведомляет поток отправки о новых записях, а писателей - о месте в буфере
+        self._condition = threading.Condition(threading.Lock())
+        # количество записей, которые поток отправки забрал из буфера, но еще не отправил
+        self._in_flight = 0
+        self._offered = 0
+        self._offers = 0
+        self._dropped = 0
+        self._back_pressured = 0
+        self._not_connected = 0
+        self._closing = False
+        self._thread = threading.Thread(target=self._run, name='aeron-log-publisher', daemon=True)
+        # поток, в который пишутся записи, если publisher не удалось создать
+        self._fallback_stream = None
+
+        if publisher is None:
+            try:
+                from aeron import Publisher
+                self.aeron_publisher = Publisher(channel, stream_id)
+            except Exception as e:
+                self._fallback_stream = sys.stderr
+                self._fallback_stream.write(f'CRITICAL: Не удалось подключиться к Aeron ({channel}, '
+                                            f'stream {stream_id}): {e}. Логи пишутся в stderr.\n')
+                return
+        self._thread.start()
+
+    def emit(self, record: logging.LogRecord):
+        """ Запись лога в буфер (отправка выполняется в потоке отправки) """
+        try:
+            message = self.format(record)
+            # размер считается в байтах: в логах кириллица, символ которой занимает 2 байта
+            message_size = len(message.encode('utf-8'))
+        except Exception:
+            self.handleError(record)
+            return
+
+        if self._fallback_stream is not None:
+            self._write_fallback(message, record)
+            return
+
+        with self._condition:
+            if self._closing:
+                self._dropped += 1
+                return
+            if len(self._queue) >= self.queue_size:
+                if self.drop_policy == 'drop_oldest':
+                    self._queue.popleft()
+                    self._dropped += 1
+                elif not self._wait_for_space():
+                    self._dropped += 1
+                    return
+            self._queue.append((message, message_size))
+            self._condition.notify_all()
+
+    def _write_fallback(self, message: str, record: logging.LogRecord):
+        """ Запись в stderr, если Aeron недоступен (вызывается под блокировкой обработчика из handle()) """
+        try:
+            self._fallback_stream.write(message + '\n')
+            self._fallback_stream.flush()
+        except Exception:
+            self.handleError(record)
+
+    def _wait_for_space(self) -> bool:
+        """ Ожидание места в буфере (только для drop_policy = 'block', вызывается под self._condition)
+
+        :return: bool - True, если место в буфере появилось.
+        """
+        if self.drop_policy != 'block':
+            return False
+        has_space = self._condition.wait_for(lambda: len(self._queue) < self.queue_size or self._closing,
+                                             self.block_timeout)
+        return has_space and not self._closing
+
+    def get_stats(self) -> AeronHandlerStats:
+        """ Получение счетчиков обработчика """
+        with self._condition:
+            return AeronHandlerStats(
+                offered=self._offered,
+                offers=self._offers,
+                dropped=self._dropped,
+                back_pressured=self._back_pressured,
+                not_connected=self._not_connected,
+                queued=len(self._queue) + self._in_flight,
+            )
+
+    def flush(self, timeout: float | None = None):
+        """ Ожидание отправки всех записей из буфера (не дольше timeout секунд, по умолчанию close_timeout) """
+        timeout = self.close_timeout if timeout is None else timeout
+        with self._condition:
+            self._condition.wait_for(lambda: not self._queue and not self._in_flight, timeout)
+
+    def close(self):
+        """ Отправка оставшихся записей (не дольше close_timeout секунд) и остановка потока отправки """
+        self.flush()
+        with self._condition:
+            self._closing = True
+            self._condition.notify_all()
+        # поток не запущен, если publisher не удалось создать
+        if self._thread.is_alive():
+            self._thread.join(self.close_timeout)
+        super().close()
+
+    # ----- поток отправки -----
+
+    def _take_batch(self) -> list[str] | None:
+        """ Ожидание записей в буфере и выбор записей для одного сообщения.
+
+        :return: list[str] - записи, или None, если обработчик закрыт и буфер пуст.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._queue or self._closing)
+            if not self._queue:
+                return None
+
+            message, size = self._queue.popleft()
+            batch = [message]
+            while self._queue and len(batch) < self.batch_max_records:
+                size += self._queue[0][1] + RECORDS_SEPARATOR_SIZE
+                if size > self.batch_max_bytes:
+                    break
+                batch.append(self._queue.popleft()[0])
+
+            self._in_flight = len(batch)
+            # место в буфере освободилось
+            self._condition.notify_all()
+            return batch
+
+    def _offer(self, message: str) -> bool:
+        """ Отправка сообщения с повторами при back pressure.
+
+        :param message: сообщение.
+        :return: bool - True, если сообщение принято каналом.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                result = self.aeron_publisher.offer(message)
+            except Exception:
+                with self._condition:
+                    self._not_connected += 1
+                return False
+
+            # привязки Aeron возвращают позицию в потоке (>= 0) или код ошибки (< 0)
+            if result is False or result in RETRYABLE_RESULTS:
+                with self._condition:
+                    self._back_pressured += 1
+                    closing = self._closing
+                if closing and attempt:
+                    # при закрытии не ждать, пока канал освободится
+                    return False
+                time.sleep(self.retry_interval)
+                continue
+            if isinstance(result, int) and not isinstance(result, bool) and result < 0:
+                with self._condition:
+                    self._not_connected += 1
+                return False
+            return True
+        return False
 
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
 
+            is_offered = self._offer(RECORDS_SEPARATOR.join(batch))
+            with self._condition:
+                if is_offered:
+                    self._offered += len(batch)
+                    self._offers += 1
+                else:
+                    self._dropped += len(batch)
+                self._in_flight = 0
+                self._condition.notify_all()
@@ -0,0 +1,82 @@
+"""
+\file aeron_probe.py
+\author github:khanbekov, telegram:qoddrysdaim
+\brief В файле находится проверка, запущен ли медиа-драйвер Aeron (без вызова systemctl)
+\data 2026.10.18
+
+Медиа-драйвер Aeron создает в своей директории файл cnc.dat. В нем находится кольцевой буфер команд драйверу,
+и драйвер, пока работает, регулярно обновляет в этом буфере время своей активности (consumer heartbeat).
+Проверка читает только заголовок файла и это время, поэтому занимает миллисекунды.
+"""
+import getpass
+import os
+import struct
+import sys
+import tempfile
+import time
+
+from src.logger.logger import logger
+
+# Имя файла управления драйвером (Command and Control)
+CNC_FILENAME = 'cnc.dat'
+# Длина метаданных cnc.dat (выровнена по двум кэш-линиям)
+CNC_METADATA_LENGTH = 128
+# Смещение длины буфера команд драйверу в метаданных cnc.dat
+TO_DRIVER_BUFFER_LENGTH_OFFSET = 4
+# Длина служебной части кольцевого буфера (в конце буфера) и смещение в ней времени активности драйвера
+RING_BUFFER_TRAILER_LENGTH = 768
+CONSUMER_HEARTBEAT_OFFSET = 640
+# Драйвер считается остановленным, если время активности не обновлялось дольше этого времени (мс)
+DRIVER_TIMEOUT_MS = 10_000
+
+
+def get_default_aeron_dir() -> str:
+    """ Директория медиа-драйвера Aeron по умолчанию (как в самом Aeron) """
+    base_dir = '/dev/shm' if sys.platform.startswith('linux') else tempfile.gettempdir()
+    return os.path.join(base_dir, f'aeron-{getpass.getuser()}')
+
+
+def get_driver_heartbeat_age(aeron_dir: str) -> float:
+    """ Функция возвращает, сколько миллисекунд назад медиа-драйвер Aeron обновлял время своей активности.
+
+    :param aeron_dir: директория медиа-драйвера Aeron.
+    :return: float - время с последней активности драйвера в миллисекундах.
+    :raises OSError: если файла cnc.dat нет или его не удалось прочитать.
+    """
+    with open(os.path.join(aeron_dir, CNC_FILENAME), 'rb') as cnc_file:
+        metadata = cnc_file.read(CNC_METADATA_LENGTH)
+        if len(metadata) < CNC_METADATA_LENGTH:
+            raise OSError(f'Файл {CNC_FILENAME} слишком короткий')
+        to_driver_buffer_length, = struct.unpack_from('<i', metadata, TO_DRIVER_BUFFER_LENGTH_OFFSET)
+
+        cnc_file.seek(CNC_METADATA_LENGTH + to_driver_buffer_length - RING_BUFFER_TRAILER_LENGTH +
+                      CONSUMER_HEARTBEAT_OFFSET)
+        heartbeat = cnc_file.read(8)
+        if len(heartbeat) < 8:
+            raise OSError(f'Файл {CNC_FILENAME} слишком короткий')
+
+    heartbeat_ms, = struct.unpack('<q', heartbeat)
+    return time.time() * 1000 - heartbeat_ms
+
+
+def probe_aeron(aeron_dir: str = '') -> bool:
+    """ Проверка, запущен ли медиа-драйвер Aeron. Результат записывается в лог, запуск Configurator не прерывается
+    (без Aeron логи не публикуются, но API работает).
+
+    :param aeron_dir: директория медиа-драйвера Aeron ('' - директория по умолчанию).
+    :return: True, если драйвер запущен.
+    """
+    aeron_dir = aeron_dir or get_default_aeron_dir()
+    try:
+        heartbeat_age = get_driver_heartbeat_age(aeron_dir)
+    except OSError as e:
+        logger.critical(f'Медиа-драйвер Aeron не найден в {aeron_dir}. Пожалуйста, запустите Aeron. Error: {e}')
+        return False
+
+    if heartbeat_age > DRIVER_TIMEOUT_MS:
+        logger.critical(f'Медиа-драйвер Aeron в {aeron_dir} не отвечает {heartbeat_age / 1000:.0f} с. '
+                        f'Пожалуйста, запустите Aeron.')
+        return False
+
+    logger.info(f'Медиа-драйвер Aeron запущен ({aeron_dir}).')
+    return True
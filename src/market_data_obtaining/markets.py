@@ -5,14 +5,68 @@
 \data 2022.03.12
 
 Для получения данных используется библиотека ccxt
-Для хранения структурированных данных используется библиотека pydantic
+Маркеты хранятся в виде MarketRecord (без проверки pydantic), модели pydantic описывают формат ответа API
+
+ccxt при импорте загружает модули всех бирж (занимает секунды), поэтому импортируется только при первой
+загрузке маркетов (load_ccxt()), а не при импорте этого модуля. Список бирж берется из файлов пакета без импорта.
+Импортировать только модуль нужной биржи (ccxt.async_support.<exchange_id>) нельзя: при этом выполняются
+ccxt/__init__.py и ccxt/async_support/__init__.py, которые сами импортируют модули всех бирж.
 """
+from __future__ import annotations
 
-import ccxt
+import functools
+import importlib.util
+import os
+import typing
 
 import src.responses_models.market_models as market_models
 from src.api.utils import handle_precision
 
+if typing.TYPE_CHECKING:
+    import ccxt
+    import ccxt.async_support
+
+# Группы лимитов маркета (поля Market.Limits)
+LIMITS_FIELDS = ('amount', 'price', 'cost', 'leverage')
+
+
+def to_optional_float(value) -> float | None:
+    """ Приведение значения к float так же, как поле Optional[float] модели pydantic (None остается None) """
+    return None if value is None else float(value)
+
+
+def format_limits(limits: dict) -> dict:
+    """ Функция оставляет в лимитах маркета ccxt только поля Market.Limits ({min, max} для каждой группы).
+    Отсутствующие группы и значения заменяются на None.
+
+    :param limits: лимиты маркета в том виде, в котором их дает ccxt
+    :return: dict - лимиты в формате Market.Limits
+    """
+    result = {}
+    for field in LIMITS_FIELDS:
+        min_max = limits.get(field) or {}
+        result[field] = {'min': to_optional_float(min_max.get('min')), 'max': to_optional_float(min_max.get('max'))}
+    return result
+
+
+def make_market_record(market: dict, is_decimal_precision: bool) -> market_models.MarketRecord:
+    """ Функция собирает MarketRecord из маркета ccxt (результат совпадает с Market, но без проверки pydantic)
+
+    :param market: маркет в том виде, в котором его дает ccxt
+    :param is_decimal_precision: bool - нужно ли конвертировать точность из int в float
+    :return: MarketRecord - маркет для ответа API и построения маршрутов
+    """
+    precision = market['precision']
+    return market_models.MarketRecord(
+        exchange_symbol=market['id'],
+        common_symbol=market['symbol'],
+        price_increment=to_optional_float(handle_precision(precision['price'], is_decimal_precision)),
+        amount_increment=to_optional_float(handle_precision(precision['amount'], is_decimal_precision)),
+        limits=format_limits(market['limits']),
+        base_asset=market['baseId'],
+        quote_asset=market['quoteId']
+    )
+
 
 async def format_assets_labels(markets: ccxt.Exchange.markets, chosen_assets: list[str]) \
         -> list[market_models.AssetLabel]:
@@ -28,8 +82,10 @@ async def format_assets_labels(markets: ccxt.Exchange.markets, chosen_assets: li
 
     results: list[market_models.AssetLabel] = []
 
-    # список уже добавленных активов
-    added: list[str] = []
+    # множество выбранных ассетов (для быстрой проверки вхождения)
+    chosen_assets = set(chosen_assets)
+    # множество уже добавленных активов
+    added: set[str] = set()
 
     # В цикле перебираются все элементы markets - каждый из них это валютная пара с двумя ассетами
     for market in markets.values():
@@ -39,7 +95,7 @@ async def format_assets_labels(markets: ccxt.Exchange.markets, chosen_assets: li
             # проверяю, обрабатывал ли я базовый ассет
             if market['baseId'] not in added:
                 # добавляю ассет в списки добавленных ассетов и итоговый список
-                added.append(market['baseId'])
+                added.add(market['baseId'])
                 results.append(
                     market_models.AssetLabel(
                         exchange=market['baseId'],
@@ -49,7 +105,7 @@ async def format_assets_labels(markets: ccxt.Exchange.markets, chosen_assets: li
             # проверяю, обрабатывал ли я котируемый ассет
             if market['quoteId'] not in added:
                 # добавляю ассет в списки добавленных ассетов и итоговый список
-                added.append(market['quoteId'])
+                added.add(market['quoteId'])
                 results.append(
                     market_models.AssetLabel(
                         exchange=market['quoteId'],
@@ -61,20 +117,23 @@ async def format_assets_labels(markets: ccxt.Exchange.markets, chosen_assets: li
 
 
 async def format_markets(markets: ccxt.Exchange.markets, is_decimal_precision: bool, chosen_assets: list[str]) \
-        -> list[market_models.Market]:
-    """Функция форматирует список markets, который возвращает ccxt, в список объектов Market
-    Основная задача - отбрасывание лишних данных, в объекты Market добавляются только нужные.
+        -> list[market_models.MarketRecord]:
+    """Функция форматирует список markets, который возвращает ccxt, в список объектов MarketRecord
+    Основная задача - отбрасывание лишних данных, в объекты MarketRecord добавляются только нужные.
     Отбрасываются все ассеты, не указанные в choset_assets
 
     :param markets: ccxt.Exchange.markets - список маркетов в том виде, в котором их дает ccxt
     :param is_decimal_precision: bool - нужно ли конвертировать точность из int в float
     :param chosen_assets: list[str] - выбранные ассеты. Только они будут добавлены в возвращаемый массив.
-    :return: list[market_models.Market] - список объектов Market, полученный из markets
+    :return: list[market_models.MarketRecord] - список объектов MarketRecord, полученный из markets
     """
     if markets is None:
         return []
 
-    results: list[market_models.Market] = []
+    results: list[market_models.MarketRecord] = []
+
+    # множество выбранных ассетов (для быстрой проверки вхождения)
+    chosen_assets = set(chosen_assets)
 
     # В цикле перебираются все элементы markets
     for market in markets.values():
@@ -82,31 +141,105 @@ async def format_markets(markets: ccxt.Exchange.markets, is_decimal_precision: b
         if market['baseId'] in chosen_assets and \
                 market['quoteId'] in chosen_assets and \
                 market['type'] == 'spot':
-            # в итоговый список добавляются объекты Market, собранные из данных списка markets
-            results.append(
-                market_models.Market(
-                    exchange_symbol=market['id'],
-                    common_symbol=market['symbol'],
-                    price_increment=handle_precision(market['precision']['price'], is_decimal_precision),
-                    amount_increment=handle_precision(market['precision']['amount'], is_decimal_precision),
-                    limits=market_models.Market.Limits(
-                       **market['limits']
-                    ),
-                    base_asset=market['baseId'],
-                    quote_asset=market['quoteId']
-                )
-            )
+            # в итоговый список добавляются объекты MarketRecord, собранные из данных списка markets
+            results.append(make_market_record(market, is_decimal_precision))
 
     return results
 
 
+class MarketsIndex:
+    """ Индекс маркетов ccxt по базовому ассету.
+    Строится один раз после загрузки маркетов биржи и позволяет обходить не все маркеты биржи
+    (на крупных биржах их тысячи), а только маркеты выбранных ассетов.
+
+    markets: list[dict] - маркеты в порядке, в котором их дает ccxt
+    positions_by_base: dict[str, list[int]] - базовый ассет (baseId) -> позиции его маркетов в markets
+    """
+
+    def __init__(self, markets: ccxt.Exchange.markets):
+        self.markets: list[dict] = list(markets.values()) if markets is not None else []
+        self.positions_by_base: dict[str, list[int]] = {}
+
+        for position, market in enumerate(self.markets):
+            self.positions_by_base.setdefault(market['baseId'], []).append(position)
+
+    def select(self, chosen_assets: set[str]) -> list[dict]:
+        """ Выбор маркетов, в которых базовый и котируемый ассеты есть среди выбранных.
+
+        :param chosen_assets: множество выбранных ассетов.
+        :return: список маркетов ccxt в исходном порядке.
+        """
+        positions = [
+            position
+            for asset in chosen_assets
+            for position in self.positions_by_base.get(asset, ())
+            if self.markets[position]['quoteId'] in chosen_assets
+        ]
+        positions.sort()
+        return [self.markets[position] for position in positions]
+
+
+def format_market_data(markets_index: MarketsIndex, is_decimal_precision: bool, chosen_assets: list[str]) \
+        -> tuple[list[market_models.MarketRecord], list[market_models.AssetLabel]]:
+    """ Функция за один проход по маркетам выбранных ассетов формирует список объектов MarketRecord
+    и список названий ассетов. Результат совпадает с format_markets() и format_assets_labels().
+    Список маркетов также является входными данными для построения торговых маршрутов.
+
+    :param markets_index: MarketsIndex - индекс маркетов биржи
+    :param is_decimal_precision: bool - нужно ли конвертировать точность из int в float
+    :param chosen_assets: list[str] - выбранные ассеты. Только они будут добавлены в возвращаемые списки.
+    :return: список объектов MarketRecord (только spot) и список названий ассетов
+    """
+    markets: list[market_models.MarketRecord] = []
+    assets_labels: list[market_models.AssetLabel] = []
+
+    # множество уже добавленных активов
+    added: set[str] = set()
+
+    for market in markets_index.select(set(chosen_assets)):
+        # названия ассетов добавляются для всех маркетов, а не только spot (как в format_assets_labels())
+        for asset_id, asset in ((market['baseId'], market['base']), (market['quoteId'], market['quote'])):
+            if asset_id not in added:
+                added.add(asset_id)
+                assets_labels.append(market_models.AssetLabel(exchange=asset_id, common=asset))
+
+        if market['type'] == 'spot':
+            markets.append(make_market_record(market, is_decimal_precision))
+
+    return markets, assets_labels
+
+
+def load_ccxt():
+    """ Функция импортирует ccxt и ccxt.async_support (занимает секунды, т.к. загружаются модули всех бирж).
+    Импорт одной биржи стоит столько же: __init__.py пакетов ccxt импортируют все биржи (см. описание модуля).
+    Вызывается в отдельном потоке при запуске API и перед первой загрузкой маркетов, повторный вызов ничего не стоит.
+    """
+    import ccxt.async_support
+
+
+@functools.cache
+def get_ccxt_exchanges() -> frozenset[str]:
+    """ Функция возвращает список бирж ccxt без импорта ccxt.
+    Каждой бирже соответствует модуль ccxt/async_support/<exchange_id>.py (как и ccxt.exchanges).
+
+    :return: frozenset[str] - названия бирж (exchange id).
+    """
+    spec = importlib.util.find_spec('ccxt')
+    if spec is None or not spec.submodule_search_locations:
+        return frozenset()
+
+    path_to_exchanges = os.path.join(spec.submodule_search_locations[0], 'async_support')
+    return frozenset(filename[:-len('.py')] for filename in os.listdir(path_to_exchanges)
+                     if filename.endswith('.py') and not filename.startswith('_'))
+
+
 def check_existence_of_exchange(exchange_id: str) -> bool:
     """ Функция для проверки, доступна ли такая биржа в ccxt
 
     :param exchange_id: название биржи
     :return: True, если есть в списке ccxt. False, если нет в списке.
     """
-    return exchange_id in ccxt.exchanges
+    return exchange_id in get_ccxt_exchanges()
 
 
 def get_exchange_by_id(exchange_id: str, config: dict = None) -> ccxt.Exchange:
@@ -117,6 +250,8 @@ def get_exchange_by_id(exchange_id: str, config: dict = None) -> ccxt.Exchange:
     :param config: dict - конфигурация, с которой будет создан объект биржи ccxt
     :return: ccxt.Exchange - объект биржи ccxt, можно использовать его методы, предоставленные библиотекой ccxt
     """
+    import ccxt
+
     if config is None:
         config = {}
 
@@ -126,3 +261,25 @@ def get_exchange_by_id(exchange_id: str, config: dict = None) -> ccxt.Exchange:
     if exchange is not None:
         exchange = exchange(config)
     return exchange
+
+
+def get_async_exchange_by_id(exchange_id: str, config: dict = None) -> ccxt.async_support.Exchange:
+    """Функция для получения асинхронного объекта биржи ccxt (ccxt.async_support) по названию биржи
+    Если биржу не удалось найти, возвращает None.
+    Объект нужно закрыть после использования: await exchange.close()
+
+    :param exchange_id: str - название биржи (примеры: binance, okx, kucoin)
+    :param config: dict - конфигурация, с которой будет создан объект биржи ccxt
+    :return: ccxt.async_support.Exchange - асинхронный объект биржи ccxt
+    """
+    import ccxt.async_support
+
+    if config is None:
+        config = {}
+
+    # получаю биржу из ccxt.async_support по её названию (exchange_id)
+    exchange = getattr(ccxt.async_support, exchange_id, None)
+    # если удалось получить биржу
+    if exchange is not None:
+        exchange = exchange(config)
+    return exchange
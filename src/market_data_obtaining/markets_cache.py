@@ -0,0 +1,417 @@
+"""
+\file markets_cache.py
+\author github:khanbekov, telegram:qoddrysdaim
+\brief В файле находится кэш маркетов бирж с ограниченным временем жизни и фоновым обновлением
+\data 2026.10.18
+
+Данные о маркетах меняются редко, а их загрузка через ccxt занимает секунды.
+Поэтому маркеты загружаются один раз на биржу (общие для всех инстансов) и обновляются в фоне
+до истечения времени жизни. Пока идет обновление, отдаются предыдущие данные.
+
+Загрузка асинхронная (ccxt.async_support) и не блокирует цикл событий (ccxt импортируется в отдельном потоке). Для каждой биржи используется
+один долгоживущий объект ccxt, а одновременные запросы к одной бирже объединяются в одну загрузку.
+
+Загруженные маркеты сохраняются на диск (markets_snapshots.py). При запуске кэш заполняется из снимков,
+а если биржа недоступна, отдаются последние маркеты (из памяти или из снимка), даже если они старше ttl.
+
+При нескольких процессах uvicorn маркеты биржи загружает один процесс (аренда в общем состоянии shared_state),
+после сохранения снимка он публикует в общем состоянии версию и время загрузки маркетов.
+Остальные процессы ждут публикации и читают маркеты из снимка этой версии, а не обращаются к бирже.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import time
+import typing
+from typing import Callable
+
+from src.api.metrics import CACHE_REQUESTS
+from src.api.shared_state import SharedState, shared_state
+from src.logger.logger import logger
+from src.market_data_obtaining.markets import get_async_exchange_by_id, MarketsIndex, load_ccxt
+from src.market_data_obtaining.markets_snapshots import MarketsSnapshots, MarketsSnapshot, SNAPSHOT_FIELDS
+from src.responses_models.api_errors import CCXTError
+from src.settings import PATH_TO_TRADE_SERVERS_CONFIGS, MARKETS_CACHE_TTL, MARKETS_CACHE_REFRESH_BEFORE, \
+    MARKETS_CACHE_RETRY_INTERVAL, MARKETS_SNAPSHOTS_DIRNAME, MARKETS_SNAPSHOTS_KEEP
+
+if typing.TYPE_CHECKING:
+    import ccxt
+    import ccxt.async_support
+
+
+class CachedMarkets:
+    """ Загруженные маркеты биржи
+
+    markets: ccxt.Exchange.markets - маркеты в том виде, в котором их дает ccxt
+    is_decimal_precision: bool - указана ли точность в количестве знаков после запятой (ccxt.DECIMAL_PLACES)
+    fetched_at: float - время загрузки маркетов с биржи, time.time() (для маркетов из снимка - время в снимке)
+    index: MarketsIndex - индекс маркетов по базовому ассету
+    version: str - отпечаток данных маркетов, которые попадают в ответ API (не меняется при загрузке тех же данных)
+    """
+
+    def __init__(self, markets: ccxt.Exchange.markets, is_decimal_precision: bool, fetched_at: float):
+        self.markets = markets
+        self.is_decimal_precision = is_decimal_precision
+        self.fetched_at = fetched_at
+        self.index = MarketsIndex(markets)
+        self.version = get_markets_fingerprint(markets, is_decimal_precision)
+
+    def get_age(self) -> float:
+        """ Возраст маркетов в секундах (с момента загрузки с биржи) """
+        return max(time.time() - self.fetched_at, 0.0)
+
+
+# Поля маркетов ccxt, которые используются в ответе API (они же сохраняются в снимках маркетов)
+FINGERPRINT_FIELDS = SNAPSHOT_FIELDS
+
+# Ключи общего состояния процессов для биржи: опубликованная версия маркетов (отпечаток как int64),
+# время их загрузки с биржи (мс, unix), аренда загрузки (время окончания, мс) и время последней неудачной загрузки (мс)
+PUBLISHED_VERSION_KEY = 'markets:version:{}'
+PUBLISHED_FETCHED_AT_KEY = 'markets:fetched_at:{}'
+FETCH_LEASE_KEY = 'markets:lease:{}'
+FETCH_FAILED_AT_KEY = 'markets:failed_at:{}'
+# Время аренды загрузки маркетов в секундах (если процесс, загружающий маркеты, завершился, аренда истечет)
+FETCH_LEASE_DURATION = 60.0
+
+
+def get_time_ms(timestamp: float | None = None) -> int:
+    """ Время unix в миллисекундах (текущее, если timestamp не указан) """
+    return int((time.time() if timestamp is None else timestamp) * 1000)
+
+
+def encode_version(version: str) -> int:
+    """ Отпечаток маркетов (16 символов hex) как int64 для общего состояния процессов """
+    return int.from_bytes(bytes.fromhex(version), 'big', signed=True)
+
+
+def decode_version(value: int) -> str:
+    return value.to_bytes(8, 'big', signed=True).hex()
+
+
+def get_markets_fingerprint(markets: ccxt.Exchange.markets, is_decimal_precision: bool) -> str:
+    """ Функция вычисляет отпечаток маркетов по полям, которые используются в ответе API.
+
+    :param markets: маркеты в том виде, в котором их дает ccxt
+    :param is_decimal_precision: указана ли точность в количестве знаков после запятой
+    :return: str - первые 16 символов hex sha256
+    """
+    fingerprint_data = [
+        [market.get(field) for field in FINGERPRINT_FIELDS] for market in (markets or {}).values()
+    ]
+    fingerprint_data.append(is_decimal_precision)
+    return hashlib.sha256(
+        json.dumps(fingerprint_data, sort_keys=True, default=str, separators=(',', ':')).encode('utf-8')
+    ).hexdigest()[:16]
+
+
+class MarketsCache:
+    """ Кэш маркетов бирж.
+    Данные считаются устаревшими через ttl секунд после загрузки. За refresh_before секунд до этого
+    запускается фоновое обновление; при ошибке обновление повторяется через retry_interval секунд.
+    Если загрузить маркеты не удалось, отдаются последние маркеты биржи (из памяти или снимка на диске),
+    и следующая загрузка по запросу выполняется не раньше чем через retry_interval секунд.
+
+    snapshots: MarketsSnapshots - снимки маркетов на диске
+    state: SharedState - общее состояние процессов (версии маркетов, загруженных другими процессами)
+    """
+
+    def __init__(self, ttl: float, refresh_before: float, retry_interval: float, snapshots: MarketsSnapshots,
+                 state: SharedState):
+        self.ttl = ttl
+        self.refresh_before = refresh_before
+        self.retry_interval = retry_interval
+        self.snapshots = snapshots
+        self.state = state
+        self._entries: dict[str, CachedMarkets] = {}
+        # биржа -> до какого времени (time.monotonic()) отдавать устаревшие маркеты после ошибки загрузки
+        self._fallback_until: dict[str, float] = {}
+        self._refresh_handles: dict[str, asyncio.TimerHandle] = {}
+        # долгоживущие объекты бирж ccxt
+        self._exchanges: dict[str, ccxt.async_support.Exchange] = {}
+        # загрузки, которые выполняются сейчас (одна на биржу)
+        self._loading: dict[str, asyncio.Task] = {}
+        # функции, которые вызываются после изменения маркетов биржи (аргумент - exchange_id)
+        self._listeners: list[Callable[[str], None]] = []
+
+    async def get_markets(self, exchange_id: str) -> CachedMarkets:
+        """ Получение маркетов биржи.
+        Если маркеты уже загружены и не устарели, возвращаются из кэша без обращения к бирже.
+
+        :param exchange_id: название биржи по ccxt
+        :return: CachedMarkets - маркеты биржи
+        """
+        entry = self._entries.get(exchange_id)
+        if entry is not None and (entry.get_age() < self.ttl or
+                                  time.monotonic() < self._fallback_until.get(exchange_id, 0.0)) and \
+                self._sync_published(exchange_id, entry):
+            CACHE_REQUESTS.inc('markets', 'hit')
+            return entry
+
+        # Маркетов нет в кэше, либо фоновое обновление не успело (например, биржа недоступна)
+        CACHE_REQUESTS.inc('markets', 'miss')
+        try:
+            return await self._load(exchange_id)
+        except CCXTError:
+            entry = self._entries.get(exchange_id) or await self._load_snapshot(exchange_id)
+            if entry is None:
+                raise
+            self._fallback_until[exchange_id] = time.monotonic() + self.retry_interval
+            logger.warning(f'Биржа {exchange_id} недоступна, используются маркеты, '
+                           f'загруженные {entry.get_age():.0f} с назад.')
+            return entry
+
+    def get_stale_age(self, exchange_id: str) -> float | None:
+        """ Возраст маркетов биржи, если они устарели (старше ttl - биржа недоступна), без загрузки.
+
+        :param exchange_id: название биржи по ccxt
+        :return: float - возраст маркетов в секундах, или None, если маркеты не устарели или еще не загружены
+        """
+        entry = self._entries.get(exchange_id)
+        if entry is None:
+            return None
+        age = entry.get_age()
+        return age if age >= self.ttl else None
+
+    async def warm_up(self):
+        """ Заполнение кэша последними снимками маркетов всех бирж (при запуске API).
+        Обновление маркетов с биржи планируется по возрасту снимка, как после обычной загрузки.
+        """
+        for exchange_id in await asyncio.to_thread(self.snapshots.list_exchanges):
+            if exchange_id not in self._entries:
+                await self._load_snapshot(exchange_id)
+
+    def get_version(self, exchange_id: str) -> str:
+        """ Получение версии маркетов биржи без загрузки (из памяти или общего состояния процессов).
+
+        :param exchange_id: название биржи по ccxt
+        :return: str - отпечаток загруженных маркетов (если другой процесс загрузил более новые маркеты -
+        их отпечаток) или пустая строка, если маркеты еще не загружены
+        """
+        entry = self._entries.get(exchange_id)
+        published = self._get_newer_published(exchange_id, entry)
+        if published is not None:
+            return published[0]
+        return entry.version if entry is not None else ''
+
+    def add_listener(self, listener: Callable[[str], None]):
+        """ Добавление функции, которая вызывается после изменения маркетов биржи (новой версии)
+
+        :param listener: функция, аргумент - exchange_id.
+        """
+        self._listeners.append(listener)
+
+    async def _load(self, exchange_id: str) -> CachedMarkets:
+        # Если загрузка для этой биржи уже идет, жду её, а не делаю новый запрос к бирже
+        task = self._loading.get(exchange_id)
+        if task is None:
+            task = asyncio.create_task(self._fetch(exchange_id))
+            self._loading[exchange_id] = task
+            task.add_done_callback(lambda _: self._loading.pop(exchange_id, None))
+
+        # shield - отмена одного из ожидающих запросов не должна отменять общую загрузку
+        return await asyncio.shield(task)
+
+    async def _fetch(self, exchange_id: str) -> CachedMarkets:
+        """ Получение маркетов от другого процесса или загрузка с биржи (с арендой загрузки) """
+        lease_key = FETCH_LEASE_KEY.format(exchange_id)
+        while True:
+            entry = await self._load_published(exchange_id)
+            if entry is not None:
+                return entry
+
+            started_at = get_time_ms()
+            if self.state.acquire_lease(lease_key, started_at, started_at + int(FETCH_LEASE_DURATION * 1000)):
+                break
+            # маркеты загружает другой процесс
+            await self._wait_for_fetch(exchange_id, started_at)
+
+        try:
+            return await self._fetch_from_exchange(exchange_id)
+        except BaseException:
+            self.state.set_values({lease_key: 0, FETCH_FAILED_AT_KEY.format(exchange_id): get_time_ms()})
+            raise
+
+    async def _fetch_from_exchange(self, exchange_id: str) -> CachedMarkets:
+        # импорт ccxt занимает секунды, поэтому выполняется в отдельном потоке (если еще не выполнен)
+        await asyncio.to_thread(load_ccxt)
+        import ccxt
+
+        exchange = self._exchanges.get(exchange_id)
+        if exchange is None:
+            exchange = get_async_exchange_by_id(exchange_id)
+            self._exchanges[exchange_id] = exchange
+
+        try:
+            markets = await exchange.load_markets(reload=True)
+        except ccxt.BaseError as e:
+            logger.warning(f'Не удалось получить данные для биржи {exchange_id}, проблема с соединением. Error: {e}')
+            raise CCXTError(exchange_id, e) from e
+        logger.info(f'Загружены данные о бирже {exchange_id}.')
+
+        # Индекс и отпечаток строятся в отдельном потоке, т.к. маркетов могут быть тысячи
+        entry = await asyncio.to_thread(
+            CachedMarkets, markets, exchange.precisionMode == ccxt.DECIMAL_PLACES, time.time()
+        )
+        self._fallback_until.pop(exchange_id, None)
+        self._store(exchange_id, entry)
+
+        # Снимок записывается в фоне, ответ его не ждет
+        asyncio.get_running_loop().run_in_executor(None, self._save_and_publish, exchange_id, entry)
+        return entry
+
+    def _save_and_publish(self, exchange_id: str, entry: CachedMarkets):
+        """ Сохранение снимка маркетов и публикация их версии для других процессов, снятие аренды загрузки
+        (в отдельном потоке). Если снимок не сохранен, версия не публикуется: другие процессы загрузят маркеты сами.
+        """
+        snapshot = MarketsSnapshot(entry.markets, entry.is_decimal_precision, entry.fetched_at)
+        values = {FETCH_LEASE_KEY.format(exchange_id): 0}
+        is_saved = False
+        try:
+            is_saved = self.snapshots.save(exchange_id, entry.version, snapshot)
+        finally:
+            if is_saved:
+                values[PUBLISHED_VERSION_KEY.format(exchange_id)] = encode_version(entry.version)
+                values[PUBLISHED_FETCHED_AT_KEY.format(exchange_id)] = get_time_ms(entry.fetched_at)
+            self.state.set_values(values)
+        if is_saved:
+            self.state.notify_changed()
+
+    def _get_newer_published(self, exchange_id: str, entry: CachedMarkets | None) -> tuple[str, int] | None:
+        """ Маркеты, опубликованные другим процессом, если они загружены позже маркетов этого процесса.
+
+        :param exchange_id: название биржи по ccxt
+        :param entry: маркеты этого процесса (или None)
+        :return: (версия, время загрузки с биржи в мс), или None
+        """
+        version, fetched_at = self.state.get_values(
+            [PUBLISHED_VERSION_KEY.format(exchange_id), PUBLISHED_FETCHED_AT_KEY.format(exchange_id)])
+        if version is None or fetched_at is None:
+            return None
+        if entry is not None and fetched_at <= get_time_ms(entry.fetched_at):
+            return None
+        return decode_version(version), fetched_at
+
+    def _sync_published(self, exchange_id: str, entry: CachedMarkets) -> bool:
+        """ Проверка, что другой процесс не загрузил более новые маркеты.
+        Если загружены те же маркеты (та же версия), у маркетов этого процесса обновляется время загрузки.
+
+        :return: bool - True, если маркеты этого процесса актуальны
+        """
+        published = self._get_newer_published(exchange_id, entry)
+        if published is None:
+            return True
+        version, fetched_at = published
+        if version != entry.version:
+            return False
+        entry.fetched_at = fetched_at / 1000
+        self._fallback_until.pop(exchange_id, None)
+        self._schedule_refresh(exchange_id, max(self.ttl - self.refresh_before - entry.get_age(), 0))
+        return True
+
+    async def _load_published(self, exchange_id: str) -> CachedMarkets | None:
+        """ Получение маркетов, опубликованных другим процессом (из снимка опубликованной версии).
+
+        :param exchange_id: название биржи по ccxt
+        :return: CachedMarkets - маркеты, или None, если более новых маркетов нет, их тоже пора обновлять
+        или снимка опубликованной версии нет
+        """
+        entry = self._entries.get(exchange_id)
+        published = self._get_newer_published(exchange_id, entry)
+        if published is None or time.time() - published[1] / 1000 >= self.ttl - self.refresh_before:
+            return None
+        if entry is not None and self._sync_published(exchange_id, entry):
+            return entry
+
+        version = published[0]
+        snapshot = await asyncio.to_thread(self.snapshots.load, exchange_id, version)
+        if snapshot is None:
+            return None
+        entry = await asyncio.to_thread(CachedMarkets, *snapshot)
+        self._fallback_until.pop(exchange_id, None)
+        self._store(exchange_id, entry)
+        logger.info(f'Маркеты {exchange_id} загружены из снимка, сохраненного другим процессом.')
+        return entry
+
+    async def _wait_for_fetch(self, exchange_id: str, started_at: int):
+        """ Ожидание, пока другой процесс загружает маркеты (пока действует его аренда загрузки).
+
+        :param exchange_id: название биржи по ccxt
+        :param started_at: время начала ожидания в мс
+        :raises CCXTError: если другой процесс не смог загрузить маркеты
+        """
+        deadline = time.monotonic() + FETCH_LEASE_DURATION
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.state.poll_interval)
+            lease_until, failed_at = self.state.get_values(
+                [FETCH_LEASE_KEY.format(exchange_id), FETCH_FAILED_AT_KEY.format(exchange_id)])
+            if (failed_at or 0) >= started_at:
+                raise CCXTError(exchange_id, RuntimeError('маркеты не загрузил другой процесс Configurator'))
+            if (lease_until or 0) <= get_time_ms():
+                return
+
+    async def _load_snapshot(self, exchange_id: str) -> CachedMarkets | None:
+        """ Загрузка маркетов биржи из последнего снимка в кэш.
+
+        :param exchange_id: название биржи по ccxt
+        :return: CachedMarkets - маркеты из снимка, или None, если снимка нет
+        """
+        snapshot = await asyncio.to_thread(self.snapshots.load_latest, exchange_id)
+        if snapshot is None:
+            return None
+
+        entry = await asyncio.to_thread(CachedMarkets, *snapshot)
+        # пока загружался снимок, маркеты могли загрузиться с биржи
+        if exchange_id in self._entries:
+            return self._entries[exchange_id]
+        self._store(exchange_id, entry)
+        logger.info(f'Маркеты {exchange_id} загружены из снимка (возраст {entry.get_age():.0f} с).')
+        return entry
+
+    def _store(self, exchange_id: str, entry: CachedMarkets):
+        previous_entry = self._entries.get(exchange_id)
+        self._entries[exchange_id] = entry
+        # обновление с биржи за refresh_before секунд до истечения ttl (сразу, если маркеты из старого снимка)
+        self._schedule_refresh(exchange_id, max(self.ttl - self.refresh_before - entry.get_age(), 0))
+
+        if previous_entry is None or previous_entry.version != entry.version:
+            for listener in self._listeners:
+                listener(exchange_id)
+
+    def _schedule_refresh(self, exchange_id: str, delay: float):
+        handle = self._refresh_handles.pop(exchange_id, None)
+        if handle is not None:
+            handle.cancel()
+
+        loop = asyncio.get_running_loop()
+        self._refresh_handles[exchange_id] = loop.call_later(
+            delay, lambda: loop.create_task(self._refresh(exchange_id))
+        )
+
+    async def _refresh(self, exchange_id: str):
+        self._refresh_handles.pop(exchange_id, None)
+        try:
+            # Пока идет загрузка, запросы получают предыдущие данные из кэша
+            await self._load(exchange_id)
+        except Exception as e:
+            logger.warning(f'Не удалось обновить данные о бирже {exchange_id}. Error: {e}')
+            self._schedule_refresh(exchange_id, self.retry_interval)
+
+    async def close(self):
+        """ Отмена запланированных фоновых обновлений и закрытие объектов бирж ccxt """
+        for handle in self._refresh_handles.values():
+            handle.cancel()
+        self._refresh_handles.clear()
+
+        for exchange in self._exchanges.values():
+            await exchange.close()
+        self._exchanges.clear()
+
+
+# Кэш маркетов, общий для всех торговых серверов
+markets_cache = MarketsCache(
+    MARKETS_CACHE_TTL, MARKETS_CACHE_REFRESH_BEFORE, MARKETS_CACHE_RETRY_INTERVAL,
+    MarketsSnapshots(f'{PATH_TO_TRADE_SERVERS_CONFIGS}/{MARKETS_SNAPSHOTS_DIRNAME}', MARKETS_SNAPSHOTS_KEEP),
+    shared_state
+)
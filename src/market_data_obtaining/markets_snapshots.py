@@ -0,0 +1,196 @@
+"""
+\file markets_snapshots.py
+\author github:khanbekov, telegram:qoddrysdaim
+\brief В файле находятся снимки маркетов бирж на диске (быстрый запуск и работа при недоступной бирже)
+\data 2026.10.18
+
+После каждой успешной загрузки маркеты биржи сохраняются в файл <директория>/<exchange_id>/<версия>.markets,
+где версия - отпечаток маркетов (get_markets_fingerprint()). Для биржи хранятся несколько последних версий.
+При запуске API загружаются последние снимки, поэтому первые запросы не ждут биржу,
+а если биржа недоступна, отдаются маркеты из снимка (с указанием их возраста).
+
+Формат файла:
+    заголовок (SNAPSHOT_HEADER): сигнатура, версия формата, флаги, время загрузки маркетов с биржи (unix),
+    длина данных;
+    данные: JSON [[значения полей SNAPSHOT_FIELDS маркета], ...], сжатый zlib.
+Сохраняются только поля маркетов, которые используются в ответе API.
+"""
+import json
+import os
+import struct
+import zlib
+from typing import NamedTuple
+
+from src.logger.logger import logger
+
+# Сигнатура и версия формата файла снимка
+SNAPSHOT_MAGIC = b'CFGM'
+SNAPSHOT_FORMAT_VERSION = 1
+# Заголовок: сигнатура, версия формата (uint16), флаги (uint8), время загрузки (float64, unix), длина данных (uint32)
+SNAPSHOT_HEADER = struct.Struct('<4sHBxdI')
+# Флаг: точность указана в количестве знаков после запятой (ccxt.DECIMAL_PLACES)
+FLAG_DECIMAL_PRECISION = 0x01
+# Расширение файлов снимков
+SNAPSHOT_EXTENSION = '.markets'
+
+# Поля маркетов ccxt, которые сохраняются в снимке (используются в ответе API)
+SNAPSHOT_FIELDS = ('id', 'symbol', 'base', 'quote', 'baseId', 'quoteId', 'type', 'precision', 'limits')
+
+
+class MarketsSnapshot(NamedTuple):
+    """ Снимок маркетов биржи
+
+    markets: dict - маркеты в формате ccxt (только поля SNAPSHOT_FIELDS)
+    is_decimal_precision: bool - указана ли точность в количестве знаков после запятой
+    fetched_at: float - время загрузки маркетов с биржи, time.time()
+    """
+    markets: dict
+    is_decimal_precision: bool
+    fetched_at: float
+
+
+def encode_snapshot(markets: dict, is_decimal_precision: bool, fetched_at: float) -> bytes:
+    """ Функция сериализует маркеты биржи в формат снимка.
+
+    :param markets: маркеты в формате ccxt.
+    :param is_decimal_precision: указана ли точность в количестве знаков после запятой.
+    :param fetched_at: время загрузки маркетов с биржи, time.time().
+    :return: bytes - содержимое файла снимка.
+    """
+    rows = [[market.get(field) for field in SNAPSHOT_FIELDS] for market in markets.values()]
+    payload = zlib.compress(json.dumps(rows, separators=(',', ':'), default=str).encode('utf-8'), 6)
+    flags = FLAG_DECIMAL_PRECISION if is_decimal_precision else 0
+    return SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_FORMAT_VERSION, flags, fetched_at, len(payload)) + payload
+
+
+def decode_snapshot(content: bytes) -> MarketsSnapshot:
+    """ Функция разбирает содержимое файла снимка.
+
+    :param content: содержимое файла снимка.
+    :return: MarketsSnapshot - снимок маркетов.
+    :raises ValueError: если файл поврежден или записан в другом формате.
+    """
+    if len(content) < SNAPSHOT_HEADER.size:
+        raise ValueError('файл короче заголовка')
+    magic, format_version, flags, fetched_at, payload_length = SNAPSHOT_HEADER.unpack_from(content)
+    if magic != SNAPSHOT_MAGIC or format_version != SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(f'неизвестный формат (сигнатура {magic!r}, версия {format_version})')
+    payload = content[SNAPSHOT_HEADER.size:]
+    if len(payload) != payload_length:
+        raise ValueError(f'длина данных {len(payload)}, ожидалось {payload_length}')
+
+    try:
+        rows = json.loads(zlib.decompress(payload))
+    except (zlib.error, json.JSONDecodeError) as e:
+        raise ValueError(f'данные повреждены ({e})') from e
+
+    markets = {}
+    for row in rows:
+        market = dict(zip(SNAPSHOT_FIELDS, row))
+        markets[market['symbol']] = market
+    return MarketsSnapshot(markets, bool(flags & FLAG_DECIMAL_PRECISION), fetched_at)
+
+
+class MarketsSnapshots:
+    """ Хранилище снимков маркетов бирж
+
+    path_to_dir: str - директория снимков (внутри - директория для каждой биржи)
+    keep: int - сколько последних версий хранить для каждой биржи
+    """
+
+    def __init__(self, path_to_dir: str, keep: int):
+        self.path_to_dir = path_to_dir
+        self.keep = keep
+
+    def save(self, exchange_id: str, version: str, snapshot: MarketsSnapshot) -> bool:
+        """ Сохранение снимка маркетов биржи (файл версии перезаписывается, старые версии удаляются).
+        Ошибки записи не прерывают работу, а записываются в лог.
+
+        :param exchange_id: название биржи по ccxt.
+        :param version: версия маркетов (отпечаток).
+        :param snapshot: снимок маркетов.
+        :return: bool - True, если снимок сохранен.
+        """
+        path_to_exchange_dir = os.path.join(self.path_to_dir, exchange_id)
+        path_to_file = self._get_path(exchange_id, version)
+        try:
+            os.makedirs(path_to_exchange_dir, exist_ok=True)
+            content = encode_snapshot(*snapshot)
+            # Запись во временный файл (свой у каждого процесса) и замена, чтобы не оставить недописанный снимок
+            path_to_tmp_file = f'{path_to_file}.{os.getpid()}.tmp'
+            with open(path_to_tmp_file, 'wb') as snapshot_file:
+                snapshot_file.write(content)
+            os.replace(path_to_tmp_file, path_to_file)
+        except OSError as e:
+            logger.warning(f'Не удалось сохранить снимок маркетов {path_to_file}. Error: {e}')
+            return False
+
+        for old_path in self._list_files(exchange_id)[self.keep:]:
+            try:
+                os.remove(old_path)
+            except OSError:
+                # файл уже удалил другой процесс
+                continue
+        logger.info(f'Сохранен снимок маркетов {exchange_id} ({len(content)} байт).')
+        return True
+
+    def load(self, exchange_id: str, version: str) -> MarketsSnapshot | None:
+        """ Загрузка снимка маркетов биржи определенной версии (сохраненного другим процессом).
+
+        :param exchange_id: название биржи по ccxt.
+        :param version: версия маркетов (отпечаток).
+        :return: MarketsSnapshot - снимок, или None, если снимка этой версии нет.
+        """
+        path_to_file = self._get_path(exchange_id, version)
+        try:
+            with open(path_to_file, 'rb') as snapshot_file:
+                return decode_snapshot(snapshot_file.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f'Не удалось прочитать снимок маркетов {path_to_file}. Error: {e}')
+            return None
+
+    def load_latest(self, exchange_id: str) -> MarketsSnapshot | None:
+        """ Загрузка последнего корректного снимка маркетов биржи.
+
+        :param exchange_id: название биржи по ccxt.
+        :return: MarketsSnapshot - снимок, или None, если снимков нет.
+        """
+        for path_to_file in self._list_files(exchange_id):
+            try:
+                with open(path_to_file, 'rb') as snapshot_file:
+                    return decode_snapshot(snapshot_file.read())
+            except (OSError, ValueError) as e:
+                logger.warning(f'Не удалось прочитать снимок маркетов {path_to_file}. Error: {e}')
+        return None
+
+    def list_exchanges(self) -> list[str]:
+        """ Список бирж, для которых есть снимки """
+        try:
+            return sorted(name for name in os.listdir(self.path_to_dir)
+                          if os.path.isdir(os.path.join(self.path_to_dir, name)))
+        except OSError:
+            return []
+
+    def _get_path(self, exchange_id: str, version: str) -> str:
+        return os.path.join(self.path_to_dir, exchange_id, f'{version}{SNAPSHOT_EXTENSION}')
+
+    def _list_files(self, exchange_id: str) -> list[str]:
+        """ Файлы снимков биржи, от новых к старым.
+        Файлы, удаленные другим процессом во время обхода, пропускаются.
+        """
+        path_to_exchange_dir = os.path.join(self.path_to_dir, exchange_id)
+        try:
+            names = [name for name in os.listdir(path_to_exchange_dir) if name.endswith(SNAPSHOT_EXTENSION)]
+        except OSError:
+            return []
+
+        files: list[tuple[float, str]] = []
+        for name in names:
+            path_to_file = os.path.join(path_to_exchange_dir, name)
+            try:
+                files.append((os.stat(path_to_file).st_mtime, path_to_file))
+            except OSError:
+                continue
+        return [path_to_file for _, path_to_file in sorted(files, reverse=True)]
@@ -4,19 +4,68 @@
 \brief В файле находятся функции для построение торговых маршрутов
 \data 2022.03.12
 """
-import itertools
-from pprint import pprint
+import hashlib
+import heapq
+import json
+from typing import Iterable, Iterator, NamedTuple
 
-from src.responses_models.api_responses import RouteStep
-from src.responses_models.market_models import Market
+from src.responses_models.api_responses import RouteStepRecord
+from src.responses_models.market_models import MarketRecord
+
+
+# Фильтр торговых маршрутов (параметры запроса основного эндпоинта).
+# Фильтр применяется во время перебора, а не к построенным маршрутам: маркеты, которые нельзя использовать,
+# не попадают в граф, длины вне диапазона не перебираются, а первые маркеты маршрутов выбираются только
+# среди маркетов начального ассета. Результат совпадает с фильтрацией всех маршрутов (с тем же порядком).
+# min_length: int | None - минимальная длина маршрута (количество шагов), None - без ограничения
+# max_length: int | None - максимальная длина маршрута, None - без ограничения (не больше количества ассетов)
+# start_asset: str | None - ассет, с которого начинается маршрут (source_asset первого шага), None - любой
+# include_markets: tuple[str, ...] | None - маркеты (common_symbol), по которым строятся маршруты, None - все
+# exclude_markets: tuple[str, ...] - маркеты (common_symbol), которые не используются в маршрутах
+class RoutesFilter(NamedTuple):
+    min_length: int | None = None
+    max_length: int | None = None
+    start_asset: str | None = None
+    include_markets: tuple[str, ...] | None = None
+    exclude_markets: tuple[str, ...] = ()
+
+
+# Пустой фильтр - все торговые маршруты
+NO_ROUTES_FILTER = RoutesFilter()
+
+
+# Функция создает фильтр маршрутов из параметров запроса. Списки маркетов упорядочиваются и очищаются от повторов,
+# поэтому одинаковые фильтры, переданные в разном порядке, дают один ключ (get_routes_filter_key()).
+# Минимальная длина 3 и меньше ничего не ограничивает (маршрут не короче 3 шагов) и заменяется на None.
+# return RoutesFilter - фильтр маршрутов
+def make_routes_filter(min_length: int | None = None, max_length: int | None = None, start_asset: str | None = None,
+                       include_markets: Iterable[str] | None = None,
+                       exclude_markets: Iterable[str] | None = None) -> RoutesFilter:
+    return RoutesFilter(
+        min_length=min_length if min_length is not None and min_length > 3 else None,
+        max_length=max_length,
+        start_asset=start_asset,
+        include_markets=tuple(sorted(set(include_markets))) if include_markets is not None else None,
+        exclude_markets=tuple(sorted(set(exclude_markets or ()))),
+    )
+
+
+# Функция вычисляет ключ фильтра маршрутов для ключей кэшей и ETag.
+# return str - пустая строка для пустого фильтра, иначе первые 12 символов hex sha256
+def get_routes_filter_key(routes_filter: RoutesFilter) -> str:
+    if routes_filter == NO_ROUTES_FILTER:
+        return ''
+    return hashlib.sha256(json.dumps(routes_filter, separators=(',', ':')).encode('utf-8')).hexdigest()[:12]
 
 
 # Функция фильтрует маркеты, оставляет только те, в которых базовый и котируемый ассеты есть в списке assets.
-# markets: list[Market] - список маркетов, который нужно отфильтровать
+# markets: list[MarketRecord] - список маркетов, который нужно отфильтровать
 # assets: list[str] - список ассетов, по ним будет фильтроваться список маркетов
-# return listlist[Market] - список отобранных маркетов
-def select_markets_by_assets(markets: list[Market], assets: list[str]) -> list[Market]:
-    result: list[Market] = []
+# return listlist[MarketRecord] - список отобранных маркетов
+def select_markets_by_assets(markets: list[MarketRecord], assets: list[str]) -> list[MarketRecord]:
+    result: list[MarketRecord] = []
+    # множество ассетов для быстрой проверки вхождения
+    assets = set(assets)
 
     for market in markets:
         if market.base_asset in assets and market.quote_asset in assets:
@@ -25,18 +74,62 @@ def select_markets_by_assets(markets: list[Market], assets: list[str]) -> list[M
     return result
 
 
+# Функция отбирает маркеты, по которым строятся маршруты: маркеты ассетов из списка assets
+# (select_markets_by_assets()), разрешенные фильтром маршрутов.
+# markets: list[MarketRecord] - список маркетов, который нужно отфильтровать
+# assets: list[str] - список ассетов, по которым строятся маршруты
+# routes_filter: RoutesFilter - фильтр маршрутов (используются include_markets и exclude_markets)
+# return list[MarketRecord] - список отобранных маркетов (в исходном порядке)
+def select_route_markets(markets: list[MarketRecord], assets: list[str],
+                         routes_filter: RoutesFilter = NO_ROUTES_FILTER) -> list[MarketRecord]:
+    result = select_markets_by_assets(markets, assets)
+
+    if routes_filter.include_markets is not None:
+        include_markets = set(routes_filter.include_markets)
+        result = [market for market in result if market.common_symbol in include_markets]
+    if routes_filter.exclude_markets:
+        exclude_markets = set(routes_filter.exclude_markets)
+        result = [market for market in result if market.common_symbol not in exclude_markets]
+
+    return result
+
+
+# Функция возвращает длины маршрутов, которые нужно перебрать.
+# Длина пути не может превышать длину списка ассетов, иначе ассеты будут повторяться
+# assets: list[str] - список ассетов, по которым строятся маршруты
+# routes_filter: RoutesFilter - фильтр маршрутов (используются min_length и max_length)
+# return range - длины маршрутов по возрастанию
+def get_route_lengths(assets: list[str], routes_filter: RoutesFilter = NO_ROUTES_FILTER) -> range:
+    min_length = max(3, routes_filter.min_length or 3)
+    max_length = len(assets) if routes_filter.max_length is None else min(len(assets), routes_filter.max_length)
+    return range(min_length, max_length + 1)
+
+
+# Функция возвращает индексы маркетов, с которых могут начинаться маршруты.
+# Если задан начальный ассет, это только маркеты, в которых он участвует.
+# markets: list[MarketRecord] - отобранные маркеты (select_route_markets())
+# graph: dict[str, list[int]] - граф смежности, построенный build_assets_graph()
+# routes_filter: RoutesFilter - фильтр маршрутов (используется start_asset)
+# return list[int] - индексы первых маркетов по возрастанию
+def get_first_indexes(markets: list[MarketRecord], graph: dict[str, list[int]],
+                      routes_filter: RoutesFilter = NO_ROUTES_FILTER) -> list[int]:
+    if routes_filter.start_asset is None:
+        return list(range(len(markets)))
+    return graph.get(routes_filter.start_asset, [])
+
+
 # Функция переводит последовательность маркетов (пример торговой пары маркета: BTC/USDT) в торговый маршрут
 # param route_sequence: list[list[str]] - последовательность торговый пар
 # return list[list[str]] - получившийся торговый маршрут
 # return bool - возможен ли торговый маршрут (обязательно к проверке в коде, использующем функцию)
-def route_sequence_to_route(route_sequence: tuple[Market]) -> (list[RouteStep], bool):
+def route_sequence_to_route(route_sequence: tuple[MarketRecord, ...]) -> tuple[list[RouteStepRecord], bool]:
     # 1. Нахожу, какой ассет будет первым
     # 2. Пытаюсь обменять ассеты в заданной последовательности
     # 3. Сверяю, совпадают ли первый и последний ассеты.
     # 4. Маршрут успешно построен, возвращаю результат
 
     # торговый маршрут, буду добавлять в этот список элементы
-    result_route: list[RouteStep] = []
+    result_route: list[RouteStepRecord] = []
     # первый ассет, нужно вернуться к нему, пройдя весь маршрут
     first_asset: str
     # текущий ассет, указывает, какой ассет мне нужно обменять в текущий момент
@@ -55,14 +148,14 @@ def route_sequence_to_route(route_sequence: tuple[Market]) -> (list[RouteStep],
     # 2. Пытаюсь обменять ассеты в заданной последовательности
     for market in route_sequence:
         if market.base_asset == curr_asset:
-            result_route.append(RouteStep(
+            result_route.append(RouteStepRecord(
                 source_asset=curr_asset,
                 common_symbol=market.common_symbol,
                 operation='sell')
             )
             curr_asset = market.quote_asset
         elif market.quote_asset == curr_asset:
-            result_route.append(RouteStep(
+            result_route.append(RouteStepRecord(
                 source_asset=curr_asset,
                 common_symbol=market.common_symbol,
                 operation='buy')
@@ -80,27 +173,243 @@ def route_sequence_to_route(route_sequence: tuple[Market]) -> (list[RouteStep],
     return result_route, True
 
 
+# Функция строит граф смежности ассетов и маркетов.
+# Граф строится один раз и используется для обхода при построении торговых маршрутов.
+# markets: list[MarketRecord] - список маркетов (вершины графа - ассеты, ребра - маркеты)
+# return dict[str, list[int]] - ассет -> индексы маркетов, в которых он участвует (по возрастанию)
+def build_assets_graph(markets: list[MarketRecord]) -> dict[str, list[int]]:
+    graph: dict[str, list[int]] = {}
+
+    for index, market in enumerate(markets):
+        graph.setdefault(market.base_asset, []).append(index)
+        # маркет с одинаковыми ассетами (если такой встретится) добавляется в граф один раз
+        if market.quote_asset != market.base_asset:
+            graph.setdefault(market.quote_asset, []).append(index)
+
+    return graph
+
+
+# Функция перебирает замкнутые последовательности маркетов заданной длины, начинающиеся с маркета first_index.
+# Обход в глубину идет только по смежным маркетам, поэтому невозможные последовательности не рассматриваются.
+# Маркеты в последовательности не повторяются, ассеты - могут (так же, как при переборе перестановок).
+# Последовательности возвращаются в лексикографическом порядке индексов маркетов.
+# markets: list[MarketRecord] - список маркетов
+# graph: dict[str, list[int]] - граф смежности, построенный build_assets_graph()
+# first_index: int - индекс первого маркета последовательности
+# first_asset: str - ассет, с которого начинается маршрут (base или quote первого маркета)
+# length: int - длина последовательности (количество маркетов)
+# return Iterator[tuple[int, ...]] - индексы маркетов замкнутой последовательности
+def iterate_closed_sequences(markets: list[MarketRecord], graph: dict[str, list[int]],
+                             first_index: int, first_asset: str, length: int) -> Iterator[tuple[int, ...]]:
+    first_market = markets[first_index]
+    next_asset = first_market.quote_asset if first_market.base_asset == first_asset else first_market.base_asset
+
+    # текущая последовательность индексов маркетов и множество использованных маркетов
+    path: list[int] = [first_index]
+    used: set[int] = {first_index}
+    # стек обхода: ассет, в котором находится маршрут, и итератор по смежным с ним маркетам
+    stack = [iter(graph.get(next_asset, ()))]
+    assets_stack = [next_asset]
+
+    while stack:
+        curr_asset = assets_stack[-1]
+        for index in stack[-1]:
+            if index in used:
+                continue
+            market = markets[index]
+            following_asset = market.quote_asset if market.base_asset == curr_asset else market.base_asset
+            # последний шаг маршрута должен вернуть к первому ассету
+            if len(path) + 1 == length:
+                if following_asset == first_asset:
+                    yield *path, index
+                continue
+            path.append(index)
+            used.add(index)
+            stack.append(iter(graph.get(following_asset, ())))
+            assets_stack.append(following_asset)
+            break
+        else:
+            # все смежные маркеты перебраны, возвращаюсь на шаг назад
+            stack.pop()
+            assets_stack.pop()
+            used.discard(path.pop())
+
+
+# Функция создает шаги торговых маршрутов для каждого маркета: продажу (sell, source_asset - базовый ассет)
+# и покупку (buy, source_asset - котируемый ассет). Шаги неизменяемые и используются во всех маршрутах,
+# поэтому при построении маршрутов новые объекты шагов не создаются.
+# markets: list[MarketRecord] - список маркетов
+# return list[tuple[RouteStepRecord, RouteStepRecord]] - шаги (sell, buy) для каждого маркета
+def build_route_steps(markets: list[MarketRecord]) -> list[tuple[RouteStepRecord, RouteStepRecord]]:
+    return [
+        (RouteStepRecord(market.base_asset, market.common_symbol, 'sell'),
+         RouteStepRecord(market.quote_asset, market.common_symbol, 'buy'))
+        for market in markets
+    ]
+
+
+# Функция переводит замкнутую последовательность маркетов, найденную обходом графа, в торговый маршрут.
+# Результат совпадает с route_sequence_to_route() для той же последовательности.
+# markets: list[MarketRecord] - список маркетов
+# steps: list[tuple[RouteStepRecord, RouteStepRecord]] - шаги маркетов, созданные build_route_steps()
+# sequence: tuple[int, ...] - индексы маркетов последовательности
+# first_asset: str - ассет, с которого начинается маршрут
+# return list[RouteStepRecord] - торговый маршрут
+def sequence_to_route(markets: list[MarketRecord], steps: list[tuple[RouteStepRecord, RouteStepRecord]],
+                      sequence: tuple[int, ...], first_asset: str) -> list[RouteStepRecord]:
+    result_route: list[RouteStepRecord] = []
+    curr_asset = first_asset
+
+    for index in sequence:
+        market = markets[index]
+        if market.base_asset == curr_asset:
+            result_route.append(steps[index][0])
+            curr_asset = market.quote_asset
+        else:
+            result_route.append(steps[index][1])
+            curr_asset = market.base_asset
+
+    return result_route
+
+
+# Функция перебирает торговые маршруты одной длины, начинающиеся с маркета first_index.
+# Первый ассет выбирается так же, как в route_sequence_to_route(): base первого маркета,
+# если он есть в последнем маркете, иначе - quote.
+# start_asset: str | None - ассет, с которого должен начинаться маршрут (None - любой).
+# Обход выполняется только от этого ассета
+# return Iterator[tuple[tuple[int, ...], str]] - индексы маркетов маршрута и первый ассет
+def iterate_routes_from_market(markets: list[MarketRecord], graph: dict[str, list[int]],
+                               first_index: int, length: int,
+                               start_asset: str | None = None) -> Iterator[tuple[tuple[int, ...], str]]:
+    first_market = markets[first_index]
+    if start_asset is not None and start_asset not in (first_market.base_asset, first_market.quote_asset):
+        return
+
+    # маршруты, которые начинаются с базового ассета первого маркета
+    from_base = (
+        (sequence, first_market.base_asset)
+        for sequence in iterate_closed_sequences(markets, graph, first_index, first_market.base_asset, length)
+    )
+    if first_market.base_asset == first_market.quote_asset or start_asset == first_market.base_asset:
+        yield from from_base
+        return
+
+    # маршруты, которые начинаются с котируемого ассета первого маркета.
+    # Отбрасываются те, для которых первым был бы выбран базовый ассет
+    from_quote = (
+        (sequence, first_market.quote_asset)
+        for sequence in iterate_closed_sequences(markets, graph, first_index, first_market.quote_asset, length)
+        if first_market.base_asset not in (markets[sequence[-1]].base_asset, markets[sequence[-1]].quote_asset)
+    )
+    if start_asset == first_market.quote_asset:
+        yield from from_quote
+        return
+
+    # объединяю в порядке, в котором маршруты выдавал перебор перестановок
+    yield from heapq.merge(from_base, from_quote)
+
+
+# Функция-генератор строит торговые маршруты и отдает их по одному, не накапливая в памяти.
+# Маршруты ищутся обходом в глубину по графу ассетов/маркетов, ограниченным длиной маршрута.
+# Результат и порядок маршрутов совпадают с перебором всех перестановок маркетов.
+# markets: list[MarketRecord] - список объектов MarketRecord, содержит данные о всех маркетах биржи
+# assets: list[str] - список ассетов, по которым нужно строить торговые маршруты
+# routes_filter: RoutesFilter - фильтр маршрутов (применяется во время перебора)
+# return Iterator[list[RouteStepRecord]] - построенные маршруты
+def iterate_routes(markets: list[MarketRecord], assets: list[str],
+                   routes_filter: RoutesFilter = NO_ROUTES_FILTER) -> Iterator[list[RouteStepRecord]]:
+    # Выбираю маркеты (торговые пары), в которых участвуют ассеты и которые разрешены фильтром
+    selected_markets = select_route_markets(markets, assets, routes_filter)
+    # Строю граф смежности ассетов и маркетов
+    graph = build_assets_graph(selected_markets)
+    steps = build_route_steps(selected_markets)
+    first_indexes = get_first_indexes(selected_markets, graph, routes_filter)
+
+    # Перебираю длины путей, которые можно получить из ассетов
+    for length in get_route_lengths(assets, routes_filter):
+        for first_index in first_indexes:
+            for sequence, first_asset in iterate_routes_from_market(selected_markets, graph, first_index, length,
+                                                                    routes_filter.start_asset):
+                yield sequence_to_route(selected_markets, steps, sequence, first_asset)
+
+
+# Функция перебирает торговые маршруты, начинающиеся с маркетов first_indexes, без построения RouteStepRecord.
+# Используется для распределения построения маршрутов между процессами: каждый процесс получает
+# свою часть первых маркетов, а результаты объединяются в порядке (длина маршрута, индекс первого маркета).
+# markets: list[MarketRecord] - список объектов MarketRecord, содержит данные о всех маркетах биржи
+# assets: list[str] - список ассетов, по которым нужно строить торговые маршруты
+# first_indexes: list[int] - индексы первых маркетов (в списке отобранных маркетов, get_first_indexes())
+# routes_filter: RoutesFilter - фильтр маршрутов (применяется во время перебора)
+# return list[tuple[int, int, tuple[int, ...], str]] - длина, индекс первого маркета, индексы маркетов и первый ассет
+def enumerate_route_sequences(markets: list[MarketRecord], assets: list[str], first_indexes: list[int],
+                              routes_filter: RoutesFilter = NO_ROUTES_FILTER) \
+        -> list[tuple[int, int, tuple[int, ...], str]]:
+    result: list[tuple[int, int, tuple[int, ...], str]] = []
+
+    selected_markets = select_route_markets(markets, assets, routes_filter)
+    graph = build_assets_graph(selected_markets)
+
+    for length in get_route_lengths(assets, routes_filter):
+        for first_index in first_indexes:
+            for sequence, first_asset in iterate_routes_from_market(selected_markets, graph, first_index, length,
+                                                                    routes_filter.start_asset):
+                result.append((length, first_index, sequence, first_asset))
+
+    return result
+
+
 # Функция строит торговые маршруты.
 # Построенные маршруты это просто все варианты маршрутов, которые можно пройти. Прибыльность не анализируется.
-# markets: list[Market] - список объектов Market, содержит данные о всех маркетах биржи
+# markets: list[MarketRecord] - список объектов MarketRecord, содержит данные о всех маркетах биржи
 # assets: list[str] - список ассетов, по которым нужно строить торговые маршруты
-# return list[tuple[RouteStep]] - список построенных маршрутов (каждый маршрут - tuple из объектов RouteStep)
-def construct_routes(markets: list[Market], assets: list[str]) -> list[tuple[RouteStep]]:
-    result: list[tuple[RouteStep]] = []
-
-    # Выбираю маркеты (торговые пары), в которых участвуют ассеты
-    selected_markets = select_markets_by_assets(markets, assets)
-
-    route_number = itertools.count()
-    # Перебираю длины путей, которые можно получить из ассетов.
-    # Длина пути не может превышать длину списка ассетов, иначе ассеты будут повторяться
-    for i in range(3, len(assets) + 1):
-        # Перестановки маркетов (торговых пар) внутри последовательности
-        for sequence in itertools.permutations(selected_markets, i):
-            # Пробую преобразовать последовательность маркетов (торговых пар) в торговый маршрут
-            route, is_valid_route = route_sequence_to_route(sequence)
-            # Если удалось преобразовать, сохраняю полученный торговый маршрут
-            if is_valid_route:
-                result.append(route)
+# routes_filter: RoutesFilter - фильтр маршрутов (применяется во время перебора)
+# return list[list[RouteStepRecord]] - список построенных маршрутов (каждый маршрут - список шагов RouteStepRecord)
+def construct_routes(markets: list[MarketRecord], assets: list[str],
+                     routes_filter: RoutesFilter = NO_ROUTES_FILTER) -> list[list[RouteStepRecord]]:
+    return list(iterate_routes(markets, assets, routes_filter))
+
+
+# Компактный формат торговых маршрутов (параметр запроса routes_format=compact).
+# Каждый шаг маршрута кодируется парой [market_index, side_bit]:
+# market_index - индекс маркета в списке markets ответа,
+# side_bit - 0 для продажи (sell, source_asset - базовый ассет маркета),
+#            1 для покупки (buy, source_asset - котируемый ассет маркета).
+COMPACT_SELL = 0
+COMPACT_BUY = 1
+
+
+# Функция кодирует торговые маршруты в компактный формат.
+# markets: list[MarketRecord] - список маркетов ответа, на индексы в нем ссылаются шаги маршрутов
+# routes: Iterable[list[RouteStepRecord]] - торговые маршруты
+# return Iterator[list[tuple[int, int]]] - маршруты в компактном формате
+def encode_routes_compact(markets: list[MarketRecord], routes: Iterable[list[RouteStepRecord]]) \
+        -> Iterator[list[tuple[int, int]]]:
+    markets_indexes = {market.common_symbol: index for index, market in enumerate(markets)}
+
+    for route in routes:
+        yield [
+            (markets_indexes[step.common_symbol], COMPACT_BUY if step.operation == 'buy' else COMPACT_SELL)
+            for step in route
+        ]
+
+
+# Функция декодирует торговые маршруты из компактного формата (обратная к encode_routes_compact()).
+# markets: list[MarketRecord] - список маркетов ответа
+# compact_routes: Iterable[list[tuple[int, int]]] - маршруты в компактном формате
+# return list[list[RouteStepRecord]] - торговые маршруты
+def decode_routes_compact(markets: list[MarketRecord], compact_routes: Iterable[list[tuple[int, int]]]) \
+        -> list[list[RouteStepRecord]]:
+    result: list[list[RouteStepRecord]] = []
+
+    for compact_route in compact_routes:
+        route: list[RouteStepRecord] = []
+        for market_index, side_bit in compact_route:
+            market = markets[market_index]
+            route.append(RouteStepRecord(
+                source_asset=market.quote_asset if side_bit == COMPACT_BUY else market.base_asset,
+                common_symbol=market.common_symbol,
+                operation='buy' if side_bit == COMPACT_BUY else 'sell')
+            )
+        result.append(route)
 
     return result
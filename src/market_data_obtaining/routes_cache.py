@@ -0,0 +1,249 @@
+"""
+\file routes_cache.py
+\author github:khanbekov, telegram:qoddrysdaim
+\brief В файле находится кэш торговых маршрутов (в памяти и на диске)
+\data 2026.10.18
+
+Торговые маршруты зависят только от списка маркетов, списка ассетов и фильтра маршрутов.
+Поэтому построенные маршруты сохраняются по ключу - хэшу от (base, quote, common_symbol) маркетов, ассетов
+и фильтра (если он задан).
+Кэш состоит из двух уровней: LRU в памяти и файлы JSON на диске, которые сохраняются между перезапусками.
+Файлы читаются и пишутся в отдельном потоке, чтобы не блокировать цикл событий. Количество файлов ограничено,
+самые давно использованные файлы удаляются.
+Фильтр маршрутов задает клиент (параметры запроса), поэтому маршруты с фильтром хранятся в отдельном кэше
+только в памяти (не больше routes_filters_cache_size наборов) и не занимают место на диске.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Iterator
+
+from src.api.metrics import CACHE_REQUESTS
+from src.logger.logger import logger
+from src.market_data_obtaining.routes import iterate_routes, RoutesFilter, NO_ROUTES_FILTER
+from src.market_data_obtaining.routes_pool import construct_routes_parallel
+from src.responses_models.api_responses import RouteStepRecord
+from src.responses_models.market_models import MarketRecord
+from src.settings import PATH_TO_TRADE_SERVERS_CONFIGS, ROUTES_CACHE_DIRNAME, ROUTES_CACHE_SIZE, \
+    ROUTES_CACHE_DISK_SIZE, ROUTES_FILTERS_CACHE_SIZE
+
+
+def get_routes_fingerprint(markets: list[MarketRecord], assets: list[str],
+                           routes_filter: RoutesFilter = NO_ROUTES_FILTER) -> str:
+    """ Функция вычисляет ключ кэша торговых маршрутов.
+    Ключ не зависит от остальных полей маркетов (точность, лимиты), т.к. маршруты от них не зависят.
+
+    :param markets: список маркетов, по которым строятся маршруты.
+    :param assets: список ассетов, по которым строятся маршруты.
+    :param routes_filter: фильтр маршрутов (пустой фильтр не меняет ключ).
+    :return: str - hex-строка sha256.
+    """
+    key_data = {
+        'markets': [[market.base_asset, market.quote_asset, market.common_symbol] for market in markets],
+        'assets': assets,
+    }
+    if routes_filter != NO_ROUTES_FILTER:
+        key_data['routes_filter'] = routes_filter
+    return hashlib.sha256(json.dumps(key_data, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+
+class RoutesCache:
+    """ Кэш торговых маршрутов.
+    Первый уровень - LRU в памяти на max_size записей, второй - файлы <ключ>.json в директории path_to_dir
+    (не больше max_disk_size файлов). Если path_to_dir равен None, кэш хранится только в памяти.
+    Методы get() и put() обращаются к диску в вызывающем потоке, get_async() и put_async() - в отдельном.
+    """
+
+    def __init__(self, path_to_dir: str | None, max_size: int, max_disk_size: int):
+        self.path_to_dir = path_to_dir
+        self.max_size = max_size
+        self.max_disk_size = max_disk_size
+        self._memory: OrderedDict[str, list[list[RouteStepRecord]]] = OrderedDict()
+        # потоковые ответы читают кэш из пула потоков, поэтому доступ к памяти защищен блокировкой
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> list[list[RouteStepRecord]] | None:
+        """ Получение маршрутов из кэша. Сначала проверяется память, затем диск.
+
+        :param key: ключ, полученный из get_routes_fingerprint().
+        :return: список маршрутов или None, если маршрутов нет в кэше.
+        """
+        routes = self._get_from_memory(key)
+        if routes is not None:
+            return routes
+        return self._get_from_disk(key)
+
+    async def get_async(self, key: str) -> list[list[RouteStepRecord]] | None:
+        """ То же, что get(), но файл читается в отдельном потоке и не блокирует цикл событий """
+        routes = self._get_from_memory(key)
+        if routes is not None or self.path_to_dir is None:
+            return routes
+        return await asyncio.to_thread(self._get_from_disk, key)
+
+    def put(self, key: str, routes: list[list[RouteStepRecord]]):
+        """ Сохранение маршрутов в память и на диск.
+
+        :param key: ключ, полученный из get_routes_fingerprint().
+        :param routes: список маршрутов.
+        """
+        self._put_to_memory(key, routes)
+        self._write_to_disk(key, routes)
+
+    async def put_async(self, key: str, routes: list[list[RouteStepRecord]]):
+        """ То же, что put(), но файл пишется в отдельном потоке и не блокирует цикл событий """
+        self._put_to_memory(key, routes)
+        if self.path_to_dir is not None:
+            await asyncio.to_thread(self._write_to_disk, key, routes)
+
+    def _get_from_memory(self, key: str) -> list[list[RouteStepRecord]] | None:
+        with self._lock:
+            routes = self._memory.get(key)
+            if routes is not None:
+                self._memory.move_to_end(key)
+        if routes is not None:
+            CACHE_REQUESTS.inc('routes', 'memory')
+        return routes
+
+    def _get_from_disk(self, key: str) -> list[list[RouteStepRecord]] | None:
+        routes = self._read_from_disk(key) if self.path_to_dir is not None else None
+        if routes is not None:
+            self._put_to_memory(key, routes)
+        CACHE_REQUESTS.inc('routes', 'disk' if routes is not None else 'miss')
+        return routes
+
+    def _put_to_memory(self, key: str, routes: list[list[RouteStepRecord]]):
+        with self._lock:
+            self._memory[key] = routes
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_size:
+                self._memory.popitem(last=False)
+
+    def _get_path(self, key: str) -> str:
+        return f'{self.path_to_dir}/{key}.json'
+
+    def _read_from_disk(self, key: str) -> list[list[RouteStepRecord]] | None:
+        path_to_file = self._get_path(key)
+        if not os.path.isfile(path_to_file):
+            return None
+        try:
+            with open(path_to_file) as cache_file:
+                routes_data = json.load(cache_file)
+        except (OSError, json.decoder.JSONDecodeError) as e:
+            logger.warning(f'Не удалось прочитать кэш маршрутов {path_to_file}. Error: {e}')
+            return None
+        # время изменения файла - время последнего использования (по нему удаляются старые файлы)
+        try:
+            os.utime(path_to_file)
+        except OSError:
+            pass
+        # Файлы кэша пишет сам Configurator, поэтому данные не валидируются повторно
+        return [[RouteStepRecord(**step) for step in route] for route in routes_data]
+
+    def _write_to_disk(self, key: str, routes: list[list[RouteStepRecord]]):
+        if self.path_to_dir is None:
+            return
+        path_to_file = self._get_path(key)
+        # временный файл у каждого процесса свой, чтобы процессы uvicorn не писали в один файл
+        path_to_tmp_file = f'{path_to_file}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(self.path_to_dir, exist_ok=True)
+            # Запись во временный файл и замена, чтобы не оставить на диске недописанный кэш
+            with open(path_to_tmp_file, 'w') as cache_file:
+                json.dump([[step._asdict() for step in route] for route in routes], cache_file, separators=(',', ':'))
+            os.replace(path_to_tmp_file, path_to_file)
+        except OSError as e:
+            logger.warning(f'Не удалось сохранить кэш маршрутов {path_to_file}. Error: {e}')
+            return
+        self._remove_old_files()
+
+    def _remove_old_files(self):
+        """ Удаление самых давно использованных файлов кэша, если их больше max_disk_size """
+        files: list[tuple[float, str]] = []
+        try:
+            names = os.listdir(self.path_to_dir)
+        except OSError:
+            return
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            path_to_file = f'{self.path_to_dir}/{name}'
+            try:
+                files.append((os.stat(path_to_file).st_mtime, path_to_file))
+            except OSError:
+                # файл удалил другой процесс
+                continue
+
+        files.sort()
+        for _, path_to_file in files[:max(len(files) - self.max_disk_size, 0)]:
+            try:
+                os.remove(path_to_file)
+            except OSError:
+                continue
+
+
+# Кэш маршрутов, общий для всех торговых серверов
+routes_cache = RoutesCache(f'{PATH_TO_TRADE_SERVERS_CONFIGS}/{ROUTES_CACHE_DIRNAME}', ROUTES_CACHE_SIZE,
+                           ROUTES_CACHE_DISK_SIZE)
+# Кэш маршрутов с фильтром (только в памяти)
+filtered_routes_cache = RoutesCache(None, ROUTES_FILTERS_CACHE_SIZE, 0)
+
+
+def select_routes_cache(routes_filter: RoutesFilter) -> RoutesCache:
+    """ Функция выбирает кэш для маршрутов: с фильтром - кэш в памяти, без фильтра - общий кэш с файлами
+
+    :param routes_filter: фильтр маршрутов.
+    :return: RoutesCache.
+    """
+    return routes_cache if routes_filter == NO_ROUTES_FILTER else filtered_routes_cache
+
+
+async def get_routes(markets: list[MarketRecord], assets: list[str],
+                     routes_filter: RoutesFilter = NO_ROUTES_FILTER) -> list[list[RouteStepRecord]]:
+    """ Функция возвращает торговые маршруты из кэша, а если их там нет - строит и сохраняет в кэш.
+    Маршруты строятся в пуле процессов (см. routes_pool.py), а файлы кэша читаются и пишутся в отдельном потоке,
+    поэтому цикл событий не блокируется.
+
+    :param markets: список маркетов, по которым строятся маршруты.
+    :param assets: список ассетов, по которым строятся маршруты.
+    :param routes_filter: фильтр маршрутов (применяется во время построения).
+    :return: список построенных маршрутов.
+    """
+    key = get_routes_fingerprint(markets, assets, routes_filter)
+    cache = select_routes_cache(routes_filter)
+
+    routes = await cache.get_async(key)
+    if routes is not None:
+        logger.info(f'Торговые маршруты взяты из кэша ({key[:12]}).')
+        return routes
+
+    logger.info(f'Торговых маршрутов нет в кэше ({key[:12]}), маршруты будут построены.')
+    routes = await construct_routes_parallel(markets, assets, routes_filter)
+    await cache.put_async(key, routes)
+    return routes
+
+
+def iterate_cached_routes(markets: list[MarketRecord], assets: list[str],
+                          routes_filter: RoutesFilter = NO_ROUTES_FILTER) -> Iterator[list[RouteStepRecord]]:
+    """ Функция-генератор для потоковой отдачи маршрутов.
+    Генератор выполняется в пуле потоков (StreamingResponse), поэтому кэш читается синхронно.
+    Если маршруты есть в кэше, отдает их из кэша. Иначе отдает маршруты по мере построения,
+    не накапливая их в памяти (и поэтому не сохраняя в кэш).
+
+    :param markets: список маркетов, по которым строятся маршруты.
+    :param assets: список ассетов, по которым строятся маршруты.
+    :param routes_filter: фильтр маршрутов (применяется во время построения).
+    :return: генератор маршрутов.
+    """
+    key = get_routes_fingerprint(markets, assets, routes_filter)
+
+    routes = select_routes_cache(routes_filter).get(key)
+    if routes is not None:
+        logger.info(f'Торговые маршруты взяты из кэша ({key[:12]}).')
+        yield from routes
+        return
+
+    logger.info(f'Торговых маршрутов нет в кэше ({key[:12]}), маршруты будут построены потоком.')
+    yield from iterate_routes(markets, assets, routes_filter)
@@ -0,0 +1,107 @@
+"""
+\file routes_pool.py
+\author github:khanbekov, telegram:qoddrysdaim
+\brief В файле находится параллельное построение торговых маршрутов в пуле процессов
+\data 2026.10.18
+
+Построение маршрутов - вычисления на чистом Python, поэтому они выполняются в отдельных процессах,
+а эндпоинт ожидает результат, не блокируя цикл событий.
+
+Процессы пула запускаются через forkserver (или spawn, если forkserver недоступен), а не fork:
+в процессе uvicorn уже работают потоки (наблюдатель за конфигурациями, общее состояние, отправка логов),
+и копия процесса могла бы унаследовать захваченные ими блокировки.
+"""
+import asyncio
+import itertools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from src.logger.logger import logger
+from src.market_data_obtaining.routes import construct_routes, enumerate_route_sequences, select_route_markets, \
+    sequence_to_route, build_route_steps, build_assets_graph, get_first_indexes, RoutesFilter, NO_ROUTES_FILTER
+from src.responses_models.api_responses import RouteStepRecord
+from src.responses_models.market_models import MarketRecord
+from src.settings import ROUTES_POOL_SIZE, SERVER_WORKERS
+
+# Количество процессов пула. Если routes_pool_size = 0, процессоры делятся между процессами uvicorn
+POOL_SIZE = ROUTES_POOL_SIZE or max((os.cpu_count() or 1) // SERVER_WORKERS, 1)
+
+# Способ запуска процессов пула
+POOL_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+# Количество частей, на которое делится работа для каждого процесса (для равномерной загрузки процессов)
+CHUNKS_PER_WORKER = 4
+
+# Пул процессов создается при первом использовании
+_routes_executor: ProcessPoolExecutor | None = None
+
+
+def get_routes_executor() -> ProcessPoolExecutor:
+    """ Функция возвращает пул процессов для построения маршрутов (создает его при первом вызове)
+
+    :return: ProcessPoolExecutor на POOL_SIZE процессов.
+    """
+    global _routes_executor
+    if _routes_executor is None:
+        _routes_executor = ProcessPoolExecutor(max_workers=POOL_SIZE,
+                                               mp_context=multiprocessing.get_context(POOL_START_METHOD))
+        logger.info(f'Создан пул из {POOL_SIZE} процессов ({POOL_START_METHOD}) для построения торговых маршрутов.')
+    return _routes_executor
+
+
+def shutdown_routes_executor():
+    """ Функция останавливает пул процессов, если он был создан """
+    global _routes_executor
+    if _routes_executor is not None:
+        _routes_executor.shutdown(cancel_futures=True)
+        _routes_executor = None
+
+
+async def construct_routes_parallel(markets: list[MarketRecord], assets: list[str],
+                                    routes_filter: RoutesFilter = NO_ROUTES_FILTER) -> list[list[RouteStepRecord]]:
+    """ Функция строит торговые маршруты, распределяя первые маркеты маршрутов между процессами пула.
+    Результат и порядок маршрутов совпадают с construct_routes().
+    Если POOL_SIZE не больше 1, маршруты строятся в отдельном потоке.
+
+    :param markets: список маркетов, по которым строятся маршруты.
+    :param assets: список ассетов, по которым строятся маршруты.
+    :param routes_filter: фильтр маршрутов (применяется во время перебора, см. routes.RoutesFilter).
+    :return: список построенных маршрутов.
+    """
+    if POOL_SIZE <= 1:
+        return await asyncio.to_thread(construct_routes, markets, assets, routes_filter)
+
+    selected_markets = select_route_markets(markets, assets, routes_filter)
+    first_indexes = get_first_indexes(selected_markets, build_assets_graph(selected_markets), routes_filter)
+    chunks_count = min(len(first_indexes), POOL_SIZE * CHUNKS_PER_WORKER)
+    if chunks_count == 0:
+        return []
+
+    # Первые маркеты распределяются по частям через один, чтобы длинные и короткие части перемешались
+    chunks = [first_indexes[chunk_index::chunks_count] for chunk_index in range(chunks_count)]
+
+    loop = asyncio.get_running_loop()
+    executor = get_routes_executor()
+    chunks_results = await asyncio.gather(*(
+        loop.run_in_executor(executor, enumerate_route_sequences, markets, assets, chunk, routes_filter)
+        for chunk in chunks
+    ))
+
+    return await asyncio.to_thread(merge_route_sequences, selected_markets, chunks_results)
+
+
+def merge_route_sequences(selected_markets: list[MarketRecord],
+                          chunks_results: list[list[tuple[int, int, tuple[int, ...], str]]]) \
+        -> list[list[RouteStepRecord]]:
+    """ Функция объединяет результаты процессов в порядке (длина маршрута, индекс первого маркета).
+    Внутри одного первого маркета порядок маршрутов сохраняется (сортировка устойчивая).
+
+    :param selected_markets: отобранные маркеты, на индексы которых ссылаются маршруты.
+    :param chunks_results: результаты enumerate_route_sequences() для каждой части.
+    :return: список построенных маршрутов.
+    """
+    sequences = sorted(itertools.chain.from_iterable(chunks_results), key=lambda item: (item[0], item[1]))
+    steps = build_route_steps(selected_markets)
+    return [sequence_to_route(selected_markets, steps, sequence, first_asset)
+            for _, _, sequence, first_asset in sequences]
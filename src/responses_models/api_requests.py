@@ -0,0 +1,20 @@
+"""
+\file api_requests.py
+\author github:khanbekov, telegram:qoddrysdaim
+\brief В файле находятся классы тел запросов к API
+\data 2026.10.18
+"""
+from pydantic import BaseModel, Field
+
+from src.responses_models.api_responses import RoutesFormat, JsonFormat
+from src.settings import BATCH_MAX_SIZE
+
+
+# Запрос к эндпоинту /batch
+# trade_servers: list[str] - торговые серверы в формате "exchange_id/instance" (например, "binance/1")
+# routes_format: RoutesFormat - формат торговых маршрутов (как в основном эндпоинте)
+# json_format: JsonFormat - формат JSON ответов торговых серверов (как в основном эндпоинте)
+class BatchRequest(BaseModel):
+    trade_servers: list[str] = Field(..., min_items=1, max_items=BATCH_MAX_SIZE)
+    routes_format: RoutesFormat = RoutesFormat.verbose
+    json_format: JsonFormat = JsonFormat.compact
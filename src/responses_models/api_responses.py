@@ -6,7 +6,8 @@
 \data 2022.03.12
 """
 import json
-from typing import Optional
+from enum import Enum
+from typing import NamedTuple, Optional
 
 from pydantic import BaseModel, Field
 from pydantic.main import create_model
@@ -26,6 +27,15 @@ class RouteStep(BaseModel):
     operation: str
 
 
+# Внутреннее представление шага торгового маршрута: поля - как у RouteStep, но без проверки pydantic.
+# Шаги создаются один раз для каждого маркета и направления и используются во всех маршрутах
+# (см. routes.build_route_steps()), в ответ API попадают через _asdict().
+class RouteStepRecord(NamedTuple):
+    source_asset: str | None
+    common_symbol: str
+    operation: str
+
+
 class HeaderReponseFormat(BaseModel):
     exchange: Optional[str]
     node: Optional[str]
@@ -47,23 +57,92 @@ class ConfigsResponseData(BaseModel):
     configs: dict
 
 
+# Потоковые форматы ответа основного эндпоинта (параметр запроса stream)
+# ndjson - JSON построчно, торговые маршруты по одному в строке
+class StreamFormat(str, Enum):
+    ndjson = 'ndjson'
+
+
+# Форматы торговых маршрутов в ответе основного эндпоинта (параметр запроса routes_format)
+# verbose - маршрут это список объектов RouteStep
+# compact - маршрут это список пар [market_index, side_bit] (см. routes.encode_routes_compact())
+class RoutesFormat(str, Enum):
+    verbose = 'verbose'
+    compact = 'compact'
+
+
+# Форматы JSON ответа основного эндпоинта (параметр запроса json_format)
+# indented - JSON с отступами в 4 пробела
+# compact - JSON в одну строку (сериализуется быстрее и занимает меньше места)
+class JsonFormat(str, Enum):
+    indented = 'indented'
+    compact = 'compact'
+
+
+# Данные ответа с торговыми маршрутами в компактном формате
+# routes: list[list[tuple[int, int]]] - шаги маршрутов [индекс маркета в markets, 0 - sell / 1 - buy]
+class CompactConfigsResponseData(BaseModel):
+    markets: list[Market]
+    assets_labels: list[AssetLabel]
+    routes: list[list[tuple[int, int]]]
+    configs: dict
+
+
+# Режимы эндпоинта /watch (параметр запроса mode)
+# long_poll - ответ WatchResponse, когда версия данных изменится (или истечет время ожидания)
+# sse - Server-Sent Events, событие version при каждом изменении версии данных
+class WatchMode(str, Enum):
+    long_poll = 'long_poll'
+    sse = 'sse'
+
+
+# Ответ эндпоинта /watch в режиме long_poll
+# exchange: str - название биржи
+# instance: str - название инстанса торгового сервера
+# version: str - текущая версия данных торгового сервера (см. заголовок X-Config-Version)
+# changed: bool - отличается ли версия от версии клиента (False - истекло время ожидания)
+class WatchResponse(BaseModel):
+    exchange: str
+    instance: str
+    version: str
+    changed: bool
+
+
 class ConfigsResponse(ResponseFormat):
     event = 'config'
     node = 'configurator'
     algo = 'spread_bot_cpp'
-    data: Optional[ConfigsResponseData]
+    data: Optional[ConfigsResponseData | CompactConfigsResponseData]
+
+
+# Результат для одного торгового сервера в ответе эндпоинта /batch
+# trade_server: str - торговый сервер "exchange_id/instance"
+# status: int - HTTP статус, который вернул бы основной эндпоинт
+# version: str - версия данных торгового сервера (если status = 200)
+# response: ConfigsResponse - ответ основного эндпоинта (если status = 200)
+# error: dict - описание ошибки из api_errors (title, detail), если status != 200
+# markets_age: int - возраст маркетов биржи в секундах, если маркеты устарели (как заголовок X-Markets-Age)
+class BatchItem(BaseModel):
+    trade_server: str
+    status: int
+    version: Optional[str]
+    markets_age: Optional[int]
+    response: Optional[ConfigsResponse]
+    error: Optional[dict]
+
+
+# Ответ эндпоинта /batch (результаты в порядке запроса)
+class BatchResponse(BaseModel):
+    results: list[BatchItem]
 
-def init_response(path_to_header_file: str, default_header: dict):
-    """Функция для получения основных полей response Configurator API и
-    обработки недостающих полей в файле header.json
 
-    :param default_header:
+def read_header(path_to_header_file: str, default_header: dict) -> dict:
+    """Функция для чтения и проверки основных полей response Configurator API и
+    обработки недостающих полей в файле header.json (недостающие поля дописываются в файл)
+
     :param path_to_header_file: путь к файлу json с оснонвыми полями для response. Обычно это файл header.json
-    :param exchange_id: название биржи. Используется, если в header.json не выставлено значение.
-    :param instance: название инстанса. Используется, если в header.json не выставлено значение.
-    :return: модель pydantic. Используется потомок ConfigsResponse, с добавление новых полей.
-    Если в файле нет новых полей, всё равно будет использоваться потомок, но
-    поля будут соответствовать ConfigsResponse.
+    :param default_header: значения полей по умолчанию, используются, если в header.json не выставлено значение.
+    :return: dict - поля из header.json (проверенные моделью ConfigsResponse)
     """
     with open(f'{path_to_header_file}', 'r') as header_file:
         try:
@@ -72,7 +151,8 @@ def init_response(path_to_header_file: str, default_header: dict):
             logger.error(f'Error with decoding json {path_to_header_file}. Error: {e}')
             raise e
 
-        response = ConfigsResponse(**header_data)
+    # Проверка полей (исключение pydantic.ValidationError, если поля некорректны)
+    ConfigsResponse(**header_data)
 
     if check_dict_to_missing_fields(header_data, ['exchange', 'node', 'instance', 'algo']):
         with open(f'{path_to_header_file}', 'w') as header_file:
@@ -81,7 +161,18 @@ def init_response(path_to_header_file: str, default_header: dict):
                 if key in new_header:
                     new_header[key] = value
             json.dump(HeaderReponseFormat(**new_header).dict(), header_file, indent=4)
-    return response
+    return header_data
+
+
+def init_response(path_to_header_file: str, default_header: dict):
+    """Функция для получения основных полей response Configurator API и
+    обработки недостающих полей в файле header.json
+
+    :param default_header: значения полей по умолчанию, используются, если в header.json не выставлено значение.
+    :param path_to_header_file: путь к файлу json с оснонвыми полями для response. Обычно это файл header.json
+    :return: модель pydantic ConfigsResponse с полями из header.json.
+    """
+    return ConfigsResponse(**read_header(path_to_header_file, default_header))
 
 
 # ЗАМОРОЖЕННЫЙ ФУНКЦИОНАЛ
@@ -4,7 +4,7 @@
 \brief В файле находится классы для хранения информации о маркетах и ассетах (их возвращает API)
 \data 2022.03.12
 """
-from typing import Optional
+from typing import NamedTuple, Optional
 
 from pydantic import BaseModel
 
@@ -43,3 +43,17 @@ class Market(BaseModel):
     limits: Limits
     base_asset: str
     quote_asset: str
+
+
+# Внутреннее представление маркета: поля и их порядок - как у Market, но без проверки pydantic
+# (данные маркетов берутся из ccxt и уже приведены к нужным типам, см. markets.make_market_record()).
+# Используется при сборе данных и построении торговых маршрутов, в ответ API попадает через _asdict().
+# limits: dict - {amount, price, cost, leverage: {min, max}}, как Market.Limits
+class MarketRecord(NamedTuple):
+    exchange_symbol: str
+    common_symbol: str
+    price_increment: Optional[float]
+    amount_increment: Optional[float]
+    limits: dict
+    base_asset: str
+    quote_asset: str
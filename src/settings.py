@@ -4,21 +4,67 @@
 \brief Файл загружает настройки Configurator
 \data 2022.03.12
 """
-import os
-
 import tomli
 
 API_CONFIGURATION_PATH = 'config.toml'
 
-
-AERON_SERVICE_NAME = 'aeron'
-if os.system(f'systemctl is-active --quiet {AERON_SERVICE_NAME}') != 0:
-    print('Critical: Aeron service is not launched. Please launch Aeron before launching Configurator.')
-    exit(1)
-
 with open(API_CONFIGURATION_PATH, "rb") as f:
     toml_dict = tomli.load(f)
 
 PATH_TO_TRADE_SERVERS_CONFIGS = toml_dict['data']['path_to_trade_servers_configs']
 
+SERVER_WORKERS = toml_dict['server']['workers']
+
+SHARED_STATE_PATH = toml_dict['server']['state_path']
+
+SHARED_STATE_SLOTS = toml_dict['server']['state_slots']
+
+SHARED_STATE_POLL_INTERVAL = toml_dict['server']['state_poll_interval']
+
+ENDPOINT_SETTINGS_RELOAD_INTERVAL = toml_dict['endpoint']['settings_reload_interval']
+
+WATCH_MAX_TIMEOUT = toml_dict['endpoint']['watch']['max_timeout']
+
+WATCH_SSE_PING_INTERVAL = toml_dict['endpoint']['watch']['sse_ping_interval']
+
+BATCH_MAX_SIZE = toml_dict['endpoint']['batch']['max_size']
+
+COMPRESSION_ENCODINGS = toml_dict['endpoint']['compression']['encodings']
+
+COMPRESSION_GZIP_LEVEL = toml_dict['endpoint']['compression']['gzip_level']
+
+COMPRESSION_ZSTD_LEVEL = toml_dict['endpoint']['compression']['zstd_level']
+
+COMPRESSION_MIN_SIZE = toml_dict['endpoint']['compression']['min_size']
+
+CONFIG_HISTORY_SIZE = toml_dict['data']['config_history_size']
+
+ROUTES_CACHE_DIRNAME = toml_dict['data']['routes_cache_dirname']
+
+ROUTES_CACHE_SIZE = toml_dict['data']['routes_cache_size']
+
+ROUTES_CACHE_DISK_SIZE = toml_dict['data']['routes_cache_disk_size']
+
+ROUTES_FILTERS_CACHE_SIZE = toml_dict['data']['routes_filters_cache_size']
+
+ROUTES_POOL_SIZE = toml_dict['data']['routes_pool_size']
+
+MARKETS_CACHE_TTL = toml_dict['data']['markets_cache']['ttl']
+
+MARKETS_CACHE_REFRESH_BEFORE = toml_dict['data']['markets_cache']['refresh_before']
+
+MARKETS_CACHE_RETRY_INTERVAL = toml_dict['data']['markets_cache']['retry_interval']
+
+MARKETS_SNAPSHOTS_DIRNAME = toml_dict['data']['markets_cache']['snapshots_dirname']
+
+MARKETS_SNAPSHOTS_KEEP = toml_dict['data']['markets_cache']['snapshots_keep']
+
+CONFIG_WATCHER_BACKEND = toml_dict['data']['config_watcher']['backend']
+
+CONFIG_WATCHER_POLL_INTERVAL = toml_dict['data']['config_watcher']['poll_interval']
+
+AERON_PROBE = toml_dict['aeron']['probe']
+
+AERON_DIR = toml_dict['aeron']['dir']
+
 LOGGING_CONFIG = toml_dict['logging']
@@ -0,0 +1,113 @@
+"""
+\file conftest.py
+\author github:khanbekov, telegram:qoddrysdaim
+\brief Общие настройки и фикстуры тестов
+\data 2026.10.18
+
+Модули Configurator импортируются от корня репозитория (src.*), а настройки читаются из config.toml
+в текущей директории, поэтому тесты запускаются из корня: python -m pytest
+"""
+import json
+import os
+import random
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+os.chdir(ROOT_DIR)
+
+
+# Ассеты фиктивной биржи: маркеты - все пары этих ассетов
+FAKE_EXCHANGE_ASSETS = ('BTC', 'ETH', 'USDT', 'BNB')
+
+
+def make_fake_markets(assets: tuple[str, ...], seed: int = 0) -> dict:
+    """ Маркеты в формате ccxt (Exchange.markets) для всех пар ассетов """
+    rnd = random.Random(seed)
+    markets = {}
+    for index, base in enumerate(assets):
+        for quote in assets[index + 1:]:
+            markets[f'{base}/{quote}'] = {
+                'id': f'{base}{quote}', 'symbol': f'{base}/{quote}', 'base': base, 'quote': quote,
+                'baseId': base, 'quoteId': quote, 'type': 'spot',
+                'precision': {'price': rnd.randint(1, 8), 'amount': rnd.randint(1, 8)},
+                'limits': {'amount': {'min': 0.1, 'max': None}, 'price': {'min': None, 'max': None},
+                           'cost': {'min': 10, 'max': None}, 'leverage': {'min': None, 'max': None}},
+            }
+    return markets
+
+
+class FakeExchange:
+    """ Биржа ccxt.async_support без обращений к сети """
+    calls = 0
+
+    def __init__(self):
+        import ccxt
+        self.precisionMode = ccxt.DECIMAL_PLACES
+
+    async def load_markets(self, reload: bool = False) -> dict:
+        FakeExchange.calls += 1
+        return make_fake_markets(FAKE_EXCHANGE_ASSETS)
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture(scope='session')
+def fake_market_records() -> list:
+    """ Маркеты фиктивной биржи в виде MarketRecord (как после загрузки из ccxt) """
+    from src.market_data_obtaining.markets import make_market_record
+
+    return [make_market_record(market, True) for market in make_fake_markets(FAKE_EXCHANGE_ASSETS).values()]
+
+
+@pytest.fixture(scope='session')
+def configs_root(tmp_path_factory) -> str:
+    """ Директория с конфигурациями торговых серверов для тестов API """
+    return str(tmp_path_factory.mktemp('configs'))
+
+
+@pytest.fixture(scope='session')
+def make_trade_server(configs_root):
+    """ Функция создает директорию торгового сервера <configs_root>/<exchange_id>/<instance> """
+
+    def make(exchange_id: str, instance: str, assets: str = 'BTC, ETH, USDT, BNB',
+             sections: dict | None = None) -> str:
+        path_to_config = os.path.join(configs_root, exchange_id, instance)
+        os.makedirs(os.path.join(path_to_config, 'sections'))
+        with open(os.path.join(path_to_config, 'assets.txt'), 'w') as assets_file:
+            assets_file.write(assets)
+        header = {'exchange': exchange_id, 'node': 'configurator', 'algo': 'spread_bot_cpp', 'instance': instance}
+        with open(os.path.join(path_to_config, 'header.json'), 'w') as header_file:
+            json.dump(header, header_file)
+        for name, content in (sections or {'gate_config': {'a': 1}}).items():
+            with open(os.path.join(path_to_config, 'sections', f'{name}.json'), 'w') as section_file:
+                json.dump(content, section_file)
+        return path_to_config
+
+    return make
+
+
+@pytest.fixture(scope='session')
+def api_client(configs_root):
+    """ Клиент API (fastapi TestClient): конфигурации и кэши - в configs_root, маркеты - FakeExchange """
+    from fastapi.testclient import TestClient
+
+    import src.api.api as api
+    import src.market_data_obtaining.markets_cache as markets_cache_module
+    from src.api.config_watcher import config_watcher
+    from src.market_data_obtaining.markets_cache import markets_cache
+    from src.market_data_obtaining.routes_cache import routes_cache
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(api, 'path_to_trade_servers_configs', configs_root)
+        monkeypatch.setattr(config_watcher, 'path_to_root', configs_root)
+        monkeypatch.setattr(routes_cache, 'path_to_dir', os.path.join(configs_root, '.routes_cache'))
+        monkeypatch.setattr(markets_cache.snapshots, 'path_to_dir', os.path.join(configs_root, '.markets_snapshots'))
+        monkeypatch.setattr(markets_cache_module, 'get_async_exchange_by_id', lambda exchange_id: FakeExchange())
+        with TestClient(api.app) as client:
+            yield client
@@ -0,0 +1,187 @@
+"""
+\file test_aeron_handler.py
+\author github:khanbekov, telegram:qoddrysdaim
+\brief Тесты обработчика логов Aeron (с заглушкой вместо aeron.Publisher)
+\data 2026.10.18
+"""
+import logging
+import sys
+import threading
+import types
+
+import pytest
+
+from src.logger.aeron_handler import AeronHandler, BACK_PRESSURED, NOT_CONNECTED, RECORDS_SEPARATOR
+
+
+class StubPublisher:
+    """ Заглушка aeron.Publisher: сохраняет сообщения, возвращает заданные коды ошибок и может ждать разрешения """
+
+    def __init__(self, results: list | None = None):
+        # коды, которые вернет offer() (по порядку), после них - успешная отправка
+        self.results = list(results or [])
+        self.messages: list[str] = []
+        # offer() ждет, пока событие не установлено
+        self.released = threading.Event()
+        self.released.set()
+        # offer() вызван хотя бы раз
+        self.started = threading.Event()
+
+    def offer(self, message: str):
+        self.started.set()
+        self.released.wait()
+        if self.results:
+            return self.results.pop(0)
+        self.messages.append(message)
+        return len(message)
+
+
+def make_handler(publisher: StubPublisher, **kwargs) -> AeronHandler:
+    handler = AeronHandler('aeron:ipc', 1, publisher=publisher, retry_interval=0, **kwargs)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    return handler
+
+
+def make_record(message: str) -> logging.LogRecord:
+    return logging.LogRecord('test', logging.WARNING, __file__, 0, message, None, None)
+
+
+def emit_all(handler: AeronHandler, messages: list[str]):
+    for message in messages:
+        handler.emit(make_record(message))
+
+
+def block_sender(handler: AeronHandler, publisher: StubPublisher):
+    """ Первая запись забирается потоком отправки и ждет в offer(), остальные копятся в буфере """
+    publisher.released.clear()
+    handler.emit(make_record('first'))
+    assert publisher.started.wait(1)
+
+
+def test_batches_records_by_count():
+    publisher = StubPublisher()
+    handler = make_handler(publisher, batch_max_records=3)
+    block_sender(handler, publisher)
+    emit_all(handler, [f'record {index}' for index in range(7)])
+    publisher.released.set()
+    handler.close()
+
+    assert publisher.messages == ['first', 'record 0\nrecord 1\nrecord 2', 'record 3\nrecord 4\nrecord 5', 'record 6']
+    stats = handler.get_stats()
+    assert (stats.offered, stats.offers, stats.dropped, stats.queued) == (8, 4, 0, 0)
+
+
+def test_batch_size_is_measured_in_bytes():
+    publisher = StubPublisher()
+    # 10 символов кириллицы - 20 байт UTF-8: две записи с разделителем (41 байт) не помещаются в 40 байт
+    handler = make_handler(publisher, batch_max_records=32, batch_max_bytes=40)
+    block_sender(handler, publisher)
+    emit_all(handler, ['ошибкаааах'] * 4)
+    publisher.released.set()
+    handler.close()
+
+    assert publisher.messages[1:] == ['ошибкаааах'] * 4
+    assert all(len(message.encode('utf-8')) <= 40 for message in publisher.messages)
+
+    # латиница того же размера в символах (10 байт) помещается по три записи
+    publisher = StubPublisher()
+    handler = make_handler(publisher, batch_max_records=32, batch_max_bytes=40)
+    block_sender(handler, publisher)
+    emit_all(handler, ['errorerror'] * 4)
+    publisher.released.set()
+    handler.close()
+
+    assert publisher.messages[1:] == [RECORDS_SEPARATOR.join(['errorerror'] * 3), 'errorerror']
+
+
+def test_back_pressure_is_retried():
+    publisher = StubPublisher(results=[BACK_PRESSURED, BACK_PRESSURED, False])
+    handler = make_handler(publisher, max_retries=5)
+    emit_all(handler, ['message'])
+    handler.close()
+
+    assert publisher.messages == ['message']
+    stats = handler.get_stats()
+    assert (stats.offered, stats.back_pressured, stats.dropped) == (1, 3, 0)
+
+
+def test_message_dropped_after_retries():
+    publisher = StubPublisher(results=[BACK_PRESSURED] * 3)
+    handler = make_handler(publisher, max_retries=2)
+    emit_all(handler, ['message'])
+    handler.close()
+
+    assert publisher.messages == []
+    stats = handler.get_stats()
+    assert (stats.offered, stats.back_pressured, stats.dropped) == (0, 3, 1)
+
+
+def test_not_connected_drops_message():
+    publisher = StubPublisher(results=[NOT_CONNECTED])
+    handler = make_handler(publisher, batch_max_records=1)
+    emit_all(handler, ['lost', 'delivered'])
+    handler.close()
+
+    assert publisher.messages == ['delivered']
+    stats = handler.get_stats()
+    assert (stats.offered, stats.not_connected, stats.dropped) == (1, 1, 1)
+
+
+def test_drop_new_when_queue_is_full():
+    publisher = StubPublisher()
+    handler = make_handler(publisher, queue_size=2, drop_policy='drop_new', batch_max_records=1)
+    block_sender(handler, publisher)
+    emit_all(handler, ['a', 'b', 'c', 'd'])
+    publisher.released.set()
+    handler.close()
+
+    assert publisher.messages == ['first', 'a', 'b']
+    assert handler.get_stats().dropped == 2
+
+
+def test_drop_oldest_when_queue_is_full():
+    publisher = StubPublisher()
+    handler = make_handler(publisher, queue_size=2, drop_policy='drop_oldest', batch_max_records=1)
+    block_sender(handler, publisher)
+    emit_all(handler, ['a', 'b', 'c', 'd'])
+    publisher.released.set()
+    handler.close()
+
+    assert publisher.messages == ['first', 'c', 'd']
+    assert handler.get_stats().dropped == 2
+
+
+def test_block_waits_for_space_then_drops():
+    publisher = StubPublisher()
+    handler = make_handler(publisher, queue_size=1, drop_policy='block', block_timeout=0.01, batch_max_records=1)
+    block_sender(handler, publisher)
+    emit_all(handler, ['a', 'b'])
+    publisher.released.set()
+    handler.close()
+
+    assert publisher.messages == ['first', 'a']
+    assert handler.get_stats().dropped == 1
+
+
+def test_publisher_failure_falls_back_to_stderr(monkeypatch, capsys):
+    class FailingPublisher:
+        def __init__(self, channel: str, stream_id: int):
+            raise RuntimeError('no media driver')
+
+    monkeypatch.setitem(sys.modules, 'aeron', types.SimpleNamespace(Publisher=FailingPublisher))
+    handler = AeronHandler('aeron:ipc', 1)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    handler.handle(make_record('fallback record'))
+    # так обработчик закрывает logging.shutdown() при выходе
+    handler.flush()
+    handler.close()
+
+    stderr = capsys.readouterr().err
+    assert 'no media driver' in stderr
+    assert stderr.endswith('fallback record\n')
+    assert handler.get_stats() == (0, 0, 0, 0, 0, 0)
+
+
+def test_unknown_drop_policy():
+    with pytest.raises(ValueError):
+        AeronHandler('aeron:ipc', 1, publisher=StubPublisher(), drop_policy='unknown')
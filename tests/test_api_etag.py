@@ -0,0 +1,72 @@
+"""
+\file test_api_etag.py
+\author github:khanbekov, telegram:qoddrysdaim
+\brief Тесты ETag / If-None-Match основного эндпоинта (ответ 304 без данных)
+\data 2026.10.18
+"""
+import os
+import time
+
+from src.api.utils import check_etag_match
+
+TIMEOUT = 5.0
+
+
+def wait_for_new_etag(api_client, url: str, etag: str) -> str:
+    """ Ожидание нового ETag (наблюдатель узнает об изменении конфигурации в фоновом потоке) """
+    deadline = time.monotonic() + TIMEOUT
+    while time.monotonic() < deadline:
+        new_etag = api_client.get(url).headers['ETag']
+        if new_etag != etag:
+            return new_etag
+        time.sleep(0.05)
+    raise AssertionError(f'ETag {url} не изменился')
+
+
+def get_settled_etag(api_client, url: str) -> str:
+    """ ETag после того, как наблюдатель обработал создание директории, а маркеты биржи загружены
+    (первый запрос загружает маркеты, версия маркетов входит в ETag) """
+    deadline = time.monotonic() + TIMEOUT
+    etag = api_client.get(url).headers['ETag']
+    while time.monotonic() < deadline:
+        time.sleep(0.2)
+        response = api_client.get(url)
+        assert response.status_code == 200
+        if response.headers['ETag'] == etag:
+            return etag
+        etag = response.headers['ETag']
+    raise AssertionError(f'ETag {url} меняется')
+
+
+def test_check_etag_match():
+    assert check_etag_match('W/"v1-indented-verbose"', 'W/"v1-indented-verbose"')
+    assert check_etag_match('"v1-indented-verbose"', 'W/"v1-indented-verbose"')
+    assert check_etag_match('W/"v0", W/"v1-indented-verbose"', 'W/"v1-indented-verbose"')
+    assert check_etag_match('*', 'W/"v1-indented-verbose"')
+    assert not check_etag_match('W/"v0-indented-verbose"', 'W/"v1-indented-verbose"')
+
+
+def test_not_modified_until_config_changes(api_client, make_trade_server):
+    path_to_config = make_trade_server('binance', 'etag')
+    url = '/binance/etag?only_new=false'
+    etag = get_settled_etag(api_client, url)
+
+    response = api_client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.content == b''
+    assert response.headers['ETag'] == etag
+
+    # ETag зависит от формата ответа
+    compact_etag = api_client.get(f'{url}&routes_format=compact').headers['ETag']
+    assert compact_etag != etag
+    assert api_client.get(url, headers={'If-None-Match': compact_etag}).status_code == 200
+
+    with open(os.path.join(path_to_config, 'sections', 'gate_config.json'), 'w') as section_file:
+        section_file.write('{"a": 2}')
+    new_etag = wait_for_new_etag(api_client, url, etag)
+
+    response = api_client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] == new_etag
+    assert response.json()['data']['configs']['gate_config'] == {'a': 2}
+    assert api_client.get(url, headers={'If-None-Match': new_etag}).status_code == 304
@@ -0,0 +1,50 @@
+"""
+\file test_batch.py
+\author github:khanbekov, telegram:qoddrysdaim
+\brief Тесты эндпоинта POST /batch (данные нескольких торговых серверов одним запросом)
+\data 2026.10.18
+"""
+from src.responses_models.api_responses import BatchResponse
+
+
+def test_batch_results_match_main_endpoint(api_client, make_trade_server):
+    make_trade_server('binance', 'batch1', sections={'gate_config': {'a': 1}})
+    make_trade_server('binance', 'batch2', assets='BTC, ETH, USDT', sections={'gate_config': {'a': 2}})
+    trade_servers = ['binance/batch2', 'binance/missing', 'binance/batch1', 'no_such_exchange/1', 'binance',
+                     'binance/batch2']
+
+    response = api_client.post('/batch', json={'trade_servers': trade_servers, 'json_format': 'indented'})
+    assert response.status_code == 200
+    results = BatchResponse.parse_raw(response.content).results
+    assert [result.trade_server for result in results] == trade_servers
+    assert [result.status for result in results] == [200, 404, 200, 404, 404, 200]
+
+    for result in results:
+        if result.status != 200:
+            assert result.response is None
+            assert set(result.error) == {'title', 'detail'}
+            continue
+        assert result.error is None
+        expected = api_client.get(f'/{result.trade_server}?only_new=false').json()
+        content = response.json()['results'][trade_servers.index(result.trade_server)]['response']
+        assert content['data'] == expected['data']
+        assert content['instance'] == expected['instance']
+        assert content['message'] == expected['message']
+    # повтор торгового сервера в запросе - тот же результат
+    assert results[0] == results[-1]
+
+
+def test_batch_compact_routes(api_client, make_trade_server):
+    make_trade_server('binance', 'batch_compact')
+    response = api_client.post('/batch', json={'trade_servers': ['binance/batch_compact'],
+                                               'routes_format': 'compact'})
+    result = response.json()['results'][0]
+    assert result['status'] == 200
+    expected = api_client.get('/binance/batch_compact?only_new=false&routes_format=compact').json()
+    assert result['response']['data']['routes'] == expected['data']['routes']
+
+
+def test_batch_request_validation(api_client):
+    assert api_client.post('/batch', json={'trade_servers': []}).status_code == 422
+    assert api_client.post('/batch', json={'trade_servers': ['binance/1'], 'routes_format': 'short'}).status_code \
+           == 422
@@ -0,0 +1,77 @@
+"""
+\file test_compression.py
+\author github:khanbekov, telegram:qoddrysdaim
+\brief Тесты сжатия сериализованных ответов (gzip с подстановкой timestamp, несколько кадров zstd)
+\data 2026.10.18
+"""
+import gzip
+import random
+import zlib
+
+import pytest
+
+import src.api.compression as compression
+from src.api.compression import choose_encoding, compress_gzip, crc32_shift_operator, gf2_matrix_times
+from src.api.rendered_responses import render_json, split_rendered_response
+
+TIMESTAMPS = (0, 7, 1700000000123456)
+
+
+def make_rendered(size: int, seed: int = 0):
+    rnd = random.Random(seed)
+    content = {
+        'timestamp': None,
+        'message': 'свежая конфигурация',
+        'data': [rnd.choice(['BTC/USDT', 'ETH/BTC', rnd.random()]) for _ in range(size)],
+    }
+    return split_rendered_response('v1', render_json(content))
+
+
+@pytest.mark.parametrize('length', [0, 1, 2, 3, 100, 4095, 65537])
+def test_crc32_shift_operator(length):
+    rnd = random.Random(length)
+    first = rnd.randbytes(rnd.randint(0, 50))
+    second = rnd.randbytes(length)
+    combined = gf2_matrix_times(crc32_shift_operator(length), zlib.crc32(first)) ^ zlib.crc32(second)
+    assert combined == zlib.crc32(first + second)
+
+
+@pytest.mark.parametrize('size', [0, 10, 5000])
+@pytest.mark.parametrize('level', [1, 6, 9])
+def test_gzip_render_decompresses_to_body(size, level):
+    rendered = make_rendered(size)
+    compressed = compress_gzip(rendered, level)
+    for timestamp in TIMESTAMPS:
+        # gzip.decompress проверяет CRC32 и длину тела из трейлера
+        assert gzip.decompress(compressed.render(timestamp)) == rendered.render(timestamp)
+
+
+@pytest.mark.parametrize('size', [0, 10, 5000])
+def test_zstd_render_decompresses_to_body(size):
+    zstandard = pytest.importorskip('zstandard')
+    rendered = make_rendered(size)
+    compressed = compression.compress_zstd(rendered, 3)
+    decompressor = zstandard.ZstdDecompressor()
+    for timestamp in TIMESTAMPS:
+        body = compressed.render(timestamp)
+        # кадры декодируются последовательно, содержимое склеивается
+        reader = decompressor.stream_reader(body, read_across_frames=True)
+        assert reader.read() == rendered.render(timestamp)
+
+
+@pytest.mark.parametrize('accept_encoding, encoding', [
+    (None, None),
+    ('', None),
+    ('identity', None),
+    ('gzip', 'gzip'),
+    ('gzip, zstd', 'zstd'),
+    ('gzip, zstd;q=0.5', 'gzip'),
+    ('GZIP;q=0.3, br', 'gzip'),
+    ('zstd;q=0, gzip;q=0', None),
+    ('*', 'zstd'),
+    ('*;q=0.2, gzip;q=0.5', 'gzip'),
+    ('gzip;q=abc, zstd;q=0.1', 'zstd'),
+])
+def test_choose_encoding(monkeypatch, accept_encoding, encoding):
+    monkeypatch.setattr(compression, 'AVAILABLE_ENCODINGS', ('zstd', 'gzip'))
+    assert choose_encoding(accept_encoding) == encoding
@@ -0,0 +1,177 @@
+"""
+\file test_config_history.py
+\author github:khanbekov, telegram:qoddrysdaim
+\brief Тесты истории версий торговых серверов (ответы с изменениями в формате JSON Patch)
+\data 2026.10.18
+"""
+import copy
+import json
+import os
+import random
+import time
+
+import pytest
+
+from src.api.config_history import ConfigHistory, diff_json, escape_pointer
+
+KEY = ('binance/1', 'verbose', '')
+# ключи с символами, которые экранируются в JSON Pointer
+KEYS_POOL = ['a', 'b', 'a/b', '~', '~1', 'ключ', '']
+TIMEOUT = 5.0
+
+
+def unescape_pointer(token: str) -> str:
+    return token.replace('~1', '/').replace('~0', '~')
+
+
+def apply_patch(document, operations: list[dict]):
+    """ Применение JSON Patch (RFC 6902, операции add, remove, replace) """
+    document = copy.deepcopy(document)
+    for operation in operations:
+        tokens = [unescape_pointer(token) for token in operation['path'].split('/')[1:]]
+        if not tokens:
+            assert operation['op'] == 'replace'
+            document = operation['value']
+            continue
+        parent = document
+        for token in tokens[:-1]:
+            parent = parent[token]
+        if operation['op'] == 'remove':
+            del parent[tokens[-1]]
+        elif operation['op'] == 'add':
+            assert tokens[-1] not in parent
+            parent[tokens[-1]] = operation['value']
+        else:
+            assert tokens[-1] in parent
+            parent[tokens[-1]] = operation['value']
+    return document
+
+
+def random_value(rnd: random.Random, depth: int = 0):
+    kind = rnd.randrange(5 if depth < 3 else 3)
+    if kind == 0:
+        return rnd.randint(0, 3)
+    if kind == 1:
+        return rnd.choice(['x', None, True])
+    if kind == 2:
+        return [rnd.randint(0, 2) for _ in range(rnd.randint(0, 2))]
+    return {key: random_value(rnd, depth + 1) for key in rnd.sample(KEYS_POOL, rnd.randint(0, 4))}
+
+
+def test_escape_pointer():
+    assert escape_pointer('a/b~c') == 'a~1b~0c'
+    assert escape_pointer('~1') == '~01'
+    assert unescape_pointer(escape_pointer('~1/~0')) == '~1/~0'
+
+
+@pytest.mark.parametrize('seed', range(300))
+def test_diff_json_patch_reproduces_new_document(seed):
+    rnd = random.Random(seed)
+    old = random_value(rnd)
+    new = random_value(rnd)
+    document = {'configs': old}
+
+    operations = json.loads(b'[' + b','.join(diff_json(old, new, '/configs')) + b']')
+    assert apply_patch(document, operations) == {'configs': new}
+    assert diff_json(new, copy.deepcopy(new), '/configs') == []
+
+
+def make_content(timestamp: int | None, routes: list, configs: dict, message: str = 'ok') -> dict:
+    return {
+        'exchange': 'binance', 'message': message, 'timestamp': timestamp,
+        'data': {'markets': [{'symbol': 'BTC/USDT'}], 'routes': routes, 'configs': configs},
+    }
+
+
+def get_patch_operations(history: ConfigHistory, since: str, version: str, timestamp: int) -> list[dict]:
+    patch = history.get_patch(KEY, since, version)
+    assert patch is not None
+    return json.loads(patch.render(timestamp))
+
+
+def test_patch_from_each_version_in_history():
+    history = ConfigHistory(size=3, max_filtered=2)
+    versions = [
+        ('v1', make_content(None, [[1, 2]], {'gate': {'a': 1}, 'x/y': 1})),
+        ('v2', make_content(None, [[1, 2]], {'gate': {'a': 2}, 'new': [1]})),
+        ('v3', make_content(None, [[2, 1]], {'gate': {'a': 2}}, message='changed')),
+    ]
+    for version, content in versions:
+        history.record(KEY, version, content)
+
+    latest = make_content(5, [[2, 1]], {'gate': {'a': 2}}, message='changed')
+    for version, content in versions:
+        operations = get_patch_operations(history, version, 'v3', 5)
+        assert apply_patch(content, operations) == latest
+        # неизмененные разделы не попадают в патч
+        assert all(operation['path'] != '/data/markets' for operation in operations)
+
+    # патч собирается один раз, timestamp подставляется для каждого запроса
+    assert history.get_patch(KEY, 'v1', 'v3') is history.get_patch(KEY, 'v1', 'v3')
+    assert get_patch_operations(history, 'v1', 'v3', 6)[-1] == {'op': 'replace', 'path': '/timestamp', 'value': 6}
+
+
+def test_patch_is_not_available():
+    history = ConfigHistory(size=2, max_filtered=2)
+    for index in range(3):
+        history.record(KEY, f'v{index}', make_content(None, [], {'gate': index}))
+
+    # версия клиента вытеснена из истории
+    assert history.get_patch(KEY, 'v0', 'v2') is None
+    # текущая версия еще не сохранена в истории
+    assert history.get_patch(KEY, 'v1', 'v3') is None
+    assert history.get_patch(('binance/2', 'verbose', ''), 'v1', 'v2') is None
+    assert history.get_patch(KEY, 'v1', 'v2') is not None
+
+
+def test_filtered_keys_history_is_limited():
+    history = ConfigHistory(size=2, max_filtered=1)
+    first_key = ('binance/1', 'verbose', 'filter1')
+    second_key = ('binance/1', 'verbose', 'filter2')
+    for key in (first_key, second_key):
+        history.record(key, 'v1', make_content(None, [], {}))
+        history.record(key, 'v2', make_content(None, [[1]], {}))
+
+    assert history.get_patch(first_key, 'v1', 'v2') is None
+    assert history.get_patch(second_key, 'v1', 'v2') is not None
+
+
+def wait_for_new_version(api_client, url: str, version: str | None) -> dict:
+    """ Ответ, когда версия данных отличается от version и не меняется между двумя запросами
+    (наблюдатель узнает об изменении в фоновом потоке, первый запрос загружает маркеты биржи) """
+    deadline = time.monotonic() + TIMEOUT
+    previous_version = None
+    while time.monotonic() < deadline:
+        response = api_client.get(url)
+        assert response.status_code == 200
+        new_version = response.headers['X-Config-Version']
+        if new_version != version and new_version == previous_version:
+            return response.json()
+        previous_version = new_version
+        time.sleep(0.2)
+    raise AssertionError(f'Версия {url} не изменилась')
+
+
+def test_since_returns_patch_from_client_version(api_client, make_trade_server):
+    path_to_config = make_trade_server('binance', 'since', sections={'gate_config': {'a': 1}, 'old': {}})
+    url = '/binance/since?only_new=false'
+    old_content = wait_for_new_version(api_client, url, None)
+    old_version = api_client.get(url).headers['X-Config-Version']
+
+    with open(os.path.join(path_to_config, 'sections', 'gate_config.json'), 'w') as section_file:
+        section_file.write('{"a": 2, "b/c": 3}')
+    os.remove(os.path.join(path_to_config, 'sections', 'old.json'))
+    new_content = wait_for_new_version(api_client, url, old_version)
+
+    response = api_client.get(f'{url}&since={old_version}')
+    assert response.headers['Content-Type'] == 'application/json-patch+json'
+    operations = response.json()
+    assert {operation['path'] for operation in operations} == \
+           {'/data/configs/old', '/data/configs/gate_config/a', '/data/configs/gate_config/b~1c', '/timestamp'}
+    new_content['timestamp'] = operations[-1]['value']
+    assert apply_patch(old_content, operations) == new_content
+
+    # версии нет в истории - отправляются все данные
+    response = api_client.get(f'{url}&since=unknown')
+    assert response.headers['Content-Type'] == 'application/json'
+    assert response.json()['data'] == new_content['data']
@@ -0,0 +1,107 @@
+"""
+\file test_config_snapshots.py
+\author github:khanbekov, telegram:qoddrysdaim
+\brief Тесты снимков конфигураций торговых серверов (последний корректный снимок при ошибках)
+\data 2026.10.18
+"""
+import json
+import os
+import shutil
+
+import fastapi
+import pytest
+
+import src.api.config_snapshots as config_snapshots_module
+from src.api.config_snapshots import ConfigSnapshots, parse_assets
+from src.responses_models.api_errors import ConfigsNotFound
+
+DEFAULT_HEADER = {'exchange': 'binance', 'node': 'configurator', 'algo': 'spread_bot_cpp', 'instance': '1'}
+
+
+class StubWatcher:
+    """ Заглушка config_watcher: версия директории задается тестом """
+
+    def __init__(self):
+        self.version = 1
+
+    def get_version(self, path_to_dir: str) -> int:
+        return self.version
+
+
+@pytest.fixture
+def watcher(monkeypatch) -> StubWatcher:
+    stub_watcher = StubWatcher()
+    monkeypatch.setattr(config_snapshots_module, 'config_watcher', stub_watcher)
+    return stub_watcher
+
+
+@pytest.fixture
+def path_to_config(tmp_path) -> str:
+    path = tmp_path / 'binance' / '1'
+    os.makedirs(path / 'sections')
+    (path / 'assets.txt').write_text('BTC, ETH,\nUSDT, BTC')
+    (path / 'header.json').write_text(json.dumps(DEFAULT_HEADER))
+    (path / 'sections' / 'gate_config.json').write_text('{"a": 1}')
+    return str(path)
+
+
+def get_snapshot(snapshots: ConfigSnapshots, path_to_config: str):
+    return snapshots.get_snapshot('binance/1', path_to_config, 'assets.txt', 'header.json', DEFAULT_HEADER)
+
+
+def test_parse_assets():
+    assert parse_assets('BTC, ETH,\n\nUSDT , BTC\n') == ('BTC', 'ETH', 'USDT')
+    assert parse_assets(' \n, ') == ()
+
+
+def write_file(path: str, content: str):
+    with open(path, 'w') as file:
+        file.write(content)
+
+
+@pytest.mark.parametrize('break_config', [
+    lambda path: write_file(os.path.join(path, 'header.json'), '{not json'),
+    lambda path: write_file(os.path.join(path, 'assets.txt'), ' , '),
+    lambda path: os.remove(os.path.join(path, 'assets.txt')),
+    lambda path: shutil.rmtree(os.path.join(path, 'sections')),
+], ids=['header_json', 'empty_assets', 'no_assets', 'no_sections'])
+def test_broken_config_returns_last_good_snapshot(watcher, path_to_config, break_config):
+    snapshots = ConfigSnapshots()
+    snapshot = get_snapshot(snapshots, path_to_config)
+    assert snapshot.version == 1
+    assert snapshot.traded_assets == ('BTC', 'ETH', 'USDT')
+    assert dict(snapshot.configs) == {'gate_config': {'a': 1}}
+
+    break_config(path_to_config)
+    watcher.version = 2
+    assert get_snapshot(snapshots, path_to_config) is snapshot
+
+    # без корректного снимка ошибка возвращается клиенту
+    with pytest.raises(fastapi.HTTPException):
+        get_snapshot(ConfigSnapshots(), path_to_config)
+
+
+def test_fixed_config_is_compiled_again(watcher, path_to_config):
+    snapshots = ConfigSnapshots()
+    get_snapshot(snapshots, path_to_config)
+
+    write_file(os.path.join(path_to_config, 'header.json'), '{not json')
+    watcher.version = 2
+    assert get_snapshot(snapshots, path_to_config).version == 1
+
+    write_file(os.path.join(path_to_config, 'header.json'), json.dumps(DEFAULT_HEADER))
+    write_file(os.path.join(path_to_config, 'sections', 'gate_config.json'), '{"a": 2}')
+    watcher.version = 3
+    snapshot = get_snapshot(snapshots, path_to_config)
+    assert snapshot.version == 3
+    assert dict(snapshot.configs) == {'gate_config': {'a': 2}}
+
+
+def test_removed_directory_is_not_served(watcher, path_to_config):
+    snapshots = ConfigSnapshots()
+    get_snapshot(snapshots, path_to_config)
+
+    shutil.rmtree(path_to_config)
+    watcher.version = 2
+    with pytest.raises(ConfigsNotFound):
+        get_snapshot(snapshots, path_to_config)
@@ -0,0 +1,63 @@
+"""
+\file test_config_watcher.py
+\author github:khanbekov, telegram:qoddrysdaim
+\brief Тесты наблюдателя за изменениями конфигураций торговых серверов (inotify и обход директорий)
+\data 2026.10.18
+"""
+import os
+import time
+from typing import Callable
+
+import pytest
+
+from src.api.config_watcher import ConfigWatcher
+from src.api.shared_state import SharedState
+
+POLL_INTERVAL = 0.05
+TIMEOUT = 5.0
+
+
+@pytest.fixture(params=['inotify', 'polling'])
+def watcher(request, tmp_path):
+    for instance in ('1', '2'):
+        os.makedirs(tmp_path / 'binance' / instance)
+        (tmp_path / 'binance' / instance / 'header.json').write_text('{}')
+    config_watcher = ConfigWatcher(str(tmp_path), request.param, POLL_INTERVAL, SharedState(None, 64, POLL_INTERVAL))
+    yield config_watcher
+    config_watcher.stop()
+
+
+def change_until(watcher: ConfigWatcher, path_to_dir: str, change: Callable[[int], None]) -> int:
+    """ Изменение повторяется, пока версия директории не увеличится
+    (поток наблюдателя начинает наблюдение не сразу после запуска) """
+    version = watcher.get_version(path_to_dir)
+    deadline = time.monotonic() + TIMEOUT
+    attempt = 0
+    while time.monotonic() < deadline:
+        change(attempt)
+        attempt += 1
+        time.sleep(POLL_INTERVAL * 3)
+        if watcher.get_version(path_to_dir) > version:
+            return watcher.get_version(path_to_dir)
+    pytest.fail(f'Версия {path_to_dir} не изменилась')
+
+
+def test_file_changes_bump_only_their_trade_server(watcher):
+    first_dir = os.path.join(watcher.path_to_root, 'binance', '1')
+    second_dir = os.path.join(watcher.path_to_root, 'binance', '2')
+    second_version = watcher.get_version(second_dir)
+
+    def modify_file(attempt: int):
+        with open(os.path.join(first_dir, 'header.json'), 'w') as header_file:
+            header_file.write(f'{{"attempt": {attempt}}}')
+
+    def create_file(attempt: int):
+        open(os.path.join(first_dir, f'new{attempt}.json'), 'w').close()
+
+    def remove_file(attempt: int):
+        os.remove(os.path.join(first_dir, f'new{attempt}.json'))
+
+    version = change_until(watcher, first_dir, modify_file)
+    version = max(version, change_until(watcher, first_dir, create_file))
+    assert change_until(watcher, first_dir, remove_file) > version
+    assert watcher.get_version(second_dir) == second_version
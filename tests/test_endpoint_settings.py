@@ -0,0 +1,90 @@
+"""
+\file test_endpoint_settings.py
+\author github:khanbekov, telegram:qoddrysdaim
+\brief Тесты перезагрузки настроек основного эндпоинта без перезапуска Configurator
+\data 2026.10.18
+"""
+import asyncio
+import os
+import shutil
+
+import pytest
+
+from src.api.endpoint_settings import EndpointSettingsStore
+from src.settings import API_CONFIGURATION_PATH
+
+RELOAD_INTERVAL = 0.05
+
+
+@pytest.fixture
+def path_to_file(tmp_path) -> str:
+    path = str(tmp_path / 'config.toml')
+    shutil.copyfile(API_CONFIGURATION_PATH, path)
+    return path
+
+
+def replace_in_file(path: str, old: str, new: str):
+    with open(path) as file:
+        content = file.read()
+    assert old in content
+    with open(path, 'w') as file:
+        file.write(content.replace(old, new, 1))
+
+
+def test_changed_file_replaces_settings(path_to_file):
+    store = EndpointSettingsStore(path_to_file, RELOAD_INTERVAL)
+    settings = store.current
+    calls = []
+    store.add_listener(lambda: calls.append(store.current))
+
+    # первая проверка запоминает файл, содержимое не изменилось
+    assert not store.reload_if_changed()
+    os.utime(path_to_file, ns=(0, 0))
+    assert not store.reload_if_changed()
+    assert store.current is settings
+
+    replace_in_file(path_to_file, "event = 'config'", "event = 'new_config'")
+    assert store.reload_if_changed()
+    assert store.current.event == 'new_config'
+    assert store.current.version != settings.version
+    assert store.current.no_fresh_message == settings.no_fresh_message
+    assert calls == [store.current]
+
+
+@pytest.mark.parametrize('old, new', [
+    ('[endpoint]', '[endpoint'),
+    ('[data]', '[no_data]'),
+], ids=['toml_syntax', 'missing_section'])
+def test_broken_file_keeps_previous_settings(path_to_file, old, new):
+    store = EndpointSettingsStore(path_to_file, RELOAD_INTERVAL)
+    settings = store.current
+    calls = []
+    store.add_listener(lambda: calls.append(store.current))
+
+    replace_in_file(path_to_file, old, new)
+    assert not store.reload()
+    assert store.current is settings
+
+    os.remove(path_to_file)
+    assert not store.reload()
+    assert store.current is settings
+    assert calls == []
+
+
+def test_periodic_check_reloads_settings(path_to_file):
+    store = EndpointSettingsStore(path_to_file, RELOAD_INTERVAL)
+
+    async def change_and_wait() -> str:
+        store.start()
+        try:
+            await asyncio.sleep(RELOAD_INTERVAL * 3)
+            replace_in_file(path_to_file, "event = 'config'", "event = 'reloaded'")
+            for _ in range(100):
+                await asyncio.sleep(RELOAD_INTERVAL)
+                if store.current.event == 'reloaded':
+                    break
+            return store.current.event
+        finally:
+            store.stop()
+
+    assert asyncio.run(change_and_wait()) == 'reloaded'
@@ -0,0 +1,23 @@
+"""
+\file test_import_time.py
+\author github:khanbekov, telegram:qoddrysdaim
+\brief Тест времени импорта приложения (см. benchmarks/import_time.py)
+\data 2026.10.18
+"""
+import os
+
+from benchmarks.import_time import measure_import_time, get_own_time_ms, get_lazy_imported, MODULE, \
+    OWN_PACKAGE, DEFAULT_BUDGET_MS
+
+# Бюджет можно увеличить для медленных машин CI: IMPORT_TIME_BUDGET_MS=500 python -m pytest
+BUDGET_MS = float(os.environ.get('IMPORT_TIME_BUDGET_MS', DEFAULT_BUDGET_MS))
+
+
+def test_import_time_within_budget():
+    imports = measure_import_time(MODULE)
+
+    lazy_imported = get_lazy_imported(imports)
+    assert not lazy_imported, f'При импорте {MODULE} загружены модули, которые должны загружаться в фоне'
+
+    own_ms = get_own_time_ms(imports)
+    assert own_ms <= BUDGET_MS, f'Импорт {OWN_PACKAGE}.*: {own_ms:.1f} мс, бюджет {BUDGET_MS:.0f} мс'
@@ -0,0 +1,124 @@
+"""
+\file test_markets_cache.py
+\author github:khanbekov, telegram:qoddrysdaim
+\brief Тесты кэша маркетов бирж (одна загрузка на биржу в процессе и одна на все процессы - аренда загрузки)
+\data 2026.10.18
+"""
+import asyncio
+
+import pytest
+
+import src.market_data_obtaining.markets_cache as markets_cache_module
+from src.api.shared_state import SharedState
+from src.market_data_obtaining.markets_cache import MarketsCache
+from src.market_data_obtaining.markets_snapshots import MarketsSnapshots
+from src.responses_models.api_errors import CCXTError
+from conftest import FAKE_EXCHANGE_ASSETS, make_fake_markets
+
+SLOTS = 64
+POLL_INTERVAL = 0.01
+
+
+class SlowExchange:
+    """ Биржа ccxt.async_support, загрузка маркетов которой занимает время """
+
+    def __init__(self, loads: list, fail: bool = False):
+        import ccxt
+        self.precisionMode = ccxt.DECIMAL_PLACES
+        self.loads = loads
+        self.fail = fail
+
+    async def load_markets(self, reload: bool = False) -> dict:
+        import ccxt
+        self.loads.append(self)
+        await asyncio.sleep(0.1)
+        if self.fail:
+            raise ccxt.NetworkError('нет соединения')
+        return make_fake_markets(FAKE_EXCHANGE_ASSETS)
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def loads(monkeypatch) -> list:
+    """ Загрузки маркетов с биржи (все объекты бирж записывают в один список) """
+    loads = []
+    monkeypatch.setattr(markets_cache_module, 'get_async_exchange_by_id', lambda exchange_id: SlowExchange(loads))
+    return loads
+
+
+def make_cache(tmp_path, state: SharedState) -> MarketsCache:
+    return MarketsCache(60.0, 10.0, 60.0, MarketsSnapshots(str(tmp_path / 'snapshots'), 2), state)
+
+
+async def close_caches(*caches: MarketsCache):
+    # снимок маркетов сохраняется в фоне
+    await asyncio.sleep(0.1)
+    for cache in caches:
+        await cache.close()
+
+
+def test_concurrent_requests_share_one_load(tmp_path, loads):
+    async def get_markets():
+        cache = make_cache(tmp_path, SharedState(None, SLOTS, POLL_INTERVAL))
+        entries = await asyncio.gather(*(cache.get_markets('binance') for _ in range(10)))
+        # маркеты в кэше - без обращения к бирже
+        entries.append(await cache.get_markets('binance'))
+        await close_caches(cache)
+        return entries
+
+    entries = asyncio.run(get_markets())
+    assert len(loads) == 1
+    assert all(entry is entries[0] for entry in entries)
+    assert len(entries[0].markets) == len(make_fake_markets(FAKE_EXCHANGE_ASSETS))
+
+
+def test_cancelled_request_does_not_cancel_load(tmp_path, loads):
+    async def get_markets():
+        cache = make_cache(tmp_path, SharedState(None, SLOTS, POLL_INTERVAL))
+        cancelled = asyncio.create_task(cache.get_markets('binance'))
+        waiting = asyncio.create_task(cache.get_markets('binance'))
+        await asyncio.sleep(0.02)
+        cancelled.cancel()
+        entry = await waiting
+        await close_caches(cache)
+        return entry
+
+    assert asyncio.run(get_markets()).markets
+    assert len(loads) == 1
+
+
+def test_processes_share_one_load(tmp_path, loads):
+    path = str(tmp_path / 'configurator.state')
+
+    async def get_markets():
+        # кэши с общим файлом состояния и общими снимками - как в разных процессах
+        caches = [make_cache(tmp_path, SharedState(path, SLOTS, POLL_INTERVAL)) for _ in range(3)]
+        entries = await asyncio.gather(*(cache.get_markets('binance') for cache in caches))
+        await close_caches(*caches)
+        return entries
+
+    entries = asyncio.run(get_markets())
+    assert len(loads) == 1
+    # остальные процессы читают маркеты из снимка, сохраненного процессом, который загрузил маркеты
+    assert len({entry.version for entry in entries}) == 1
+    assert all(entry.markets.keys() == entries[0].markets.keys() for entry in entries)
+
+
+def test_failed_load_in_other_process_is_reported(tmp_path, monkeypatch):
+    path = str(tmp_path / 'configurator.state')
+    loads = []
+    monkeypatch.setattr(markets_cache_module, 'get_async_exchange_by_id',
+                        lambda exchange_id: SlowExchange(loads, fail=True))
+
+    async def get_markets():
+        caches = [make_cache(tmp_path, SharedState(path, SLOTS, POLL_INTERVAL)) for _ in range(2)]
+        results = await asyncio.gather(*(cache.get_markets('binance') for cache in caches), return_exceptions=True)
+        await close_caches(*caches)
+        return results
+
+    results = asyncio.run(get_markets())
+    # ожидающий процесс не обращается к бирже после ошибки загрузки в другом процессе
+    assert len(loads) == 1
+    assert all(isinstance(result, CCXTError) for result in results)
@@ -0,0 +1,128 @@
+"""
+\file test_markets_snapshots.py
+\author github:khanbekov, telegram:qoddrysdaim
+\brief Тесты снимков маркетов бирж на диске (быстрый запуск и работа при недоступной бирже)
+\data 2026.10.18
+"""
+import asyncio
+import os
+import time
+
+import pytest
+
+import src.market_data_obtaining.markets_cache as markets_cache_module
+from src.api.shared_state import SharedState
+from src.market_data_obtaining.markets_cache import MarketsCache
+from src.market_data_obtaining.markets_snapshots import MarketsSnapshots, MarketsSnapshot, encode_snapshot, \
+    decode_snapshot, SNAPSHOT_FIELDS, SNAPSHOT_HEADER
+from src.responses_models.api_errors import CCXTError
+from conftest import FAKE_EXCHANGE_ASSETS, make_fake_markets
+
+FETCHED_AT = 1700000000.5
+
+
+def make_snapshot(seed: int = 0) -> MarketsSnapshot:
+    markets = make_fake_markets(FAKE_EXCHANGE_ASSETS, seed)
+    for market in markets.values():
+        # поля, которые не используются в ответе API, в снимок не попадают
+        market['info'] = {'raw': 'exchange response'}
+    return MarketsSnapshot(markets, True, FETCHED_AT)
+
+
+def strip_markets(markets: dict) -> dict:
+    return {symbol: {field: market.get(field) for field in SNAPSHOT_FIELDS} for symbol, market in markets.items()}
+
+
+def save_versions(snapshots: MarketsSnapshots, versions: list[str]):
+    """ Сохранение версий по порядку (время изменения файлов задается явно, чтобы порядок не зависел от ФС) """
+    for index, version in enumerate(versions):
+        assert snapshots.save('binance', version, make_snapshot(index))
+        path_to_file = os.path.join(snapshots.path_to_dir, 'binance', f'{version}.markets')
+        os.utime(path_to_file, (1000 + index, 1000 + index))
+
+
+def test_encode_decode_snapshot():
+    snapshot = make_snapshot()
+    decoded = decode_snapshot(encode_snapshot(*snapshot))
+    assert decoded == MarketsSnapshot(strip_markets(snapshot.markets), True, FETCHED_AT)
+    assert decode_snapshot(encode_snapshot({}, False, 0.0)) == MarketsSnapshot({}, False, 0.0)
+
+
+@pytest.mark.parametrize('corrupt', [
+    lambda content: content[:SNAPSHOT_HEADER.size - 1],
+    lambda content: b'XXXX' + content[4:],
+    lambda content: content[:-1],
+    lambda content: content[:SNAPSHOT_HEADER.size] + bytes(len(content) - SNAPSHOT_HEADER.size),
+], ids=['short_header', 'magic', 'truncated', 'payload'])
+def test_decode_corrupted_snapshot(corrupt):
+    with pytest.raises(ValueError):
+        decode_snapshot(corrupt(encode_snapshot(*make_snapshot())))
+
+
+def test_save_keeps_last_versions(tmp_path):
+    snapshots = MarketsSnapshots(str(tmp_path), keep=2)
+    assert snapshots.list_exchanges() == []
+    assert snapshots.load_latest('binance') is None
+
+    save_versions(snapshots, ['v0', 'v1'])
+    assert snapshots.save('binance', 'v2', make_snapshot(2))
+    assert sorted(os.listdir(tmp_path / 'binance')) == ['v1.markets', 'v2.markets']
+    assert snapshots.load('binance', 'v0') is None
+    assert snapshots.load('binance', 'v1').markets == strip_markets(make_snapshot(1).markets)
+    assert snapshots.load_latest('binance').markets == strip_markets(make_snapshot(2).markets)
+
+    (tmp_path / 'not_exchange.txt').write_text('')
+    assert snapshots.list_exchanges() == ['binance']
+
+
+def test_load_latest_skips_corrupted_snapshot(tmp_path):
+    snapshots = MarketsSnapshots(str(tmp_path), keep=3)
+    save_versions(snapshots, ['v0', 'v1'])
+    (tmp_path / 'binance' / 'v1.markets').write_bytes(b'CFGM')
+
+    assert snapshots.load('binance', 'v1') is None
+    assert snapshots.load_latest('binance').markets == strip_markets(make_snapshot(0).markets)
+
+
+def test_save_error_does_not_raise(tmp_path):
+    (tmp_path / 'file').write_text('')
+    snapshots = MarketsSnapshots(str(tmp_path / 'file'), keep=1)
+    assert not snapshots.save('binance', 'v0', make_snapshot())
+
+
+class UnavailableExchange:
+    """ Биржа ccxt.async_support, к которой нет соединения """
+    precisionMode = None
+
+    async def load_markets(self, reload: bool = False) -> dict:
+        import ccxt
+        raise ccxt.NetworkError('нет соединения')
+
+    async def close(self):
+        pass
+
+
+def test_unavailable_exchange_falls_back_to_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(markets_cache_module, 'get_async_exchange_by_id', lambda exchange_id: UnavailableExchange())
+    snapshots = MarketsSnapshots(str(tmp_path), keep=2)
+
+    async def get_markets(exchange_id: str, warm_up: bool):
+        cache = MarketsCache(60.0, 10.0, 60.0, snapshots, SharedState(None, 64, 0.01))
+        try:
+            if warm_up:
+                await cache.warm_up()
+            return await cache.get_markets(exchange_id), cache.get_stale_age(exchange_id)
+        finally:
+            await cache.close()
+
+    # без снимка ошибка биржи возвращается клиенту
+    with pytest.raises(CCXTError):
+        asyncio.run(get_markets('binance', False))
+
+    save_versions(snapshots, ['v0'])
+    for warm_up in (False, True):
+        entry, stale_age = asyncio.run(get_markets('binance', warm_up))
+        assert entry.markets == strip_markets(make_snapshot(0).markets)
+        assert entry.is_decimal_precision
+        # возраст маркетов - с момента загрузки с биржи (время в снимке)
+        assert stale_age == pytest.approx(time.time() - FETCHED_AT, abs=5)
@@ -0,0 +1,94 @@
+"""
+\file test_metrics.py
+\author github:khanbekov, telegram:qoddrysdaim
+\brief Тесты метрик Configurator и их вывода в текстовом формате Prometheus (эндпоинт /metrics)
+\data 2026.10.18
+"""
+import re
+
+from src.api.metrics import Counter, Gauge, Histogram, MetricsRegistry, METRICS_CONTENT_TYPE
+
+# Строка с значением метрики: имя{метки} значение
+SAMPLE_LINE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{([a-zA-Z_][a-zA-Z0-9_]*="([^"\\]|\\.)*",?)*\})? '
+                         r'(-?[0-9.e+-]+|\+Inf|NaN)$')
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram('duration_seconds', 'Время.', ('stage',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 1.0, 7.0):
+        histogram.observe(value, 'serialize')
+    histogram.observe(2.0, 'compress')
+
+    assert list(histogram.render()) == [
+        '# HELP duration_seconds Время.',
+        '# TYPE duration_seconds histogram',
+        # граница корзины включается в корзину (le - less or equal)
+        'duration_seconds_bucket{stage="serialize",le="0.1"} 2',
+        'duration_seconds_bucket{stage="serialize",le="1"} 4',
+        'duration_seconds_bucket{stage="serialize",le="+Inf"} 5',
+        'duration_seconds_sum{stage="serialize"} 8.65',
+        'duration_seconds_count{stage="serialize"} 5',
+        'duration_seconds_bucket{stage="compress",le="0.1"} 0',
+        'duration_seconds_bucket{stage="compress",le="1"} 0',
+        'duration_seconds_bucket{stage="compress",le="+Inf"} 1',
+        'duration_seconds_sum{stage="compress"} 2',
+        'duration_seconds_count{stage="compress"} 1',
+    ]
+
+
+def test_histogram_time_observes_on_exception():
+    histogram = Histogram('duration_seconds', 'Время.')
+    try:
+        with histogram.time():
+            raise ValueError
+    except ValueError:
+        pass
+    assert 'duration_seconds_count 1' in histogram.render()
+
+
+def test_counter_labels_are_escaped():
+    counter = Counter('requests_total', 'Запросы.', ('path',))
+    counter.inc('a"b\\c\nd')
+    counter.inc('a"b\\c\nd', amount=2)
+    gauge = Gauge('queued', 'Очередь.')
+    gauge.set(0.5)
+
+    assert list(counter.render())[2] == 'requests_total{path="a\\"b\\\\c\\nd"} 3'
+    assert list(gauge.render()) == ['# HELP queued Очередь.', '# TYPE queued gauge', 'queued 0.5']
+
+
+def test_registry_runs_collectors_before_render():
+    registry = MetricsRegistry()
+    gauge = registry.register(Gauge('value', 'Значение.'))
+    values = iter(range(1, 10))
+    registry.add_collector(lambda: gauge.set(next(values)))
+
+    assert registry.render().endswith(b'\nvalue 1\n')
+    assert registry.render().endswith(b'\nvalue 2\n')
+
+
+def test_metrics_endpoint(api_client, make_trade_server):
+    make_trade_server('binance', 'metrics')
+    assert api_client.get('/binance/metrics?only_new=false').status_code == 200
+
+    response = api_client.get('/metrics')
+    assert response.status_code == 200
+    assert response.headers['Content-Type'] == METRICS_CONTENT_TYPE
+
+    lines = response.text.splitlines()
+    types = {}
+    for line in lines:
+        if line.startswith('# TYPE '):
+            _, _, name, metric_type = line.split(' ')
+            assert name not in types
+            types[name] = metric_type
+        elif not line.startswith('# HELP '):
+            assert SAMPLE_LINE.match(line), line
+
+    assert types['configurator_stage_duration_seconds'] == 'histogram'
+    assert types['configurator_cache_requests_total'] == 'counter'
+    assert types['configurator_aeron_log_records_queued'] == 'gauge'
+    assert any(line.startswith('configurator_stage_duration_seconds_count{stage="serialize",exchange="binance"}')
+               for line in lines)
+    assert any(line.startswith('configurator_request_duration_seconds_count{endpoint="endpoint_get_configs",'
+                               'status="200"}') for line in lines)
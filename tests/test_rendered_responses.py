@@ -0,0 +1,87 @@
+"""
+\file test_rendered_responses.py
+\author github:khanbekov, telegram:qoddrysdaim
+\brief Тесты кэша сериализованных ответов (сборка data без pydantic и подстановка timestamp)
+\data 2026.10.18
+"""
+import pytest
+from fastapi.encoders import jsonable_encoder
+
+from src.api.rendered_responses import build_configs_data, render_json, split_rendered_response, \
+    RenderedResponsesCache
+from src.market_data_obtaining.routes import construct_routes, decode_routes_compact
+from src.responses_models.api_responses import ConfigsResponse, ConfigsResponseData, CompactConfigsResponseData, \
+    JsonFormat, RoutesFormat
+from src.responses_models.market_models import AssetLabel, Market
+
+ASSETS = ['BTC', 'ETH', 'USDT', 'BNB']
+CONFIGS = {'gate_config': {'a': 1, 'name': 'шлюз'}}
+
+
+def make_content(data: dict, timestamp: int | None) -> dict:
+    """ Ответ так, как его собирает api.get_rendered_configs() """
+    response = ConfigsResponse(exchange='binance', instance='1', message='ok', timestamp=timestamp)
+    content = jsonable_encoder(response)
+    content['data'] = data
+    return content
+
+
+@pytest.mark.parametrize('routes_format, model', [
+    (RoutesFormat.verbose, ConfigsResponseData),
+    (RoutesFormat.compact, CompactConfigsResponseData),
+])
+def test_build_configs_data_matches_models(fake_market_records, routes_format, model):
+    assets_labels = [AssetLabel(exchange=asset, common=asset) for asset in ASSETS]
+    routes = construct_routes(fake_market_records, ASSETS)
+    assert routes
+
+    data = build_configs_data(fake_market_records, assets_labels, routes, CONFIGS, routes_format)
+    expected = jsonable_encoder(model(
+        markets=[Market(**market._asdict()) for market in fake_market_records],
+        assets_labels=assets_labels,
+        routes=data['routes'] if routes_format == RoutesFormat.compact else [
+            [step._asdict() for step in route] for route in routes
+        ],
+        configs=CONFIGS,
+    ))
+    for json_format in JsonFormat:
+        assert render_json(data, json_format) == render_json(expected, json_format)
+    if routes_format == RoutesFormat.compact:
+        assert list(decode_routes_compact(fake_market_records, data['routes'])) == routes
+
+
+@pytest.mark.parametrize('json_format', list(JsonFormat))
+def test_render_matches_full_serialization(fake_market_records, json_format):
+    routes = construct_routes(fake_market_records, ASSETS)
+    data = build_configs_data(fake_market_records, [], routes, CONFIGS)
+    rendered = split_rendered_response('v1', render_json(make_content(data, None), json_format))
+
+    for timestamp in (0, 1700000000123456):
+        assert rendered.render(timestamp) == render_json(make_content(data, timestamp), json_format)
+    assert rendered.size == len(rendered.render(0)) - 1
+
+
+def test_split_without_timestamp():
+    with pytest.raises(ValueError):
+        split_rendered_response('v1', render_json({'data': None}))
+
+
+def test_cache_keeps_last_version_and_limits_filtered():
+    cache = RenderedResponsesCache(max_filtered=2)
+    body = render_json(make_content(None, None))
+    key = ('binance/1', 'verbose', 'indented', '')
+    cache.put(key, split_rendered_response('v1', body))
+    assert cache.get(key, 'v1').etag == 'v1'
+    assert cache.get(key, 'v2') is None
+
+    filtered_keys = [('binance/1', 'verbose', 'indented', f'filter{index}') for index in range(3)]
+    cache.put(filtered_keys[0], split_rendered_response('v1', body))
+    cache.put(filtered_keys[1], split_rendered_response('v1', body))
+    # последний использованный ключ не вытесняется
+    assert cache.get(filtered_keys[0], 'v1') is not None
+    cache.put(filtered_keys[2], split_rendered_response('v1', body))
+    assert cache.get(filtered_keys[1], 'v1') is None
+    assert cache.get(filtered_keys[0], 'v1') is not None
+    assert cache.get(filtered_keys[2], 'v1') is not None
+    # тела без фильтра не вытесняются
+    assert cache.get(key, 'v1') is not None
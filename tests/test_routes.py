@@ -0,0 +1,107 @@
+"""
+\file test_routes.py
+\author github:khanbekov, telegram:qoddrysdaim
+\brief Тесты построения торговых маршрутов
+\data 2026.10.18
+"""
+import itertools
+import random
+
+import pytest
+
+from src.market_data_obtaining.routes import construct_routes, route_sequence_to_route, select_markets_by_assets, \
+    make_routes_filter, RoutesFilter, encode_routes_compact, decode_routes_compact, COMPACT_BUY, COMPACT_SELL
+from src.responses_models.market_models import MarketRecord
+
+ASSETS_POOL = ['BTC', 'ETH', 'USDT', 'BNB', 'XRP', 'DOGE']
+
+
+def make_market(base_asset: str, quote_asset: str) -> MarketRecord:
+    return MarketRecord(
+        exchange_symbol=f'{base_asset}{quote_asset}',
+        common_symbol=f'{base_asset}/{quote_asset}',
+        price_increment=0.01,
+        amount_increment=0.001,
+        limits={},
+        base_asset=base_asset,
+        quote_asset=quote_asset,
+    )
+
+
+def generate_case(seed: int) -> tuple[list[MarketRecord], list[str]]:
+    """ Случайный набор маркетов и ассетов. Часть маркетов содержит ассеты не из списка, порядок маркетов случайный """
+    rnd = random.Random(seed)
+    pairs = list(itertools.combinations(ASSETS_POOL, 2))
+    rnd.shuffle(pairs)
+    markets = [make_market(*(pair if rnd.random() < 0.5 else pair[::-1])) for pair in pairs[:rnd.randint(3, 11)]]
+    assets = rnd.sample(ASSETS_POOL, rnd.randint(3, 5))
+    return markets, assets
+
+
+def construct_routes_brute_force(markets: list[MarketRecord], assets: list[str]) -> list[list]:
+    """ Исходный алгоритм: перебор всех перестановок маркетов каждой длины """
+    selected_markets = select_markets_by_assets(markets, assets)
+    result = []
+    for length in range(3, len(assets) + 1):
+        for sequence in itertools.permutations(selected_markets, length):
+            route, is_valid_route = route_sequence_to_route(sequence)
+            if is_valid_route:
+                result.append(route)
+    return result
+
+
+def filter_routes(routes: list[list], routes_filter: RoutesFilter) -> list[list]:
+    """ Фильтрация готовых маршрутов (то, что RoutesFilter делает во время перебора) """
+    result = []
+    for route in routes:
+        symbols = {step.common_symbol for step in route}
+        if routes_filter.min_length is not None and len(route) < routes_filter.min_length:
+            continue
+        if routes_filter.max_length is not None and len(route) > routes_filter.max_length:
+            continue
+        if routes_filter.start_asset is not None and route[0].source_asset != routes_filter.start_asset:
+            continue
+        if routes_filter.include_markets is not None and not symbols <= set(routes_filter.include_markets):
+            continue
+        if symbols & set(routes_filter.exclude_markets):
+            continue
+        result.append(route)
+    return result
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_construct_routes_matches_brute_force(seed):
+    markets, assets = generate_case(seed)
+    assert construct_routes(markets, assets) == construct_routes_brute_force(markets, assets)
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_routes_filter_matches_filtered_brute_force(seed):
+    markets, assets = generate_case(seed)
+    expected = construct_routes_brute_force(markets, assets)
+
+    rnd = random.Random(seed)
+    symbols = [market.common_symbol for market in markets]
+    for _ in range(5):
+        routes_filter = make_routes_filter(
+            min_length=rnd.choice([None, 3, 4]),
+            max_length=rnd.choice([None, 3, 4, 5]),
+            start_asset=rnd.choice([None, *assets, 'UNKNOWN']),
+            include_markets=rnd.sample(symbols, rnd.randint(1, len(symbols))) if rnd.random() < 0.3 else None,
+            exclude_markets=rnd.sample(symbols, rnd.randint(0, 2)),
+        )
+        assert construct_routes(markets, assets, routes_filter) == filter_routes(expected, routes_filter)
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_compact_routes_roundtrip(seed):
+    markets, assets = generate_case(seed)
+    routes = construct_routes(markets, assets)
+
+    compact_routes = list(encode_routes_compact(markets, routes))
+
+    assert decode_routes_compact(markets, compact_routes) == routes
+    for route, compact_route in zip(routes, compact_routes):
+        for step, (market_index, side_bit) in zip(route, compact_route):
+            assert markets[market_index].common_symbol == step.common_symbol
+            assert side_bit == (COMPACT_BUY if step.operation == 'buy' else COMPACT_SELL)
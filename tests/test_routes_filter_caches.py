@@ -0,0 +1,67 @@
+"""
+\file test_routes_filter_caches.py
+\author github:khanbekov, telegram:qoddrysdaim
+\brief Тесты ограничения кэшей, ключи которых зависят от фильтра маршрутов (параметров запроса)
+\data 2026.10.18
+"""
+import asyncio
+
+from src.api.config_history import ConfigHistory
+from src.api.rendered_responses import RenderedResponse, RenderedResponsesCache
+from src.market_data_obtaining.routes import make_routes_filter, NO_ROUTES_FILTER
+from src.market_data_obtaining.routes_cache import RoutesCache, select_routes_cache, routes_cache
+
+
+def make_content(markets: list) -> dict:
+    return {'node': 'configurator', 'timestamp': None, 'data': {'markets': markets, 'configs': {}}}
+
+
+def test_memory_only_routes_cache():
+    cache = RoutesCache(None, 2, 0)
+    for index in range(5):
+        asyncio.run(cache.put_async(f'key{index}', [[index]]))
+
+    assert cache.get('key0') is None
+    assert asyncio.run(cache.get_async('key4')) == [[4]]
+    assert cache.get('key3') == [[3]]
+
+
+def test_select_routes_cache():
+    assert select_routes_cache(NO_ROUTES_FILTER) is routes_cache
+    filtered_cache = select_routes_cache(make_routes_filter(start_asset='USDT'))
+    assert filtered_cache is not routes_cache
+    assert filtered_cache.path_to_dir is None
+
+
+def test_min_length_three_is_no_filter():
+    assert make_routes_filter(min_length=3) == NO_ROUTES_FILTER
+    assert make_routes_filter(min_length=4) != NO_ROUTES_FILTER
+
+
+def test_rendered_responses_bound_filtered_keys():
+    cache = RenderedResponsesCache(2)
+    cache.put(('server', 'full', 'indented', ''), RenderedResponse('v1', b'', b'', {}))
+    for index in range(4):
+        cache.put(('server', 'full', 'indented', f'filter{index}'), RenderedResponse('v1', b'', b'', {}))
+        # использование первого ключа с фильтром сохраняет его в кэше
+        assert cache.get(('server', 'full', 'indented', 'filter0'), 'v1') is not None
+
+    assert cache.get(('server', 'full', 'indented', ''), 'v1') is not None
+    assert cache.get(('server', 'full', 'indented', 'filter0'), 'v1') is not None
+    assert cache.get(('server', 'full', 'indented', 'filter1'), 'v1') is None
+    assert cache.get(('server', 'full', 'indented', 'filter2'), 'v1') is None
+    assert cache.get(('server', 'full', 'indented', 'filter3'), 'v1') is not None
+
+
+def test_config_history_bounds_filtered_keys():
+    history = ConfigHistory(4, 2)
+    history.record(('server', 'full', ''), 'v1', make_content(['a']))
+    history.record(('server', 'full', ''), 'v2', make_content(['b']))
+    for index in range(3):
+        history.record(('server', 'full', f'filter{index}'), 'v1', make_content(['a']))
+        history.record(('server', 'full', f'filter{index}'), 'v2', make_content(['b']))
+
+    assert history.get_patch(('server', 'full', ''), 'v1', 'v2') is not None
+    assert history.get_patch(('server', 'full', 'filter0'), 'v1', 'v2') is None
+    assert history.get_patch(('server', 'full', 'filter1'), 'v1', 'v2') is not None
+    assert history.get_patch(('server', 'full', 'filter2'), 'v1', 'v2') is not None
@@ -0,0 +1,134 @@
+"""
+\file test_shared_state.py
+\author github:khanbekov, telegram:qoddrysdaim
+\brief Тесты общего состояния процессов (таблица в файле, отображенном в память)
+\data 2026.10.18
+"""
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from src.api.shared_state import SharedState
+
+SLOTS = 64
+
+
+def run_previous_process(path: str):
+    """ Процесс предыдущего запуска: присоединяется, оставляет запись и завершается """
+    code = ('from src.api.shared_state import SharedState\n'
+            f'state = SharedState({path!r}, {SLOTS}, 1.0)\n'
+            'state.join()\n'
+            "state.set('delivered:stale', 42)\n")
+    subprocess.run([sys.executable, '-c', code], cwd=os.getcwd(), check=True)
+
+
+def test_first_process_of_a_run_resets_state(tmp_path):
+    path = str(tmp_path / 'configurator.state')
+    run_previous_process(path)
+
+    state = SharedState(path, SLOTS, 1.0)
+    previous_boot_id = state.boot_id
+    assert state.get('delivered:stale') == 42
+
+    assert state.join()
+    assert state.get('delivered:stale') is None
+    assert state.boot_id != previous_boot_id
+
+
+def test_next_processes_of_a_run_keep_state(tmp_path):
+    path = str(tmp_path / 'configurator.state')
+    first = SharedState(path, SLOTS, 1.0)
+    # второй процесс открывает файл до того, как первый очистит таблицу
+    second = SharedState(path, SLOTS, 1.0)
+    assert first.join()
+    first.set('delivered:fresh', 7)
+
+    assert not second.join()
+    assert second.get('delivered:fresh') == 7
+    assert second.boot_id == first.boot_id
+    # повторное присоединение ничего не делает
+    assert not first.join()
+    assert first.get('delivered:fresh') == 7
+
+
+def apply_operation(state: SharedState, model: dict, operation: str, key: str, value: int):
+    """ Одна операция над таблицей и над словарем-моделью, результаты должны совпадать """
+    if operation == 'set':
+        state.set(key, value)
+        model[key] = value
+    elif operation == 'delete':
+        state.delete([key])
+        model.pop(key, None)
+    elif operation == 'exchange':
+        assert state.exchange(key, value) == model.get(key)
+        model[key] = value
+    else:
+        assert state.increment(key) == model.get(key, 0) + 1
+        model[key] = model.get(key, 0) + 1
+
+
+@pytest.mark.parametrize('seed', range(20))
+@pytest.mark.parametrize('keys_count', [6, 8, 12], ids=['sparse', 'full', 'overflow'])
+def test_table_matches_dict_model(seed, keys_count):
+    # в маленькой таблице цепочки пересекаются, а удаление сдвигает записи чужих цепочек
+    slots = 8
+    rnd = random.Random(seed)
+    keys = [f'key:{index}' for index in range(keys_count)]
+    state = SharedState(None, slots, 1.0)
+    model = {}
+    for _ in range(500):
+        operation = rnd.choice(['set', 'set', 'delete', 'exchange', 'increment'])
+        apply_operation(state, model, operation, rnd.choice(keys), rnd.randint(-2 ** 63, 2 ** 63 - 1))
+        assert state.get_values(keys) == [model.get(key) for key in keys]
+
+
+def test_table_is_shared_between_processes(tmp_path):
+    path = str(tmp_path / 'configurator.state')
+    rnd = random.Random(0)
+    keys = [f'key:{index}' for index in range(SLOTS - 1)]
+    first = SharedState(path, SLOTS, 1.0)
+    second = SharedState(path, SLOTS, 1.0)
+    model = {}
+    for index in range(1000):
+        state = first if index % 2 else second
+        operation = rnd.choice(['set', 'delete', 'exchange', 'increment'])
+        apply_operation(state, model, operation, rnd.choice(keys), rnd.randint(0, 100))
+
+    code = ('import json\n'
+            'from src.api.shared_state import SharedState\n'
+            f'state = SharedState({path!r}, {SLOTS}, 1.0)\n'
+            f'print(json.dumps(state.get_values({keys!r})))\n')
+    output = subprocess.run([sys.executable, '-c', code], cwd=os.getcwd(), check=True, capture_output=True).stdout
+    assert json.loads(output.splitlines()[-1]) == [model.get(key) for key in keys]
+
+
+def test_acquire_lease():
+    state = SharedState(None, SLOTS, 1.0)
+    assert state.acquire_lease('lease', now=100, until=160)
+    assert not state.acquire_lease('lease', now=159, until=220)
+    assert state.get('lease') == 160
+    # аренда закончилась
+    assert state.acquire_lease('lease', now=160, until=220)
+    # аренда снята (значение 0)
+    state.set('lease', 0)
+    assert state.acquire_lease('lease', now=161, until=221)
+
+
+def test_notify_changed_calls_listeners_of_other_processes(tmp_path):
+    path = str(tmp_path / 'configurator.state')
+    notified = threading.Event()
+    listener_state = SharedState(path, SLOTS, 0.01)
+    listener_state.add_listener(notified.set)
+    listener_state.start()
+    try:
+        time.sleep(0.05)
+        SharedState(path, SLOTS, 0.01).notify_changed()
+        assert notified.wait(5.0)
+    finally:
+        listener_state.stop()
@@ -0,0 +1,110 @@
+"""
+\file test_watch.py
+\author github:khanbekov, telegram:qoddrysdaim
+\brief Тесты эндпоинта /watch (ожидание изменений данных торгового сервера: long_poll и sse)
+\data 2026.10.18
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+
+import src.api.api as api
+from src.api.change_notifier import ChangeNotifier
+
+TIMEOUT = 5.0
+
+
+def get_settled_version(api_client, url: str) -> str:
+    """ Версия данных после того, как наблюдатель обработал создание директории, а маркеты биржи загружены """
+    api_client.get(url)
+    deadline = time.monotonic() + TIMEOUT
+    version = api_client.get(url).headers['X-Config-Version']
+    while time.monotonic() < deadline:
+        time.sleep(0.2)
+        new_version = api_client.get(url).headers['X-Config-Version']
+        if new_version == version:
+            return version
+        version = new_version
+    raise AssertionError(f'Версия {url} меняется')
+
+
+def test_change_notifier_wakes_all_waiters():
+    notifier = ChangeNotifier()
+
+    async def wait_for_changes() -> list[bool]:
+        notifier.start()
+        assert not await notifier.wait(0.01)
+        waiters = [asyncio.create_task(notifier.wait(TIMEOUT)) for _ in range(3)]
+        await asyncio.sleep(0)
+        # оповещение из другого потока (как из config_watcher)
+        threading.Thread(target=notifier.notify_threadsafe).start()
+        return await asyncio.gather(*waiters)
+
+    assert asyncio.run(wait_for_changes()) == [True, True, True]
+
+
+def test_long_poll_returns_after_config_change(api_client, make_trade_server):
+    path_to_config = make_trade_server('binance', 'watch')
+    version = get_settled_version(api_client, '/binance/watch?only_new=false')
+
+    # без since текущая версия возвращается сразу
+    assert api_client.get('/watch/binance/watch').json() == \
+           {'exchange': 'binance', 'instance': 'watch', 'version': version, 'changed': True}
+
+    # версия не изменилась - ответ по истечении времени ожидания
+    started = time.monotonic()
+    response = api_client.get(f'/watch/binance/watch?since={version}&timeout=0.3')
+    assert time.monotonic() - started >= 0.3
+    assert response.json()['changed'] is False
+    assert response.json()['version'] == version
+
+    def change_config():
+        with open(os.path.join(path_to_config, 'sections', 'gate_config.json'), 'w') as section_file:
+            section_file.write('{"a": 2}')
+
+    timer = threading.Timer(0.3, change_config)
+    timer.start()
+    started = time.monotonic()
+    response = api_client.get(f'/watch/binance/watch?since={version}&timeout={TIMEOUT}')
+    timer.join()
+    assert time.monotonic() - started < TIMEOUT
+    assert response.json()['changed'] is True
+    assert response.json()['version'] != version
+    # после ответа /watch основной эндпоинт отдает новую конфигурацию
+    # (запись файла может изменить версию несколько раз, поэтому версии не сравниваются)
+    assert api_client.get('/binance/watch?only_new=false').json()['data']['configs']['gate_config'] == {'a': 2}
+
+
+def test_watch_unknown_trade_server(api_client):
+    assert api_client.get('/watch/binance/missing?timeout=0').status_code == 404
+    assert api_client.get('/watch/no_such_exchange/1?timeout=0').status_code == 404
+
+
+def test_sse_sends_version_events_and_pings(monkeypatch):
+    versions = ['v1']
+    notifier = ChangeNotifier()
+    monkeypatch.setattr(api, 'change_notifier', notifier)
+    monkeypatch.setattr(api, 'get_data_version', lambda exchange_id, path_to_config: versions[-1])
+    monkeypatch.setattr(api, 'WATCH_SSE_PING_INTERVAL', 0.05)
+
+    async def read_events() -> list[bytes]:
+        events = api.iterate_watch_events('binance', 'binance/1', 'v0')
+        result = [await events.__anext__(), await events.__anext__()]
+
+        def change_version():
+            versions.append('v2')
+            notifier.notify()
+
+        # событие отправляется сразу после оповещения, а не по истечении периода ping
+        monkeypatch.setattr(api, 'WATCH_SSE_PING_INTERVAL', TIMEOUT)
+        asyncio.get_running_loop().call_later(0.1, change_version)
+        result.append(await asyncio.wait_for(events.__anext__(), TIMEOUT / 2))
+        await events.aclose()
+        return result
+
+    first, ping, second = asyncio.run(read_events())
+    assert first == b'id: v1\nevent: version\ndata: ' + json.dumps({'version': 'v1'}).encode() + b'\n\n'
+    assert ping == b': ping\n\n'
+    assert second.startswith(b'id: v2\nevent: version\n')